@@ -0,0 +1,298 @@
+import argparse
+import csv
+import importlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Header of the synthetic datasets (the same schema as dataset.csv)
+HEADER = ["StudentID", "StudentName", "CourseID", "CourseName", "Instructor"]
+
+# Pools used to generate synthetic names, courses and instructors
+FIRST_NAMES = ["Aaron", "Bella", "Carlos", "Diana", "Ethan", "Fiona", "Gavin", "Hannah", "Isla", "Jack",
+               "Kimberly", "Liam", "Maya", "Noah", "Olivia", "Paul", "Quinn", "Rosa", "Sam", "Tara",
+               "Uma", "Victor", "Wesley", "Xena", "Yusef", "Zoe"]
+LAST_NAMES = ["Brown", "Davis", "Garcia", "Johnson", "Jones", "Lee", "Miller", "Morris", "Reyes", "Smith",
+              "Sullivan", "Taylor", "Torres", "Williams", "Wilson", "Young"]
+SUBJECTS = ["Biology", "CS", "Chemistry", "English", "History", "Math", "Physics"]
+INSTRUCTORS = ["Prof. Brown", "Prof. Davis", "Prof. Gray", "Prof. Green", "Prof. Johnson", "Prof. Jones",
+               "Prof. Miller", "Prof. Smith", "Prof. Taylor", "Prof. White", "Prof. Williams", "Prof. Wilson"]
+
+# Largest CourseID of the synthetic datasets (CourseIDs are uniform in 1..MAX_COURSE_ID)
+MAX_COURSE_ID = 5000
+
+# Methods measured by the benchmark, in report order
+METHODS = ["SAT-Solver", "KW-SQL-Rewriting", "ConQuer-SQL-Rewriting", "Regular SQL Query", "Data Integrity Validation"]
+
+# Import the solver module from a directory (by default the directory of this script)
+# A module imported before from another directory is replaced, so every commit runs its own code
+def import_solver(solver_path=None):
+    solver_path = solver_path or os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, solver_path)
+    try:
+        sys.modules.pop("cavsat_solver", None)
+        return importlib.import_module("cavsat_solver")
+    finally:
+        sys.path.remove(solver_path)
+
+# Generate a seeded synthetic dataset with the schema of dataset.csv, as a list of text records
+# (plain records, so any commit can load them through its own load_data_from_csv)
+# inconsistency_ratio is the fraction of rows that are in a conflicting key group,
+# and group_size is the number of rows of each conflicting key group
+def generate_synthetic_dataset(rows, inconsistency_ratio=0.15, group_size=2, seed=0):
+    rng = np.random.default_rng(seed)
+    conflict_groups = int(round(rows * inconsistency_ratio / group_size)) if group_size > 1 else 0
+    clean_rows = rows - conflict_groups * group_size
+
+    # Every key (StudentID, CourseName) is distinct: a student takes each course at most once
+    student_names = sorted(f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES)
+    course_names = sorted(f"{subject}{number}" for subject in SUBJECTS for number in range(100, 200))
+    keys = clean_rows + conflict_groups
+    key_ids = np.arange(keys, dtype=np.int64)
+    student_ids = key_ids // len(course_names) + 1
+    course_codes = (key_ids % len(course_names) + student_ids * 7919) % len(course_names)
+
+    # Attributes of each key
+    name_codes = rng.integers(0, len(student_names), size=keys)
+    course_ids = rng.integers(1, MAX_COURSE_ID + 1, size=keys)
+    instructor_codes = rng.integers(0, len(INSTRUCTORS), size=keys)
+
+    # Rows: one per clean key, then group_size rows per conflicting key that differ on their non-key columns
+    row_keys = np.concatenate([np.arange(clean_rows, dtype=np.int64), np.repeat(np.arange(clean_rows, keys, dtype=np.int64), group_size)])
+    conflicting = np.concatenate([np.zeros(clean_rows, dtype=bool), np.ones(conflict_groups * group_size, dtype=bool)])
+    row_names = name_codes[row_keys]
+    row_course_ids = course_ids[row_keys]
+    row_instructors = instructor_codes[row_keys]
+    row_course_ids[conflicting] = rng.integers(1, MAX_COURSE_ID + 1, size=int(conflicting.sum()))
+    row_instructors[conflicting] = rng.integers(0, len(INSTRUCTORS), size=int(conflicting.sum()))
+
+    # Shuffle the rows so conflicting groups are spread over the whole table
+    order = rng.permutation(rows)
+    return list(zip(
+        student_ids[row_keys][order].astype(str).tolist(),
+        np.asarray(student_names)[row_names[order]].tolist(),
+        row_course_ids[order].astype(str).tolist(),
+        np.asarray(course_names)[course_codes[row_keys][order]].tolist(),
+        np.asarray(INSTRUCTORS)[row_instructors[order]].tolist(),
+    ))
+
+# Write a synthetic dataset to a CSV file with the header of dataset.csv
+def write_dataset(records, file_path):
+    with open(file_path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+        writer.writerows(records)
+
+# Get a query with (about) the given selectivity over the synthetic datasets
+# Represents following SQL statement: SELECT * FROM data WHERE CourseID <= selectivity * MAX_COURSE_ID
+# (a declarative Range where the solver module has one, a plain lambda over the record otherwise)
+def selectivity_query(cavsat_solver, selectivity):
+    high = int(round(selectivity * MAX_COURSE_ID))
+    if hasattr(cavsat_solver, "Range"):
+        return cavsat_solver.Range(2, high=high)
+    return lambda record: int(record[2]) <= high
+
+# Get the primary key constraint (StudentID, CourseName) of a dataset in the form the solver module supports:
+# a KeyConstraint where it has one, the original lambda over the whole dataset otherwise
+def key_constraints(cavsat_solver, data):
+    if hasattr(cavsat_solver, "KeyConstraint"):
+        return [cavsat_solver.KeyConstraint((0, 3)).build(data)]
+    return [lambda record: not any(other != record and other[0] == record[0] and other[3] == record[3] for other in data)]
+
+# Time a function: run it warmup times, then repeats times, and get the timings in nanoseconds and the last result
+def measure(function, warmup, repeats):
+    for _ in range(warmup):
+        function()
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start_time = time.perf_counter_ns()
+        result = function()
+        timings.append(time.perf_counter_ns() - start_time)
+    return timings, result
+
+# Run every method on one synthetic dataset (a CSV file) and query, and get one result entry per method
+# The dataset is loaded with the load_data_from_csv of the solver module, so every commit reads it its own way
+def benchmark_case(cavsat_solver, dataset_file, rows, inconsistency_ratio, group_size, selectivity, warmup, repeats):
+    data = cavsat_solver.load_data_from_csv(dataset_file)
+    constraints = key_constraints(cavsat_solver, data)
+    query = selectivity_query(cavsat_solver, selectivity)
+    cavsat_system = cavsat_solver.CAvSAT(data, constraints)
+
+    # The SAT solver is measured cold: a fresh system per run, so encoding the query's key groups is included
+    def solve():
+        return cavsat_solver.CAvSAT(data, constraints).solve(query)
+
+    sat_results = None
+    methods = {
+        "SAT-Solver": solve,
+        "KW-SQL-Rewriting": lambda: cavsat_system.kw_sql_simulation(query),
+        "ConQuer-SQL-Rewriting": lambda: cavsat_system.conquer_sql_simulation(query),
+        "Regular SQL Query": lambda: cavsat_system.sql_simulation(query),
+        "Data Integrity Validation": lambda: cavsat_solver.data_integrity_validation(sat_results, constraints, query),
+    }
+
+    entries = []
+    for method in METHODS:
+        timings, result = measure(methods[method], warmup, repeats)
+        if method == "SAT-Solver":
+            sat_results = result or set()
+        entries.append({
+            "rows": rows,
+            "inconsistency_ratio": inconsistency_ratio,
+            "group_size": group_size,
+            "selectivity": selectivity,
+            "method": method,
+            "repeats": repeats,
+            "timings_ns": timings,
+            "median_ns": int(np.median(timings)),
+            "min_ns": int(min(timings)),
+            "answers": len(result) if isinstance(result, (set, list)) else result,
+        })
+        print(f"rows={rows} ratio={inconsistency_ratio} group={group_size} selectivity={selectivity} "
+              f"{method}: {entries[-1]['median_ns'] / 1e6:.3f} ms")
+    return entries
+
+# Get the commit of a git repository (None outside of a git repository)
+def git_commit(path):
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=path, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Run the whole benchmark grid and get the machine-readable report
+# The synthetic datasets are written to CSV files in a temporary directory, one per (rows, ratio, group size)
+def run_benchmark(args, solver_path=None):
+    cavsat_solver = import_solver(solver_path)
+    entries = []
+    with tempfile.TemporaryDirectory(prefix="cavsat-datasets-") as dataset_dir:
+        for rows in args.rows:
+            for inconsistency_ratio in args.ratios:
+                for group_size in args.group_sizes:
+                    dataset_file = os.path.join(dataset_dir, f"{rows}_{inconsistency_ratio}_{group_size}.csv")
+                    write_dataset(generate_synthetic_dataset(rows, inconsistency_ratio, group_size, args.seed), dataset_file)
+                    for selectivity in args.selectivities:
+                        entries.extend(benchmark_case(cavsat_solver, dataset_file, rows, inconsistency_ratio, group_size,
+                                                      selectivity, args.warmup, args.repeats))
+    return {
+        "meta": {
+            "commit": git_commit(solver_path or os.path.dirname(os.path.abspath(__file__))),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "warmup": args.warmup,
+            "repeats": args.repeats,
+        },
+        "results": entries,
+    }
+
+# Run the benchmark against another commit, checked out in a temporary git worktree
+def run_benchmark_at_commit(args):
+    repository = subprocess.run(["git", "rev-parse", "--show-toplevel"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout.strip()
+    worktree = tempfile.mkdtemp(prefix="cavsat-benchmark-")
+    shutil.rmtree(worktree)
+    subprocess.run(["git", "worktree", "add", "--detach", worktree, args.commit], cwd=repository, check=True)
+    try:
+        return run_benchmark(args, os.path.join(worktree, "CAvSAT"))
+    finally:
+        subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=repository, check=True)
+
+# Save a report as JSON, and optionally as a flat CSV file
+def save_report(report, output_file, csv_file=None):
+    with open(output_file, mode='w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Benchmark results written to {output_file}")
+
+    if csv_file:
+        columns = ["rows", "inconsistency_ratio", "group_size", "selectivity", "method", "repeats", "median_ns", "min_ns", "answers"]
+        with open(csv_file, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["commit"] + columns)
+            for entry in report["results"]:
+                writer.writerow([report["meta"]["commit"]] + [entry[column] for column in columns])
+        print(f"Benchmark results written to {csv_file}")
+
+# Plot the scaling curves (median time against row count, one line per method) of a report
+def plot_scaling(report, plot_file):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for method in METHODS:
+        points = sorted((entry["rows"], entry["median_ns"] / 1e9) for entry in report["results"] if entry["method"] == method)
+        if points:
+            ax.plot([rows for rows, _ in points], [seconds for _, seconds in points], marker='o', label=method)
+    ax.set_xlabel('Rows')
+    ax.set_ylabel('Median Time (seconds)')
+    ax.set_title('Scaling by Dataset Size')
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    ax.legend()
+    plt.tight_layout()
+    fig.savefig(plot_file)
+    print(f"Scaling curves written to {plot_file}")
+
+# Compare two reports and print every case that got slower than the threshold
+# Returns the number of regressions
+def compare_reports(base, head, threshold):
+    def case_key(entry):
+        return (entry["rows"], entry["inconsistency_ratio"], entry["group_size"], entry["selectivity"], entry["method"])
+
+    base_entries = {case_key(entry): entry for entry in base["results"]}
+    regressions = 0
+    print(f"Base: {base['meta'].get('commit')}  Head: {head['meta'].get('commit')}")
+    for entry in head["results"]:
+        base_entry = base_entries.get(case_key(entry))
+        if base_entry is None or base_entry["median_ns"] == 0:
+            continue
+        ratio = entry["median_ns"] / base_entry["median_ns"]
+        status = "REGRESSION" if ratio > 1 + threshold else "ok"
+        regressions += status == "REGRESSION"
+        print(f"{status:>10}  {ratio:6.2f}x  rows={entry['rows']} ratio={entry['inconsistency_ratio']} "
+              f"group={entry['group_size']} selectivity={entry['selectivity']} {entry['method']}")
+    return regressions
+
+# Main function
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scalable synthetic benchmark for CAvSAT and the rewriting baselines")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmark grid")
+    run_parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    run_parser.add_argument("--ratios", type=float, nargs="+", default=[0.1, 0.25])
+    run_parser.add_argument("--group-sizes", type=int, nargs="+", default=[2])
+    run_parser.add_argument("--selectivities", type=float, nargs="+", default=[0.01, 0.1])
+    run_parser.add_argument("--warmup", type=int, default=1)
+    run_parser.add_argument("--repeats", type=int, default=3)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--commit", help="benchmark another commit (checked out in a temporary git worktree)")
+    run_parser.add_argument("--output", default="benchmark_results.json")
+    run_parser.add_argument("--csv")
+    run_parser.add_argument("--plot")
+
+    compare_parser = subparsers.add_parser("compare", help="compare two benchmark results for regressions")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        report = run_benchmark_at_commit(args) if args.commit else run_benchmark(args)
+        save_report(report, args.output, args.csv)
+        if args.plot:
+            plot_scaling(report, args.plot)
+    else:
+        with open(args.base) as file:
+            base = json.load(file)
+        with open(args.head) as file:
+            head = json.load(file)
+        sys.exit(1 if compare_reports(base, head, args.threshold) else 0)
@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import numpy as np
+from cavsat_solver import (BATCH_METHODS, CAvSAT, DEFAULT_SOLVER, And, Contains, DenialConstraint, Eq,
+                           FunctionalDependency, In, KeyConstraint, Mod, Or, Prefix, Range, ResultCache,
+                           load_data_from_csv, plot_performance_metrics)
+
+# Headless CQA server: datasets are loaded, indexed and encoded once and stay warm between requests
+# Clients send one JSON request per line over a unix socket (or a TCP port on localhost) and get one JSON
+# response per line, e.g. {"id": 1, "command": "solve", "dataset": "enrollments", "query": {"prefix": ["CourseName", "Math"]}}
+# Responses carry the id of their request; the requests of a connection are answered concurrently, so
+# responses may come back out of order
+
+# Predicates of query specifications, mapped to their classes: {"eq": [column, value]}, {"range": {"column": 2, "low": 2000}}, ...
+# The arguments are a list (positional) or an object (keywords); "and" and "or" take a list of query specifications
+PREDICATES = {"eq": Eq, "in": In, "range": Range, "prefix": Prefix, "contains": Contains, "mod": Mod}
+
+# Time metric of each method, plotted by the report command
+REPORT_METRICS = {
+    "SAT-Solver": "SAT Solving Time",
+    "KW-SQL-Rewriting": "KW-SQL Simulation Time",
+    "ConQuer-SQL-Rewriting": "ConQuer-SQL Simulation Time",
+    "Regular SQL Query": "SQL Simulation Time",
+}
+
+# Longest request line the server reads (large inserts), 64 MiB; clients reading responses with asyncio streams need
+# a similar limit, since the answers of a query are sent on a single line
+LINE_LIMIT = 64 * 1024 * 1024
+
+# Default key constraint of a loaded dataset (StudentID and CourseName, like cavsat_solver.py)
+DEFAULT_CONSTRAINTS = [{"key": [0, 3]}]
+
+# Build a query from its JSON specification
+def parse_query(spec):
+    if not isinstance(spec, dict) or len(spec) != 1:
+        raise ValueError(f"A query must be an object with a single predicate, got {spec!r}")
+    (name, arguments), = spec.items()
+    if name in ("and", "or"):
+        predicates = [parse_query(item) for item in arguments]
+        return And(*predicates) if name == "and" else Or(*predicates)
+    if name not in PREDICATES:
+        raise ValueError(f"Unknown predicate {name!r}")
+    if isinstance(arguments, dict):
+        return PREDICATES[name](**arguments)
+    return PREDICATES[name](*arguments)
+
+# Build the constraints of a dataset from their JSON specifications:
+# {"key": columns}, {"fd": [lhs columns, rhs columns]} or {"denial": [[left column, operator, right column], ...]}
+# Columns are names or indexes (key columns are resolved to indexes, which the SQL backend needs)
+def parse_constraints(specs, data):
+    constraints = []
+    for spec in specs:
+        if "key" in spec:
+            constraints.append(KeyConstraint([data.column_index(column) for column in spec["key"]]))
+        elif "fd" in spec:
+            lhs, rhs = spec["fd"]
+            constraints.append(FunctionalDependency(lhs, rhs))
+        elif "denial" in spec:
+            constraints.append(DenialConstraint(spec["denial"]))
+        else:
+            raise ValueError(f"Unknown constraint {spec!r}")
+    return constraints
+
+# Convert the NumPy values of a result (and sets of answers) to JSON
+def to_json(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+# Read/write lock of a dataset: any number of readers (queries) or a single writer (an update)
+# Waiting writers go first, so a steady stream of queries cannot starve an update
+class ReadWriteLock:
+
+    def __init__(self):
+        self.condition = asyncio.Condition()
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+
+    # Hold the lock as a reader
+    @asynccontextmanager
+    async def read(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: not self.writer and not self.waiting_writers)
+            self.readers += 1
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.readers -= 1
+                self.condition.notify_all()
+
+    # Hold the lock as the writer
+    @asynccontextmanager
+    async def write(self):
+        async with self.condition:
+            self.waiting_writers += 1
+            await self.condition.wait_for(lambda: not self.writer and not self.readers)
+            self.waiting_writers -= 1
+            self.writer = True
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.writer = False
+                self.condition.notify_all()
+
+# Dataset served by the server: one relation and its constraints, shared by every worker thread
+# Each worker thread queries its own CAvSAT system over the shared relation (its own solvers, component results
+# and SQLite connection, which cannot be shared between threads); an update runs on the system of one thread and
+# is added to an update log, which the systems of the other threads replay before their next query (see system)
+class Dataset:
+
+    def __init__(self, name, data, constraints, cache=None, solver=DEFAULT_SOLVER):
+        self.name = name
+        self.data = data
+        self.constraints = constraints
+        self.cache = cache
+        self.solver = solver
+        self.lock = ReadWriteLock()
+        self.generation = 0
+        self.local = threading.local()
+        # Updates not yet applied by the system of every thread: (row ids, affected rows, inserted) of
+        # updates first_update, first_update + 1, ...; applied holds the generation of the system of each thread
+        self.updates = []
+        self.first_update = 0
+        self.applied = {}
+
+    # Get the CAvSAT system of the current worker thread
+    # A system built before updates made on another thread replays them (only the affected rows are
+    # visited), so its SQLite backend, masks and component results stay warm
+    def system(self):
+        local = self.local
+        if not hasattr(local, "system"):
+            local.system = CAvSAT(self.data, self.constraints, solver=self.solver, cache=self.cache)
+            local.system.component_workers = 1
+            local.generation = self.generation
+        for row_ids, affected_rows, inserted in self.updates[local.generation - self.first_update:]:
+            local.system.apply_update(row_ids, affected_rows, inserted)
+        local.generation = self.applied[threading.get_ident()] = self.generation
+        local.system.performance_metrics = {}
+        return local.system
+
+    # Run a query on the system of the current worker thread
+    # Returns its result and its details (performance metrics, result state and number of undecided rows)
+    def run(self, method, *arguments, **options):
+        system = self.system()
+        result = getattr(system, method)(*arguments, **options)
+        return result, self.details(system)
+
+    # Run an update on the system of the current worker thread (under the write lock, so no system replays the
+    # log meanwhile); the updates every system has applied are dropped from the log
+    def update(self, method, records):
+        system = self.system()
+        row_ids, affected_rows = system.update(records, inserted=method == "insert")
+        self.updates.append((row_ids, affected_rows, method == "insert"))
+        self.generation += 1
+        self.local.generation = self.applied[threading.get_ident()] = self.generation
+        applied = min(self.applied.values())
+        del self.updates[:applied - self.first_update]
+        self.first_update = applied
+        return len(row_ids), self.details(system)
+
+    # Get the details of the last method run by a system
+    def details(self, system):
+        return {"metrics": dict(system.performance_metrics), "state": system.result_state, "undecided": len(system.undecided_rows)}
+
+    # Get the status of the dataset
+    def status(self):
+        live_rows = len(self.data) if self.data.deleted is None else int((~self.data.deleted).sum())
+        return {"rows": live_rows, "header": list(self.data.header), "generation": self.generation,
+                "constraints": [constraint.describe(self.data.header) for constraint in self.constraints]}
+
+# Server answering CQA requests over warm datasets
+# CPU-bound work (loading, encoding, solving) runs on a pool of worker threads: threads rather than processes,
+# so the warm relations, indexes and results are shared and updated in place (every SAT and MaxSAT call goes
+# through solve_limited or an interruptible compute, which release the GIL, as NumPy does while it works);
+# the event loop only parses requests, takes the locks and writes responses
+class CAvSATServer:
+
+    def __init__(self, workers=None, cache=None, solver=DEFAULT_SOLVER):
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1, thread_name_prefix="cavsat")
+        self.cache = cache
+        self.solver = solver
+        self.datasets = {}
+        self.loading = asyncio.Lock()
+        self.plotting = asyncio.Lock()
+        self.stopped = None
+        self.server = None
+        self.connections = {}
+        self.commands = {
+            "load": self.load,
+            "solve": self.solve,
+            "aggregate": self.aggregate,
+            "insert": self.insert,
+            "delete": self.delete,
+            "status": self.status,
+            "report": self.report,
+            "shutdown": self.shutdown,
+        }
+
+    # Run a function on the worker pool
+    async def run_in_worker(self, function, *arguments):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *arguments)
+
+    # Get a loaded dataset
+    def dataset(self, request):
+        name = request.get("dataset")
+        if name not in self.datasets:
+            raise KeyError(f"Unknown dataset {name!r}")
+        return self.datasets[name]
+
+    # Load a dataset from a CSV file, build its constraints and warm it up (conflict components and consistent rows)
+    # Loading a dataset under a name that is already loaded replaces it
+    async def load(self, request):
+        async with self.loading:
+            dataset = await self.run_in_worker(self.load_dataset, request["dataset"], request["path"],
+                                               request.get("constraints", DEFAULT_CONSTRAINTS), request.get("snapshot", True))
+            self.datasets[dataset.name] = dataset
+        return dataset.status()
+
+    # Load and warm up a dataset (on a worker thread)
+    def load_dataset(self, name, path, constraint_specs, snapshot=True):
+        key_columns = next((tuple(spec["key"]) for spec in constraint_specs if "key" in spec), None)
+        if key_columns is not None and not all(isinstance(column, int) for column in key_columns):
+            key_columns = None
+        data = load_data_from_csv(path, snapshot=snapshot, key_columns=key_columns)
+        dataset = Dataset(name, data, parse_constraints(constraint_specs, data), self.cache, self.solver)
+        system = dataset.system()
+        system.prepare()
+        system.get_consistent_mask()
+        return dataset
+
+    # Answer a query with one of the methods of the batch runner (the SAT solver by default)
+    async def solve(self, request):
+        dataset = self.dataset(request)
+        method = request.get("method", "SAT-Solver")
+        if method not in BATCH_METHODS:
+            raise ValueError(f"Unknown method {method!r}")
+        query = parse_query(request["query"]).bind(dataset.data.header)
+        options = {"time_budget": request["time_budget"]} if method == "SAT-Solver" and "time_budget" in request else {}
+        async with dataset.lock.read():
+            answers, details = await self.run_in_worker(functools.partial(dataset.run, BATCH_METHODS[method], query, **options))
+        response = {"answers": None if answers is None else sorted(answers), "metrics": details["metrics"]}
+        if method == "SAT-Solver":
+            response["state"] = details["state"]
+            response["undecided"] = details["undecided"]
+        return response
+
+    # Get the range of an aggregate over all repairs (a list of groups with their bounds with group_by)
+    async def aggregate(self, request):
+        dataset = self.dataset(request)
+        query = parse_query(request["query"]).bind(dataset.data.header)
+        async with dataset.lock.read():
+            bounds, details = await self.run_in_worker(dataset.run, "aggregate", query, request["function"],
+                                                       request.get("column"), request.get("group_by"))
+        if isinstance(bounds, dict):
+            bounds = [{"group": list(group), "bounds": list(group_bounds)} for group, group_bounds in sorted(bounds.items())]
+        return {"bounds": bounds, "state": details["state"], "metrics": details["metrics"]}
+
+    # Insert records into a dataset
+    async def insert(self, request):
+        return await self.update(request, "insert")
+
+    # Delete records from a dataset
+    async def delete(self, request):
+        return await self.update(request, "delete")
+
+    # Run an update of a dataset while no query runs on it
+    async def update(self, request, method):
+        dataset = self.dataset(request)
+        records = [tuple(str(value) for value in record) for record in request["records"]]
+        async with dataset.lock.write():
+            rows, details = await self.run_in_worker(dataset.update, method, records)
+        return {"rows": rows, "metrics": details["metrics"]}
+
+    # Get the status of the server: its datasets and the statistics of the result cache
+    async def status(self, request):
+        return {"datasets": {name: dataset.status() for name, dataset in self.datasets.items()},
+                "cache": None if self.cache is None else dict(self.cache.stats)}
+
+    # Run every method on some queries and save the performance plots as {output}_solving_times.png and
+    # {output}_method_times.png (matplotlib is only imported by this command)
+    async def report(self, request):
+        dataset = self.dataset(request)
+        queries = [parse_query(spec).bind(dataset.data.header) for spec in request["queries"]]
+        labels = request.get("labels") or [f"Query {index + 1}" for index in range(len(queries))]
+        times = {method: [] for method in BATCH_METHODS}
+        encoding_time = 0
+        async with dataset.lock.read():
+            for query in queries:
+                for method, function in BATCH_METHODS.items():
+                    _, details = await self.run_in_worker(dataset.run, function, query)
+                    times[method].append(details["metrics"].get(REPORT_METRICS[method], 0))
+                    encoding_time = max(encoding_time, details["metrics"].get("Encoding Time", 0))
+        output = request.get("output", f"{dataset.name}_report")
+        async with self.plotting:
+            await self.run_in_worker(plot_performance_metrics, labels, encoding_time, times["SAT-Solver"], times["KW-SQL-Rewriting"],
+                                     times["ConQuer-SQL-Rewriting"], times["Regular SQL Query"], output)
+        return {"times": times, "encoding_time": encoding_time, "files": [f"{output}_solving_times.png", f"{output}_method_times.png"]}
+
+    # Stop the server once the response has been sent
+    async def shutdown(self, request):
+        asyncio.get_running_loop().call_soon(self.stopped.set)
+        return {"stopping": True}
+
+    # Answer one request; errors are reported in the response instead of closing the connection
+    async def handle_request(self, line):
+        start = time.perf_counter()
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            command = request.get("command")
+            if command not in self.commands:
+                raise ValueError(f"Unknown command {command!r}")
+            response = {"id": request_id, "ok": True, "result": await self.commands[command](request)}
+        except Exception as error:
+            response = {"id": request_id, "ok": False, "error": f"{type(error).__name__}: {error}"}
+        response["time"] = time.perf_counter() - start
+        return response
+
+    # Answer the requests of a connection concurrently, writing each response as soon as it is ready
+    async def handle_client(self, reader, writer):
+        writing = asyncio.Lock()
+        tasks = set()
+        self.connections[asyncio.current_task()] = writer
+
+        async def answer(line):
+            response = await self.handle_request(line)
+            async with writing:
+                writer.write(json.dumps(response, default=to_json).encode() + b"\n")
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.create_task(answer(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            self.connections.pop(asyncio.current_task(), None)
+            writer.close()
+
+    # Serve requests on a unix socket, or on a TCP port of localhost, until a shutdown request
+    async def serve(self, socket_path=None, port=None, preload=()):
+        self.stopped = asyncio.Event()
+        for name, path in preload:
+            await self.load({"dataset": name, "path": path})
+        if port is not None:
+            self.server = await asyncio.start_server(self.handle_client, "127.0.0.1", port, limit=LINE_LIMIT)
+            address = f"127.0.0.1:{port}"
+        else:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.server = await asyncio.start_unix_server(self.handle_client, socket_path, limit=LINE_LIMIT)
+            address = socket_path
+        print(f"CAvSAT server listening on {address}", flush=True)
+        try:
+            async with self.server:
+                await self.stopped.wait()
+
+                # Close the open connections (their requests in flight are still answered) before stopping
+                for writer in list(self.connections.values()):
+                    writer.close()
+                await asyncio.gather(*self.connections, return_exceptions=True)
+        finally:
+            self.executor.shutdown(wait=True)
+            if port is None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless CAvSAT server answering consistent queries over warm datasets")
+    parser.add_argument("--socket", default="cavsat.sock", help="unix socket to listen on")
+    parser.add_argument("--port", type=int, help="listen on this TCP port of localhost instead of a unix socket")
+    parser.add_argument("--workers", type=int, help="number of worker threads (default: the number of CPUs)")
+    parser.add_argument("--cache", default=".cavsat_cache", help="directory of the result cache ('' for a memory-only cache)")
+    parser.add_argument("--solver", default=DEFAULT_SOLVER)
+    parser.add_argument("--load", action="append", default=[], metavar="NAME=PATH", help="load a dataset (with its default key) at startup")
+    args = parser.parse_args()
+
+    preload = [tuple(item.split("=", 1)) for item in args.load]
+    server = CAvSATServer(args.workers, ResultCache(args.cache or None), args.solver)
+    asyncio.run(server.serve(args.socket, args.port, preload))
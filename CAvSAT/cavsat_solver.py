@@ -1,149 +1,3494 @@
+import copy
 import csv
+import errno
+import hashlib
+import itertools
+import json
+import mmap
+import multiprocessing
+import os
+import pickle
+import queue
+import shutil
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
 import time
-from pysat.solvers import Glucose3
-import matplotlib.pyplot as plt
+import tracemalloc
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from pysat.card import CardEnc, EncType
+from pysat.examples.rc2 import RC2
+from pysat.formula import WCNF
+from pysat.solvers import Solver
 import numpy as np
 
+# Peak RSS is read from the resource module, which only exists on Unix
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Structured per-phase profiler (load, index build, encode, solve, extract, ...)
+# Every phase records its wall and CPU time, the peak RSS of the process, optionally the tracemalloc deltas,
+# and any counters the caller adds (variables, clauses, solver statistics); the records can be exported
+# as JSON lines or as a Chrome trace file (chrome://tracing, Perfetto)
+# Wall time is always measured so the flat performance metrics keep working; everything else is only
+# collected when the profiler is enabled and the current operation was sampled
+class Profiler:
+
+    # Initialize the profiler
+    # sample_rate is the fraction of operations (e.g. queries) that are profiled, and trace_memory turns on
+    # tracemalloc, which is the only expensive part of the profiler
+    def __init__(self, enabled=True, sample_rate=1.0, trace_memory=False):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.trace_memory = trace_memory
+        self.sampled = True
+        self.depth = 0
+        self.records = []
+        if enabled and trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # Decide whether the next operation is profiled
+    def sample(self):
+        self.sampled = self.enabled and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+        return self.sampled
+
+    # Profile a phase; the yielded record can be filled with counters by the caller,
+    # and holds the wall time of the phase (wall_ns) once the phase is over
+    @contextmanager
+    def phase(self, name, **counters):
+        record = {"phase": name}
+        record.update(counters)
+        active = self.enabled and self.sampled
+        if active:
+            self.depth += 1
+            cpu_start = time.process_time_ns()
+            if self.trace_memory:
+                memory_start = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+        start = time.perf_counter_ns()
+        try:
+            yield record
+        finally:
+            end = time.perf_counter_ns()
+            record["wall_ns"] = end - start
+            if active:
+                self.depth -= 1
+                record["start_ns"] = start
+                record["cpu_ns"] = time.process_time_ns() - cpu_start
+                record["depth"] = self.depth
+                record["pid"] = os.getpid()
+                if resource is not None:
+                    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                    record["peak_rss_kb"] = peak_rss // 1024 if sys.platform == "darwin" else peak_rss
+                if self.trace_memory:
+                    memory_end, memory_peak = tracemalloc.get_traced_memory()
+                    record["memory_delta_bytes"] = memory_end - memory_start
+                    record["memory_peak_bytes"] = memory_peak - memory_start
+                self.records.append(record)
+
+    # Get the total wall time, CPU time and number of calls of every phase
+    def summary(self):
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record["phase"], {"calls": 0, "wall_ns": 0, "cpu_ns": 0})
+            total["calls"] += 1
+            total["wall_ns"] += record["wall_ns"]
+            total["cpu_ns"] += record.get("cpu_ns", 0)
+        return totals
+
+    # Export the records as JSON lines (one phase per line)
+    def export_jsonl(self, file_path):
+        with open(file_path, mode='w') as file:
+            for record in self.records:
+                file.write(json.dumps(record, default=int) + "\n")
+
+    # Export the records as a Chrome trace file (complete events, one track per process)
+    def export_chrome_trace(self, file_path):
+        origin = min((record["start_ns"] for record in self.records), default=0)
+        events = []
+        for record in self.records:
+            arguments = {key: value for key, value in record.items() if key not in ("phase", "start_ns", "wall_ns", "pid", "depth")}
+            events.append({
+                "name": record["phase"],
+                "ph": "X",
+                "ts": (record["start_ns"] - origin) / 1000,
+                "dur": record["wall_ns"] / 1000,
+                "pid": record["pid"],
+                "tid": 0,
+                "args": arguments,
+            })
+        with open(file_path, mode='w') as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, default=int)
+
+# Number of rows decoded at a time when iterating over the rows of a relation
+ROW_BLOCK_SIZE = 4096
+
+# Default number of rows per chunk when streaming a CSV file
+CHUNK_SIZE = 100000
+
+# Minimum number of conflict components to solve before they are spread over a process pool
+PARALLEL_COMPONENTS = 5000
+
+# Performance metrics that count things instead of timing them (printed as plain numbers)
+COUNTER_METRICS = {"Undecided Rows", "Cache Hits", "Cache Misses", "Witnesses"}
+
+# Default SAT solver (any pysat solver name, e.g. "g3", "g4", "cd15" or "mcb")
+DEFAULT_SOLVER = "g3"
+
+# Minimum number of variables of a conflict component before a portfolio of solvers is raced on it
+# (smaller components are solved by the first solver of the portfolio)
+PORTFOLIO_MIN_VARIABLES = 64
+
+# Time given to the interrupted solvers of a portfolio race to report, past the deadline (in seconds)
+RACE_GRACE_SECONDS = 0.1
+
+# Version of the entries of the result cache, part of every cache key (bump it when an encoding or a result changes)
+CACHE_VERSION = 2
+
+# Integer column (e.g. StudentID, CourseID) stored as an int64 array
+class IntColumn:
+
+    # Initialize the column with its integer values
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.int64)
+
+    # Get the number of values in the column
+    def __len__(self):
+        return len(self.values)
+
+    # Decode the values of the given rows back to their text form
+    def decode(self, row_ids):
+        return [str(value) for value in self.values[row_ids].tolist()]
+
+    # Decode the value of a single row
+    def decode_one(self, row_id):
+        return str(int(self.values[row_id]))
+
+    # Get the integer codes used to group and compare rows
+    def codes(self):
+        return self.values
+
+    # Get a new column holding only the given rows
+    def take(self, row_ids):
+        return IntColumn(self.values[row_ids])
+
+    # Get the code of a text value (None if it is not an integer that fits in the column)
+    def code_of(self, value):
+        try:
+            code = int(value)
+        except ValueError:
+            return None
+        return code if -2 ** 63 <= code < 2 ** 63 else None
+
+    # Append text values at the end of the column (in amortized time, see append_array)
+    def append(self, values):
+        self.values = append_array(self.values, [int(value) for value in values])
+
+# Dictionary-encoded categorical column (e.g. names, courses, instructors):
+# every distinct string is stored once and each row only keeps an int32 code into that dictionary
+class DictColumn:
+
+    # Initialize the column with its codes and its dictionary of distinct strings (sorted when the column is built)
+    def __init__(self, codes, dictionary):
+        self.codes_ = np.asarray(codes, dtype=np.int32)
+        self.dictionary = np.asarray(dictionary, dtype=str)
+        self.code_lookup = None
+        self.lock = threading.Lock()
+
+    # The lock is not pickled, so the column can be sent to other processes
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    # Build a dictionary-encoded column from a list of strings
+    @classmethod
+    def encode(cls, values):
+        dictionary, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        return cls(codes, dictionary)
+
+    # Get the number of values in the column
+    def __len__(self):
+        return len(self.codes_)
+
+    # Decode the values of the given rows back to their strings
+    def decode(self, row_ids):
+        return self.dictionary[self.codes_[row_ids]].tolist()
+
+    # Decode the value of a single row
+    def decode_one(self, row_id):
+        return str(self.dictionary[self.codes_[row_id]])
+
+    # Get the integer codes used to group and compare rows
+    def codes(self):
+        return self.codes_
+
+    # Get a new column holding only the given rows (the dictionary is shared)
+    def take(self, row_ids):
+        return DictColumn(self.codes_[row_ids], self.dictionary)
+
+    # Get the code of a string (None if it is not in the dictionary)
+    # The map from strings to codes is built under a lock the first time, since the threads of a server share the column
+    def code_of(self, value):
+        if self.code_lookup is None:
+            with self.lock:
+                if self.code_lookup is None:
+                    self.code_lookup = {string: code for code, string in enumerate(self.dictionary.tolist())}
+        return self.code_lookup.get(value)
+
+    # Append strings at the end of the column (in amortized time, see append_array)
+    # Strings that are not in the dictionary yet are added at its end, so the codes of existing rows never change
+    # (the dictionary is copied when a new string is longer than its strings)
+    def append(self, values):
+        codes = []
+        new_strings = []
+        for value in values:
+            code = self.code_of(value)
+            if code is None:
+                code = len(self.code_lookup)
+                self.code_lookup[value] = code
+                new_strings.append(value)
+            codes.append(code)
+        if new_strings:
+            new_strings = np.asarray(new_strings, dtype=str)
+            if new_strings.dtype.itemsize <= self.dictionary.dtype.itemsize:
+                self.dictionary = append_array(self.dictionary, new_strings)
+            else:
+                self.dictionary = np.concatenate([self.dictionary, new_strings])
+        self.codes_ = append_array(self.codes_, codes)
+
+# Check whether every value of a text column round-trips through int64 unchanged
+def is_integer_column(values):
+    try:
+        return all(str(int(value)) == value for value in values) and len(values) > 0
+    except (TypeError, ValueError):
+        return False
+
+# Assign a dense group id to every row based on the values of several integer code arrays
+# Returns the group id of each row and the size of each group
+def dense_group_ids(code_arrays):
+    dense_codes = []
+    radix = 1
+    for codes in code_arrays:
+        unique_codes, inverse = np.unique(codes, return_inverse=True)
+        dense_codes.append(inverse.astype(np.int64))
+        radix *= max(len(unique_codes), 1)
+
+    if not dense_codes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Combine the columns into one integer key when it fits in 64 bits, otherwise group on the rows
+    if radix < 2 ** 62:
+        combined = np.zeros(len(dense_codes[0]), dtype=np.int64)
+        for codes in dense_codes:
+            combined = combined * (codes.max(initial=0) + 1) + codes
+        _, group_of_row, group_sizes = np.unique(combined, return_inverse=True, return_counts=True)
+    else:
+        _, group_of_row, group_sizes = np.unique(np.stack(dense_codes, axis=1), axis=0, return_inverse=True, return_counts=True)
+    return group_of_row.reshape(-1).astype(np.int64), group_sizes.astype(np.int64)
+
+# Get the edges that connect each of the given rows to the smallest of them in the same group (a star per group)
+def group_edges(rows, groups):
+    first_rows = np.full(int(groups.max(initial=-1)) + 1, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first_rows, groups, rows)
+    return rows, first_rows[groups]
+
+# Label the connected components of a graph over count nodes, given its edges (left[i], right[i])
+# Vectorized union-find: each round hooks the root of the larger end of every edge between two trees onto the
+# other root, then points every node straight at its root (pointer jumping), so the label of a component is its
+# smallest node; edges inside a tree are dropped, and a round at least halves the trees an edge still joins
+def connected_components(count, left, right):
+    parent = np.arange(count, dtype=np.int64)
+    while len(left):
+        left_roots, right_roots = parent[left], parent[right]
+        crossing = left_roots != right_roots
+        if not crossing.any():
+            break
+        left, right = left[crossing], right[crossing]
+        left_roots, right_roots = left_roots[crossing], right_roots[crossing]
+        np.minimum.at(parent, np.maximum(left_roots, right_roots), np.minimum(left_roots, right_roots))
+        while True:
+            roots = parent[parent]
+            if np.array_equal(roots, parent):
+                break
+            parent = roots
+    return parent
+
+# Buffers with spare capacity behind the arrays grown by append_array: id of the buffer -> (weak reference
+# to the buffer, number of its items in use)
+append_buffers = {}
+append_lock = threading.Lock()
+
+# Append values at the end of a 1-d array in amortized O(len(values)) time and get the longer array
+# The array is a prefix view of a buffer that doubles its capacity when it is full, so an update does not copy
+# the whole array (or column) every time; an array that does not end at the used part of its buffer (a memory-mapped
+# array, or an older view of an array that was appended to since) is copied into a new buffer instead
+def append_array(array, values):
+    values = np.asarray(values, dtype=array.dtype)
+    length = len(array) + len(values)
+    with append_lock:
+        buffer = array.base
+        entry = append_buffers.get(id(buffer)) if isinstance(buffer, np.ndarray) else None
+        if entry is not None and entry[0]() is buffer and entry[1] == len(array) and length <= len(buffer) \
+                and array.ctypes.data == buffer.ctypes.data and array.strides == buffer.strides:
+            buffer[len(array):length] = values
+            append_buffers[id(buffer)] = (entry[0], length)
+        else:
+            buffer = np.empty(max(2 * length, 16), dtype=array.dtype)
+            buffer[:len(array)] = array
+            buffer[len(array):length] = values
+            append_buffers[id(buffer)] = (weakref.ref(buffer, lambda _, key=id(buffer): append_buffers.pop(key, None)), length)
+    return buffer[:length]
+
+# Hash the codes of several columns into one uint64 per row (a multiply-xorshift mix of every column)
+def hash_codes(code_arrays):
+    hashes = np.zeros(len(code_arrays[0]) if code_arrays else 0, dtype=np.uint64)
+    for codes in code_arrays:
+        hashes ^= np.asarray(codes).astype(np.uint64)
+        hashes *= np.uint64(0x9E3779B97F4A7C15)
+        hashes ^= hashes >> np.uint64(31)
+    return hashes
+
+# Map from the codes of several columns to an id (a key group, a distinct tuple), for the few keys of an update
+# The hashes of the codes of every id are sorted once (vectorized, so it can be built with an index and stored
+# in a snapshot); a lookup is a binary search on the hash followed by a check of the actual codes, and the ids
+# added later are kept in a small dictionary
+class CodeLookup:
+
+    # Initialize the lookup from the sorted hashes, the id of each sorted hash and the code arrays of the ids
+    # (code_arrays[c][i] is the code of column c of id i, e.g. the codes of the first row of a key group)
+    def __init__(self, sorted_hashes, hash_order, code_arrays):
+        self.sorted_hashes = sorted_hashes
+        self.hash_order = hash_order
+        self.code_arrays = code_arrays
+        self.added = {}
+
+    # Get the sorted hashes and the id of each sorted hash of the code arrays of the ids
+    # (equal hashes are all checked by a lookup, so their order does not matter and the faster unstable sort is used)
+    @staticmethod
+    def build(code_arrays):
+        hashes = hash_codes(code_arrays)
+        hash_order = np.argsort(hashes)
+        return hashes[hash_order], hash_order
+
+    # Get the number of ids
+    def __len__(self):
+        return len(self.hash_order) + len(self.added)
+
+    # Get the id of each row of the given code arrays (-1 for codes that have no id)
+    def find(self, code_arrays):
+        code_arrays = [np.asarray(codes, dtype=np.int64) for codes in code_arrays]
+        hashes = hash_codes(code_arrays)
+        starts = np.searchsorted(self.sorted_hashes, hashes, side="left")
+        ends = np.searchsorted(self.sorted_hashes, hashes, side="right")
+        ids = np.full(len(hashes), -1, dtype=np.int64)
+        for row, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+            for candidate in self.hash_order[start:end].tolist():
+                if all(codes[candidate] == wanted[row] for codes, wanted in zip(self.code_arrays, code_arrays)):
+                    ids[row] = candidate
+                    break
+            else:
+                if self.added:
+                    ids[row] = self.added.get(tuple(int(wanted[row]) for wanted in code_arrays), -1)
+        return ids
+
+    # Get the id of each row of the given code arrays, giving new ids (in order) to the codes that have none
+    def find_or_add(self, code_arrays):
+        ids = self.find(code_arrays)
+        for row in np.flatnonzero(ids < 0).tolist():
+            ids[row] = self.added.setdefault(tuple(int(codes[row]) for codes in code_arrays), len(self))
+        return ids
+
+# Sorted index over the codes (dictionary column) or values (integer column) of a column
+# Equality and IN lookups become posting-list probes and integer ranges become two binary searches
+class ColumnIndex:
+
+    # Build the index from the codes or values of a column
+    def __init__(self, keys):
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    # Get the ids of the rows whose code or value is one of the given keys
+    def lookup(self, keys):
+        keys = np.asarray(keys, dtype=self.sorted_keys.dtype)
+        starts = np.searchsorted(self.sorted_keys, keys, side="left")
+        ends = np.searchsorted(self.sorted_keys, keys, side="right")
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate([self.order[start:end] for start, end in zip(starts.tolist(), ends.tolist())]))
+
+    # Get the ids of the rows whose value lies in a range (either bound may be left open)
+    def range(self, low=None, high=None, include_low=True, include_high=True):
+        start = 0 if low is None else np.searchsorted(self.sorted_keys, low, side="left" if include_low else "right")
+        end = len(self.sorted_keys) if high is None else np.searchsorted(self.sorted_keys, high, side="right" if include_high else "left")
+        return np.sort(self.order[start:end])
+
+# Typed columnar relation: int64 columns for integer fields and dictionary-encoded columns for the rest
+# Callers that iterate over records keep working through a lazy row view that decodes rows as tuples
+# The structures built on first use (column indexes, tuple ids and their lookup table, the fingerprint) are built
+# under a lock, so the threads of a server can query one relation; updates need exclusive access
+class Relation:
+
+    # Initialize the relation with its header and its columns
+    def __init__(self, header, columns):
+        self.header = list(header)
+        self.columns = list(columns)
+        self.tuple_of_row = None
+        self.tuple_lookup = None
+        self.indexes = {}
+        self.indexed_rows = None
+        self.key_indexes = {}
+        self.content_hash = None
+        self.deleted = None
+        self.lock = threading.RLock()
+
+    # The lock is not pickled, so the relation can be sent to other processes
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    # Build a relation from a list of text records
+    # The type of each column is inferred from its values, unless integer_columns gives the indexes of the integer
+    # columns (e.g. the types of the first chunk of a stream, so every chunk gets the same types)
+    @classmethod
+    def from_rows(cls, rows, header=None, integer_columns=None):
+        rows = [tuple(row) for row in rows]
+        if header is None:
+            header = [f"Column{i}" for i in range(len(rows[0]) if rows else 0)]
+        columns = []
+        for index, values in enumerate(zip(*rows) if rows else [() for _ in header]):
+            values = list(values)
+            if integer_columns is None:
+                integer = is_integer_column(values)
+            else:
+                integer = index in integer_columns
+                if integer and values and not is_integer_column(values):
+                    raise ValueError(f"Column {header[index]!r} holds values that are not integers")
+            if integer:
+                columns.append(IntColumn([int(value) for value in values]))
+            else:
+                columns.append(DictColumn.encode(values))
+        return cls(header, columns)
+
+    # Get the number of rows in the relation
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    # Get a single row as a tuple of strings
+    def __getitem__(self, row_id):
+        return tuple(column.decode_one(row_id) for column in self.columns)
+
+    # Iterate over the (live) rows as tuples of strings
+    def __iter__(self):
+        return self.records()
+
+    # Iterate over the rows as tuples of strings, decoding one block of rows at a time
+    # Deleted rows are skipped unless include_deleted is set (then the n-th record is row n)
+    def records(self, include_deleted=False):
+        for start in range(0, len(self), ROW_BLOCK_SIZE):
+            block = slice(start, min(start + ROW_BLOCK_SIZE, len(self)))
+            records = zip(*(column.decode(block) for column in self.columns))
+            if self.deleted is None or include_deleted:
+                yield from records
+            else:
+                yield from itertools.compress(records, (~self.deleted[block]).tolist())
+
+    # Get the rows with the given row ids as a list of tuples
+    def rows(self, row_ids):
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        if not self.columns or len(row_ids) == 0:
+            return []
+        return list(zip(*(column.decode(row_ids) for column in self.columns)))
+
+    # Get the position of a column from its name or its index
+    def column_index(self, column):
+        if isinstance(column, str):
+            return self.header.index(column)
+        return column
+
+    # Get a column from its name or its index
+    def column(self, column):
+        return self.columns[self.column_index(column)]
+
+    # Get a new relation holding only the given rows
+    def take(self, row_ids):
+        return Relation(self.header, [column.take(row_ids) for column in self.columns])
+
+    # Get the sorted index of a column (built the first time it is probed)
+    # Every index covers the same first indexed_rows rows (all rows when it is None), see append_rows
+    def index(self, column):
+        column_index = self.column_index(column)
+        index = self.indexes.get(column_index)
+        if index is None:
+            with self.lock:
+                if not self.indexes:
+                    self.indexed_rows = None
+                if column_index not in self.indexes:
+                    keys = self.columns[column_index].codes()
+                    self.indexes[column_index] = ColumnIndex(keys if self.indexed_rows is None else keys[:self.indexed_rows])
+                index = self.indexes[column_index]
+        return index
+
+    # Get the ids of the rows appended since the column indexes were built (they are scanned instead of probed)
+    def unindexed_rows(self):
+        if self.indexed_rows is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.arange(self.indexed_rows, len(self), dtype=np.int64)
+
+    # Append text records at the end of the relation and get their row ids
+    # The column indexes are kept and the new rows are scanned by select_rows, until they reach
+    # an eighth of the indexed rows and the indexes are rebuilt on the next probe; the key-group indexes computed
+    # before are dropped (constraints built later compute their own)
+    def append_rows(self, records):
+        records = [tuple(record) for record in records]
+        start = len(self)
+        row_ids = np.arange(start, start + len(records), dtype=np.int64)
+        if not records:
+            return row_ids
+
+        if self.tuple_of_row is not None:
+            self.tuple_lookup_table()
+        for column, values in zip(self.columns, zip(*records)):
+            column.append(values)
+
+        # New rows share the tuple id of an identical existing row, if there is one
+        if self.tuple_of_row is not None:
+            new_tuples = self.tuple_lookup.find_or_add([column.codes()[row_ids] for column in self.columns])
+            self.tuple_of_row = append_array(self.tuple_of_row, new_tuples)
+
+        if self.deleted is not None:
+            self.deleted = append_array(self.deleted, np.zeros(len(records), dtype=bool))
+        if self.indexes and self.indexed_rows is None:
+            self.indexed_rows = start
+        if self.indexed_rows is not None and len(self) - self.indexed_rows > max(ROW_BLOCK_SIZE, self.indexed_rows // 8):
+            self.indexes = {}
+            self.indexed_rows = None
+        self.key_indexes = {}
+        self.update_fingerprint("insert", json.dumps(records).encode())
+        return row_ids
+
+    # Mark rows as deleted (row ids are never reused, deleted rows are skipped by queries and constraints)
+    # The key-group indexes computed before an update are dropped (constraints built later compute their own)
+    def delete_rows(self, row_ids):
+        if self.deleted is None:
+            self.deleted = np.zeros(len(self), dtype=bool)
+        self.deleted[row_ids] = True
+        self.key_indexes = {}
+        self.update_fingerprint("delete", np.asarray(row_ids, dtype=np.int64).tobytes())
+
+    # Derive the fingerprint after an update from the previous fingerprint and the update itself,
+    # so it costs O(update) and never a new pass over the columns (nothing to do while it is not computed yet)
+    def update_fingerprint(self, kind, delta):
+        if self.content_hash is not None:
+            digest = hashlib.sha256(self.content_hash.encode())
+            digest.update(kind.encode())
+            digest.update(delta)
+            self.content_hash = digest.hexdigest()
+
+    # Get a hash of the content of the relation (computed once, then chained through every update)
+    # A relation loaded from a snapshot uses the sha256 of its source file
+    def fingerprint(self):
+        if self.content_hash is None:
+            with self.lock:
+                if self.content_hash is None:
+                    digest = hashlib.sha256(json.dumps(self.header).encode())
+                    for column in self.columns:
+                        if isinstance(column, DictColumn):
+                            digest.update(column.codes_.tobytes())
+                            digest.update("\0".join(column.dictionary.tolist()).encode())
+                        else:
+                            digest.update(column.values.tobytes())
+                    if self.deleted is not None:
+                        digest.update(np.packbits(self.deleted).tobytes())
+                    self.content_hash = digest.hexdigest()
+        return self.content_hash
+
+    # Get the mask of the rows that are not deleted
+    def live_mask(self):
+        if self.deleted is None:
+            return np.ones(len(self), dtype=bool)
+        return ~self.deleted
+
+    # Get whether each of the given rows is live (only those rows are visited)
+    def is_live(self, row_ids):
+        if self.deleted is None:
+            return np.ones(len(row_ids), dtype=bool)
+        return ~self.deleted[row_ids]
+
+    # Evaluate a query over the relation (or over some of its rows) as a boolean mask
+    # Queries that know how to compute their own mask over whole columns are used as is,
+    # any other callable is evaluated one row at a time
+    def mask(self, query, row_ids=None):
+        if hasattr(query, "mask"):
+            return query.mask(self, row_ids)
+        if row_ids is None:
+            return np.fromiter((query(record) for record in self.records(include_deleted=True)), dtype=bool, count=len(self))
+        records = self.rows(row_ids)
+        return np.fromiter((query(record) for record in records), dtype=bool, count=len(records))
+
+    # Group the rows on some columns; returns the group id of each row and the size of each group
+    def group_ids(self, columns):
+        return dense_group_ids([self.column(column).codes() for column in columns])
+
+    # Get the id of the distinct tuple of each row (exact duplicate rows share the same id)
+    def tuple_ids(self):
+        if self.tuple_of_row is None:
+            with self.lock:
+                if self.tuple_of_row is None:
+                    self.tuple_of_row, _ = self.group_ids(range(len(self.columns)))
+        return self.tuple_of_row
+
+    # Get the map from the codes of each distinct tuple to its tuple id (built once per relation, see CodeLookup)
+    def tuple_lookup_table(self):
+        if self.tuple_lookup is None:
+            with self.lock:
+                if self.tuple_lookup is None:
+                    tuple_of_row = self.tuple_ids()
+                    tuple_rows = np.zeros(int(tuple_of_row.max(initial=-1)) + 1, dtype=np.int64)
+                    tuple_rows[tuple_of_row] = np.arange(len(tuple_of_row))
+                    code_arrays = [column.codes()[tuple_rows] for column in self.columns]
+                    self.tuple_lookup = CodeLookup(*CodeLookup.build(code_arrays), code_arrays)
+        return self.tuple_lookup
+
+    # Get the tuple id of each text record (-1 for a record that is not in the relation)
+    def find_tuple_ids(self, records):
+        tuple_lookup = self.tuple_lookup_table()
+        codes = [tuple(column.code_of(value) for column, value in zip(self.columns, record)) if len(record) == len(self.columns) else None
+                 for record in records]
+        known = [i for i, record_codes in enumerate(codes) if record_codes is not None and None not in record_codes]
+        tuple_ids = np.full(len(records), -1, dtype=np.int64)
+        if known:
+            tuple_ids[known] = tuple_lookup.find([np.asarray(column_codes, dtype=np.int64) for column_codes in zip(*(codes[i] for i in known))])
+        return tuple_ids
+
+# Bind the column names of a declarative query to their indexes in a header, so the query can also be evaluated
+# on plain records (returns a bound copy; plain callables, and queries without a header, are returned unchanged)
+def bind_query(query, header=None):
+    if header is not None and hasattr(query, "bind"):
+        return query.bind(header)
+    return query
+
+# Get a columnar relation for any dataset (relations are returned unchanged)
+def as_relation(data):
+    if isinstance(data, Relation):
+        return data
+    return Relation.from_rows(data)
+
+# Quote a value as a SQL literal
+def sql_literal(value):
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    return "'" + str(value).replace("'", "''") + "'"
+
+# Get the integers among the values of a predicate (a value that is not an integer matches no row of an integer column)
+def integer_values(values):
+    integers = []
+    for value in values:
+        try:
+            integers.append(int(value))
+        except (TypeError, ValueError):
+            pass
+    return integers
+
+# Escape the wildcard characters of a LIKE pattern (the escape character is a backslash)
+def escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+# Base class of the declarative predicates used as queries
+# A predicate can be evaluated on a single record (slow fallback), compiled to a NumPy mask over whole columns,
+# compiled to an index probe that returns the matching row ids, or compiled to a SQL WHERE clause
+class Predicate:
+
+    # Evaluate the predicate on a single record
+    def __call__(self, record):
+        raise NotImplementedError
+
+    # Evaluate the predicate over the relation (or over some of its rows) as a boolean mask
+    def mask(self, relation, row_ids=None):
+        raise NotImplementedError
+
+    # Get the ids of the rows that satisfy the predicate (full scan unless a subclass can probe an index)
+    def rows(self, relation):
+        return np.flatnonzero(self.mask(relation))
+
+    # Check whether the rows of the predicate can be found with an index probe instead of a full scan
+    def indexable(self, relation):
+        return False
+
+    # Compile the predicate to a SQL WHERE clause
+    def to_sql(self, header=None):
+        raise NotImplementedError
+
+    # Combine two predicates with AND
+    def __and__(self, other):
+        return And(self, other)
+
+    # Combine two predicates with OR
+    def __or__(self, other):
+        return Or(self, other)
+
+    # Get a canonical description of the predicate (its SQL WHERE clause, with column names from the header)
+    def describe(self, header=None):
+        return self.to_sql(header)
+
+    # Show the predicate as its SQL WHERE clause
+    def __repr__(self):
+        return self.to_sql()
+
+# Base class of the predicates over a single column
+class ColumnPredicate(Predicate):
+
+    # Initialize the predicate with the column it applies to (a column name or a column index)
+    def __init__(self, column):
+        self.column = column
+
+    # Check whether a single text value satisfies the predicate
+    def matches(self, value):
+        raise NotImplementedError
+
+    # Evaluate the predicate over an array of values (int64 values or the strings of a dictionary)
+    def evaluate(self, values):
+        raise NotImplementedError
+
+    # Evaluate the predicate on a single record
+    def __call__(self, record):
+        index = self.column if isinstance(self.column, int) else None
+        if index is None:
+            raise TypeError(f"Predicate on column {self.column!r} needs a relation to resolve the column name")
+        return self.matches(record[index])
+
+    # Evaluate the predicate over the relation (or over some of its rows) as a boolean mask
+    # Dictionary-encoded columns are evaluated once per distinct string and mapped back through the codes
+    def mask(self, relation, row_ids=None):
+        column = relation.column(self.column)
+        if isinstance(column, DictColumn):
+            codes = column.codes() if row_ids is None else column.codes()[row_ids]
+            return self.evaluate(column.dictionary)[codes]
+        values = column.values if row_ids is None else column.values[row_ids]
+        return self.evaluate(values)
+
+    # Get the name of the column for SQL
+    def sql_column(self, header=None):
+        if isinstance(self.column, str):
+            return f'"{self.column}"'
+        if header is not None:
+            return f'"{header[self.column]}"'
+        return f"column{self.column}"
+
+    # Get a copy of the predicate with its column bound to its index, so it can also be evaluated on plain records
+    # (the predicate itself is left unchanged, so it can be shared and bound to other headers)
+    def bind(self, header):
+        bound = copy.copy(self)
+        if isinstance(self.column, str):
+            bound.column = header.index(self.column)
+        return bound
+
+# Column equals a value: WHERE column = value
+class Eq(ColumnPredicate):
+
+    def __init__(self, column, value):
+        super().__init__(column)
+        self.value = value
+
+    def matches(self, value):
+        return value == str(self.value)
+
+    def evaluate(self, values):
+        if values.dtype.kind in "iu":
+            integers = integer_values([self.value])
+            return values == integers[0] if integers else np.zeros(len(values), dtype=bool)
+        return values == str(self.value)
+
+    # Probe the posting list (dictionary column) or the sorted index (integer column) of the column
+    def rows(self, relation):
+        return relation.index(self.column).lookup(self.evaluate_keys(relation))
+
+    # Get the codes or values matched by the predicate in the index of the column
+    def evaluate_keys(self, relation):
+        column = relation.column(self.column)
+        if isinstance(column, DictColumn):
+            return np.flatnonzero(self.evaluate(column.dictionary))
+        return np.asarray(integer_values([self.value]), dtype=np.int64)
+
+    def indexable(self, relation):
+        return True
+
+    def to_sql(self, header=None):
+        return f"{self.sql_column(header)} = {sql_literal(self.value)}"
+
+# Column is one of several values: WHERE column IN (values)
+class In(Eq):
+
+    def __init__(self, column, values):
+        ColumnPredicate.__init__(self, column)
+        self.values = list(values)
+
+    def matches(self, value):
+        return value in [str(v) for v in self.values]
+
+    def evaluate(self, values):
+        if values.dtype.kind in "iu":
+            return np.isin(values, integer_values(self.values))
+        return np.isin(values, [str(v) for v in self.values])
+
+    def evaluate_keys(self, relation):
+        column = relation.column(self.column)
+        if isinstance(column, DictColumn):
+            return np.flatnonzero(self.evaluate(column.dictionary))
+        return np.unique(np.asarray(integer_values(self.values), dtype=np.int64))
+
+    def to_sql(self, header=None):
+        return f"{self.sql_column(header)} IN ({', '.join(sql_literal(v) for v in self.values)})"
+
+# Column lies in a range: WHERE column > low AND column <= high (either bound may be left open)
+class Range(ColumnPredicate):
+
+    def __init__(self, column, low=None, high=None, include_low=True, include_high=True):
+        super().__init__(column)
+        self.low = low
+        self.high = high
+        self.include_low = include_low
+        self.include_high = include_high
+
+    def matches(self, value):
+        bound = self.low if self.low is not None else self.high
+        if isinstance(bound, (int, np.integer)):
+            value = int(value)
+        return bool(self.evaluate(np.asarray([value]))[0])
+
+    def evaluate(self, values):
+        mask = np.ones(len(values), dtype=bool)
+        if self.low is not None:
+            mask &= values >= self.low if self.include_low else values > self.low
+        if self.high is not None:
+            mask &= values <= self.high if self.include_high else values < self.high
+        return mask
+
+    # Integer ranges are answered with two binary searches on the sorted index of the column
+    def rows(self, relation):
+        column = relation.column(self.column)
+        if isinstance(column, IntColumn):
+            return relation.index(self.column).range(self.low, self.high, self.include_low, self.include_high)
+        return super().rows(relation)
+
+    def indexable(self, relation):
+        return isinstance(relation.column(self.column), IntColumn)
+
+    def to_sql(self, header=None):
+        conditions = []
+        if self.low is not None:
+            conditions.append(f"{self.sql_column(header)} {'>=' if self.include_low else '>'} {sql_literal(self.low)}")
+        if self.high is not None:
+            conditions.append(f"{self.sql_column(header)} {'<=' if self.include_high else '<'} {sql_literal(self.high)}")
+        return " AND ".join(conditions) if conditions else "1 = 1"
+
+# Column starts with a prefix: WHERE column LIKE 'prefix%'
+class Prefix(Eq):
+
+    def __init__(self, column, prefix):
+        ColumnPredicate.__init__(self, column)
+        self.prefix = prefix
+
+    def matches(self, value):
+        return value.startswith(self.prefix)
+
+    def evaluate(self, values):
+        if values.dtype.kind in "iu":
+            values = values.astype(str)
+        return np.char.startswith(values, self.prefix)
+
+    def evaluate_keys(self, relation):
+        column = relation.column(self.column)
+        if isinstance(column, DictColumn):
+            return np.flatnonzero(self.evaluate(column.dictionary))
+        return np.unique(column.values[self.mask(relation)])
+
+    def indexable(self, relation):
+        return isinstance(relation.column(self.column), DictColumn)
+
+    def to_sql(self, header=None):
+        return f"{self.sql_column(header)} LIKE {sql_literal(escape_like(self.prefix) + '%')} ESCAPE '\\'"
+
+# Column contains a substring: WHERE column LIKE '%text%'
+class Contains(Prefix):
+
+    def matches(self, value):
+        return self.prefix in value
+
+    def evaluate(self, values):
+        if values.dtype.kind in "iu":
+            values = values.astype(str)
+        return np.char.find(values, self.prefix) >= 0
+
+    def to_sql(self, header=None):
+        return f"{self.sql_column(header)} LIKE {sql_literal('%' + escape_like(self.prefix) + '%')} ESCAPE '\\'"
+
+# Integer column has a given remainder: WHERE column % divisor = remainder
+class Mod(ColumnPredicate):
+
+    def __init__(self, column, divisor, remainder=0):
+        super().__init__(column)
+        self.divisor = divisor
+        self.remainder = remainder
+
+    def matches(self, value):
+        return int(value) % self.divisor == self.remainder
+
+    def evaluate(self, values):
+        return values % self.divisor == self.remainder
+
+    def to_sql(self, header=None):
+        return f"{self.sql_column(header)} % {self.divisor} = {self.remainder}"
+
+# Conjunction of predicates: WHERE p1 AND p2 AND ...
+class And(Predicate):
+
+    def __init__(self, *predicates):
+        self.predicates = list(predicates)
+
+    def __call__(self, record):
+        return all(predicate(record) for predicate in self.predicates)
+
+    def mask(self, relation, row_ids=None):
+        mask = np.ones(len(relation) if row_ids is None else len(row_ids), dtype=bool)
+        for predicate in self.predicates:
+            mask &= predicate.mask(relation, row_ids)
+        return mask
+
+    # Probe the index of the first indexable predicate, then check the other predicates on those rows only
+    def rows(self, relation):
+        indexed = [predicate for predicate in self.predicates if predicate.indexable(relation)]
+        if not indexed:
+            return super().rows(relation)
+        row_ids = indexed[0].rows(relation)
+        for predicate in self.predicates:
+            if predicate is not indexed[0] and len(row_ids):
+                row_ids = row_ids[predicate.mask(relation, row_ids)]
+        return row_ids
+
+    def indexable(self, relation):
+        return any(predicate.indexable(relation) for predicate in self.predicates)
+
+    def bind(self, header):
+        bound = copy.copy(self)
+        bound.predicates = [predicate.bind(header) for predicate in self.predicates]
+        return bound
+
+    def to_sql(self, header=None):
+        return " AND ".join(f"({predicate.to_sql(header)})" for predicate in self.predicates)
+
+    # Get a canonical description of the conjunction (the order of the predicates does not matter)
+    def describe(self, header=None):
+        return " AND ".join(sorted(f"({predicate.describe(header)})" for predicate in self.predicates))
+
+# Disjunction of predicates: WHERE p1 OR p2 OR ...
+class Or(And):
+
+    def __call__(self, record):
+        return any(predicate(record) for predicate in self.predicates)
+
+    def mask(self, relation, row_ids=None):
+        mask = np.zeros(len(relation) if row_ids is None else len(row_ids), dtype=bool)
+        for predicate in self.predicates:
+            mask |= predicate.mask(relation, row_ids)
+        return mask
+
+    # Union of the index probes when every predicate is indexable, otherwise a full scan
+    def rows(self, relation):
+        if not self.indexable(relation):
+            return Predicate.rows(self, relation)
+        row_ids = np.zeros(0, dtype=np.int64)
+        for predicate in self.predicates:
+            row_ids = np.union1d(row_ids, predicate.rows(relation))
+        return row_ids
+
+    def indexable(self, relation):
+        return all(predicate.indexable(relation) for predicate in self.predicates)
+
+    def to_sql(self, header=None):
+        return " OR ".join(f"({predicate.to_sql(header)})" for predicate in self.predicates)
+
+    # Get a canonical description of the disjunction (the order of the predicates does not matter)
+    def describe(self, header=None):
+        return " OR ".join(sorted(f"({predicate.describe(header)})" for predicate in self.predicates))
+
+# Get the ids of the rows of a relation that satisfy a query (a predicate or any callable over a record)
+# Deleted rows are never selected
+def select_rows(relation, query):
+    if isinstance(query, Predicate):
+        row_ids = np.sort(query.rows(relation))
+
+        # Rows appended since the column indexes were built are not in any probe, so they are scanned
+        unindexed_rows = relation.unindexed_rows()
+        if len(unindexed_rows):
+            row_ids = np.union1d(row_ids, unindexed_rows[query.mask(relation, unindexed_rows)])
+    else:
+        row_ids = np.flatnonzero(relation.mask(query))
+    if relation.deleted is not None:
+        row_ids = row_ids[~relation.deleted[row_ids]]
+    return row_ids
+
+# Get the values of a column at the given rows as join keys: int64 values, or codes with their dictionary of strings
+def join_keys(relation, column, rows):
+    column = relation.column(column)
+    if isinstance(column, DictColumn):
+        return column.codes()[rows], column.dictionary
+    return column.values[rows], None
+
+# Map the join keys of two columns to shared dense codes, so equal values get equal codes
+# (dictionaries are merged once per join rather than per row; integers match strings by their text form, so the
+# codes of an integer column and a text column are only good for equality)
+# A dictionary with more entries than keys is first cut down to the entries in use, so the codes of a few rows
+# (e.g. the rows of an update) cost O(rows log rows) whatever the size of the column
+def shared_codes(left, right):
+    (left_keys, left_dictionary), (right_keys, right_dictionary) = left, right
+    if left_dictionary is not None and len(left_dictionary) > len(left_keys):
+        used, left_keys = np.unique(left_keys, return_inverse=True)
+        left_dictionary = left_dictionary[used]
+    if right_dictionary is not None and len(right_dictionary) > len(right_keys):
+        used, right_keys = np.unique(right_keys, return_inverse=True)
+        right_dictionary = right_dictionary[used]
+    if left_dictionary is None and right_dictionary is None:
+        _, inverse = np.unique(np.concatenate([left_keys, right_keys]), return_inverse=True)
+        return inverse[:len(left_keys)], inverse[len(left_keys):]
+    if left_dictionary is None:
+        left_dictionary, left_keys = np.unique(left_keys, return_inverse=True)
+        left_dictionary = left_dictionary.astype(str)
+    if right_dictionary is None:
+        right_dictionary, right_keys = np.unique(right_keys, return_inverse=True)
+        right_dictionary = right_dictionary.astype(str)
+    _, inverse = np.unique(np.concatenate([left_dictionary, right_dictionary]), return_inverse=True)
+    return inverse[:len(left_dictionary)][left_keys], inverse[len(left_dictionary):][right_keys]
+
+# Get the position of every item of the given ranges (starts and sizes) and the index of its range
+def expand_ranges(starts, sizes):
+    range_index = np.repeat(np.arange(len(starts)), sizes)
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return range_index, np.repeat(starts, sizes) + offsets
+
+# Hash join of two lists of rows on their dense key codes: the build (right) side is bucketed by code, like the
+# buckets of a hash table, and each probe (left) row is expanded against the bucket of its code
+# Returns the positions of the matching left and right rows, in O(left + right + result)
+def hash_join(left_codes, right_codes):
+    code_count = int(max(left_codes.max(initial=-1), right_codes.max(initial=-1))) + 1
+    bucket_sizes = np.bincount(right_codes, minlength=code_count)
+    bucket_starts = np.cumsum(bucket_sizes) - bucket_sizes
+    buckets = np.argsort(right_codes, kind="stable")
+    left_positions, bucket_positions = expand_ranges(bucket_starts[left_codes], bucket_sizes[left_codes])
+    return left_positions, buckets[bucket_positions]
+
+# Get the pairs of rows of the same block whose codes satisfy an order condition (left code op right code)
+# The right rows are sorted on (block, code), so the matches of each left row are a contiguous range of them
+# Returns the positions of the matching left and right rows, in O(n log n + result)
+def range_pairs(left_blocks, right_blocks, codes, operator):
+    left_codes, right_codes = codes
+    scale = int(max(left_codes.max(initial=0), right_codes.max(initial=0))) + 1
+    order = np.argsort(right_blocks * scale + right_codes, kind="stable")
+    sorted_keys = (right_blocks * scale + right_codes)[order]
+    left_keys = left_blocks * scale + left_codes
+    block_starts = np.searchsorted(sorted_keys, left_blocks * scale, side="left")
+    block_ends = np.searchsorted(sorted_keys, (left_blocks + 1) * scale, side="left")
+    if operator in ("<", "<="):
+        starts = np.searchsorted(sorted_keys, left_keys, side="right" if operator == "<" else "left")
+        ends = block_ends
+    else:
+        starts = block_starts
+        ends = np.searchsorted(sorted_keys, left_keys, side="left" if operator == ">" else "right")
+    left_positions, right_positions = expand_ranges(starts, ends - starts)
+    return left_positions, order[right_positions]
+
+# Declarative primary key constraint: no two different records may share the same values on the key columns
+# The key-group index is built once per dataset with NumPy, so checking a record is an O(1) lookup
+class KeyConstraint:
+
+    # Initialize the key constraint with the indices of the key columns (default: StudentID and CourseName)
+    def __init__(self, columns=(0, 3)):
+        self.columns = tuple(columns)
+        self.data = None
+        self.relation = None
+        self.group_of_row = np.zeros(0, dtype=np.int64)
+        self.group_sizes = np.zeros(0, dtype=np.int64)
+        self.group_order = np.zeros(0, dtype=np.int64)
+        self.group_offsets = np.zeros(1, dtype=np.int64)
+        self.conflict_mask = np.zeros(0, dtype=bool)
+        self.conflicting_keys = set()
+        self.key_hashes = np.zeros(0, dtype=np.uint64)
+        self.hash_order = np.zeros(0, dtype=np.int64)
+        self.key_lookup = None
+        self.added_rows = {}
+        self.changed_groups = None
+
+    # Build the key-group index for a dataset
+    def build(self, data):
+        if self.data is data:
+            return self
+
+        # Reuse the key-group index of the relation if it was already built (e.g. loaded from a snapshot)
+        relation = as_relation(data)
+        if self.columns not in relation.key_indexes:
+            relation.key_indexes[self.columns] = self.compute_index(relation)
+        index = relation.key_indexes[self.columns]
+
+        self.data = data
+        self.relation = relation
+        self.group_of_row = index["group_of_row"]
+        self.group_sizes = index["group_sizes"]
+        self.group_order = index["group_order"]
+        self.group_offsets = index["group_offsets"]
+        self.conflict_mask = index["conflict_mask"]
+        self.key_hashes = index["key_hashes"]
+        self.hash_order = index["hash_order"]
+        self.conflicting_keys = {self.key(record) for record in relation.rows(np.flatnonzero(self.conflict_mask))}
+
+        # The update state of a previous relation does not carry over
+        self.key_lookup = None
+        self.added_rows = {}
+        self.changed_groups = None
+        return self
+
+    # Compute the key-group index arrays of a relation
+    def compute_index(self, relation):
+        group_of_row, group_sizes = relation.group_ids(self.columns)
+
+        # Rows of each group, stored contiguously (group g owns group_order[group_offsets[g]:group_offsets[g + 1]])
+        group_order = np.argsort(group_of_row, kind="stable")
+        group_offsets = np.concatenate(([0], np.cumsum(group_sizes)))
+
+        # Deleted rows keep their place in the groups but count neither toward the group sizes nor toward conflicts
+        # (as after delete_rows)
+        live = relation.live_mask()
+        if relation.deleted is not None:
+            group_sizes = np.bincount(group_of_row[live], minlength=len(group_sizes)).astype(np.int64)
+
+        # A key group is only a conflict if it holds at least two different records
+        # (exact duplicate rows agree on every column, so they do not violate the key)
+        tuple_of_row = relation.tuple_ids()
+        tuple_count = int(tuple_of_row.max(initial=0)) + 1
+        group_tuples = np.unique(group_of_row[live] * tuple_count + tuple_of_row[live]) // tuple_count
+        distinct_tuples = np.bincount(group_tuples, minlength=len(group_sizes))
+        conflict_mask = live & (distinct_tuples > 1)[group_of_row]
+
+        # Hashes of the key of every group, sorted, to find the group of a key on updates (see CodeLookup)
+        first_rows = group_order[group_offsets[:-1]]
+        key_hashes, hash_order = CodeLookup.build([relation.column(column).codes()[first_rows] for column in self.columns])
+
+        return {
+            "group_of_row": group_of_row,
+            "group_sizes": group_sizes,
+            "group_order": group_order,
+            "group_offsets": group_offsets,
+            "conflict_mask": conflict_mask,
+            "key_hashes": key_hashes,
+            "hash_order": hash_order,
+        }
+
+    # Get a canonical description of the constraint
+    def describe(self, header=None):
+        names = [header[column] if header is not None else f"column{column}" for column in self.columns]
+        return f"PRIMARY KEY ({', '.join(names)})"
+
+    # Get the key of a record
+    def key(self, record):
+        return tuple(record[i] for i in self.columns)
+
+    # Get the row ids of a key group (its deleted rows are left out unless include_deleted is set)
+    def group_rows(self, group_id, include_deleted=False):
+        if group_id + 1 < len(self.group_offsets):
+            rows = self.group_order[self.group_offsets[group_id]:self.group_offsets[group_id + 1]]
+        else:
+            rows = np.zeros(0, dtype=np.int64)
+        if group_id in self.added_rows:
+            rows = np.concatenate([rows, np.asarray(self.added_rows[group_id], dtype=np.int64)])
+        if self.relation is not None and self.relation.deleted is not None and not include_deleted:
+            rows = rows[~self.relation.deleted[rows]]
+        return rows
+
+    # Get one (live) row of each of the given key groups
+    def first_rows(self, group_ids):
+        if self.changed_groups is None:
+            return self.group_order[self.group_offsets[group_ids]]
+        changed = self.changed_groups[group_ids]
+        rows = np.zeros(len(group_ids), dtype=np.int64)
+        rows[~changed] = self.group_order[self.group_offsets[group_ids[~changed]]]
+        rows[changed] = [self.group_rows(group_id)[0] for group_id in group_ids[changed].tolist()]
+        return rows
+
+    # Get the key-group ids of the given key values (text records), None for a key that has no group
+    def find_groups(self, keys):
+        self.make_mutable()
+        columns = [self.relation.column(column) for column in self.columns]
+        codes = [tuple(column.code_of(value) for column, value in zip(columns, key)) for key in keys]
+        known = [i for i, key_codes in enumerate(codes) if None not in key_codes]
+        group_ids = [None] * len(keys)
+        if known:
+            found = self.key_lookup.find([np.asarray(column_codes, dtype=np.int64) for column_codes in zip(*(codes[i] for i in known))])
+            for i, group_id in zip(known, found.tolist()):
+                group_ids[i] = group_id if group_id >= 0 else None
+        return group_ids
+
+    # Switch the index to incremental maintenance: take writable copies of its arrays (they may be
+    # memory-mapped) and set up the lookup of the group of a key from the sorted key hashes of the index
+    # (a copy and a gather, once per dataset; the hashes themselves are computed with the index)
+    # The arrays are no longer shared with the relation, so other constraints on it rebuild their own index
+    def make_mutable(self):
+        if self.key_lookup is not None:
+            return
+        self.group_of_row = np.array(self.group_of_row, dtype=np.int64)
+        self.group_sizes = np.array(self.group_sizes, dtype=np.int64)
+        self.conflict_mask = np.array(self.conflict_mask, dtype=bool)
+        self.changed_groups = np.zeros(len(self.group_sizes), dtype=bool)
+        first_rows = self.group_order[self.group_offsets[:-1]]
+        self.key_lookup = CodeLookup(self.key_hashes, self.hash_order, [self.relation.column(column).codes()[first_rows] for column in self.columns])
+        self.relation.key_indexes.pop(self.columns, None)
+
+    # Add rows appended to the relation to their key groups (new keys get new groups)
+    # The arrays grow in amortized time (see append_array), so an update only costs its own rows and groups
+    # Returns the ids of the affected key groups
+    def insert_rows(self, row_ids):
+        self.make_mutable()
+        group_ids = self.key_lookup.find_or_add([self.relation.column(column).codes()[row_ids] for column in self.columns])
+        for row_id, group_id in zip(row_ids.tolist(), group_ids.tolist()):
+            self.added_rows.setdefault(group_id, []).append(row_id)
+
+        new_groups = len(self.key_lookup) - len(self.group_sizes)
+        self.group_sizes = append_array(self.group_sizes, np.zeros(new_groups, dtype=np.int64))
+        self.changed_groups = append_array(self.changed_groups, np.zeros(new_groups, dtype=bool))
+        np.add.at(self.group_sizes, group_ids, 1)
+        self.group_of_row = append_array(self.group_of_row, group_ids)
+        self.conflict_mask = append_array(self.conflict_mask, np.zeros(len(group_ids), dtype=bool))
+        return self.refresh_groups(np.unique(group_ids))
+
+    # Remove rows deleted from the relation from their key groups
+    # Returns the ids of the affected key groups
+    def delete_rows(self, row_ids):
+        self.make_mutable()
+        group_ids = self.group_of_row[row_ids]
+        np.add.at(self.group_sizes, group_ids, -1)
+        self.conflict_mask[row_ids] = False
+        return self.refresh_groups(np.unique(group_ids))
+
+    # Recompute whether each of the given key groups is a conflict (only their rows are visited)
+    def refresh_groups(self, group_ids):
+        tuple_of_row = self.relation.tuple_ids()
+        self.changed_groups[group_ids] = True
+        for group_id in group_ids.tolist():
+            rows = self.group_rows(group_id)
+            in_conflict = len(np.unique(tuple_of_row[rows])) > 1
+            self.conflict_mask[rows] = in_conflict
+            key = self.key(self.relation[int(self.group_rows(group_id, include_deleted=True)[0])])
+            if in_conflict:
+                self.conflicting_keys.add(key)
+            else:
+                self.conflicting_keys.discard(key)
+        return group_ids
+
+    # Iterate over the row ids of every key group with at least min_size rows
+    def iter_groups(self, min_size=1):
+        for group_id in np.flatnonzero(self.group_sizes >= min_size).tolist():
+            yield self.group_rows(group_id)
+
+    # Check whether a record is in a conflict group
+    def in_conflict(self, record):
+        return self.key(record) in self.conflicting_keys
+
+    # Get the row ids of every conflict group
+    def conflict_groups(self):
+        conflict_group_ids = np.unique(self.group_of_row[self.conflict_mask])
+        return [self.group_rows(group_id) for group_id in conflict_group_ids.tolist()]
+
+    # A record satisfies the constraint if it is not in a conflict group
+    def __call__(self, record):
+        return not self.in_conflict(record)
+
+# Get the name of a column (a name, or an index resolved through the header when there is one)
+def column_name(column, header=None):
+    if isinstance(column, str):
+        return column
+    return header[column] if header is not None else f"column{column}"
+
+# Declarative functional dependency lhs -> rhs: records that agree on the lhs columns must agree on the rhs columns
+# (e.g. CourseID -> CourseName); the rows are partitioned by hash on lhs, and a group is a conflict if it holds
+# two different rhs values: every two of its rows with different rhs values are a conflict edge
+# The groups (lhs values) and the classes (lhs and rhs values) are key-group indexes (see KeyConstraint), so
+# inserts and deletes only visit the affected groups
+class FunctionalDependency:
+
+    # Initialize the dependency with its lhs and rhs columns (names or indices)
+    def __init__(self, lhs, rhs):
+        self.lhs = tuple(lhs)
+        self.rhs = tuple(rhs)
+        self.data = None
+        self.relation = None
+        self.lhs_columns = ()
+        self.groups = None
+        self.classes = None
+        self.group_of_row = np.zeros(0, dtype=np.int64)
+        self.class_of_row = np.zeros(0, dtype=np.int64)
+        self.conflict_mask = np.zeros(0, dtype=bool)
+        self.conflicting_keys = set()
+
+    # Find the conflicts of the dependency in a dataset (again, from scratch, if rebuild is set)
+    def build(self, data, rebuild=False):
+        if self.data is data and not rebuild:
+            return self
+        relation = as_relation(data)
+        self.data = data
+        self.relation = relation
+        self.lhs_columns = tuple(relation.column_index(column) for column in self.lhs)
+        rhs_columns = tuple(relation.column_index(column) for column in self.rhs)
+
+        # Group of a row: its lhs values; class of a row: its lhs and rhs values (a class lies in a single group)
+        # The group sizes of the indexes only count live rows
+        self.groups = KeyConstraint(self.lhs_columns).build(relation)
+        self.classes = KeyConstraint(self.lhs_columns + rhs_columns).build(relation)
+        self.group_of_row = self.groups.group_of_row
+        self.class_of_row = self.classes.group_of_row
+        group_of_class = np.zeros(len(self.classes.group_sizes), dtype=np.int64)
+        group_of_class[self.class_of_row] = self.group_of_row
+        classes_per_group = np.bincount(group_of_class[self.classes.group_sizes > 0], minlength=len(self.groups.group_sizes))
+        self.conflict_mask = relation.live_mask() & (classes_per_group > 1)[self.group_of_row]
+        self.conflicting_keys = {self.key(record) for record in relation.rows(np.flatnonzero(self.conflict_mask))}
+        return self
+
+    # Get the row ids of an lhs group (see KeyConstraint.group_rows)
+    def group_rows(self, group_id, include_deleted=False):
+        return self.groups.group_rows(group_id, include_deleted)
+
+    # Add rows appended to the relation to their groups and classes
+    # Returns the ids of the affected groups
+    def insert_rows(self, row_ids):
+        group_ids = self.groups.insert_rows(row_ids)
+        self.classes.insert_rows(row_ids)
+        self.group_of_row = self.groups.group_of_row
+        self.class_of_row = self.classes.group_of_row
+        self.conflict_mask = append_array(self.conflict_mask, np.zeros(len(row_ids), dtype=bool))
+        return self.refresh_groups(group_ids)
+
+    # Remove rows deleted from the relation from their groups and classes
+    # Returns the ids of the affected groups
+    def delete_rows(self, row_ids):
+        group_ids = self.groups.delete_rows(row_ids)
+        self.classes.delete_rows(row_ids)
+        self.conflict_mask[row_ids] = False
+        return self.refresh_groups(group_ids)
+
+    # Recompute whether each of the given groups is a conflict (only their rows are visited)
+    def refresh_groups(self, group_ids):
+        for group_id in group_ids.tolist():
+            rows = self.group_rows(group_id)
+            in_conflict = len(np.unique(self.class_of_row[rows])) > 1
+            self.conflict_mask[rows] = in_conflict
+            key = self.key(self.relation[int(self.group_rows(group_id, include_deleted=True)[0])])
+            if in_conflict:
+                self.conflicting_keys.add(key)
+            else:
+                self.conflicting_keys.discard(key)
+        return group_ids
+
+    # Get a canonical description of the constraint
+    def describe(self, header=None):
+        lhs, rhs = ([column_name(column, header) for column in columns] for columns in (self.lhs, self.rhs))
+        return f"FUNCTIONAL DEPENDENCY ({', '.join(lhs)}) -> ({', '.join(rhs)})"
+
+    # Get the lhs values of a record
+    def key(self, record):
+        return tuple(record[i] for i in self.lhs_columns)
+
+    # A record satisfies the constraint if its lhs group is not a conflict
+    def __call__(self, record):
+        return self.key(record) not in self.conflicting_keys
+
+# Comparison operators of the conditions of denial constraints
+DENIAL_OPERATORS = {"=": np.equal, "!=": np.not_equal, "<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal}
+
+# Declarative (binary) denial constraint: no two records t1, t2 may satisfy every condition t1[left] op t2[right]
+# e.g. [("CourseName", "=", "CourseName"), ("Instructor", "!=", "Instructor")] is the dependency CourseName -> Instructor
+# Violations are found without scanning all pairs: the equality conditions partition the rows by hash, and the
+# first order condition (<, <=, >, >=) is a range over the rows of a partition sorted on its column, so only the
+# candidate pairs are visited (O(n log n) plus the number of candidates); the other conditions filter them
+# A record that violates the constraint with itself is in no repair; every other violation is a conflict edge
+# Inserted rows are only paired with the rows of their partitions when an equality compares a column with itself
+# (a key-group index on those columns, see KeyConstraint), with every live row otherwise; deleted rows drop their
+# edges with one vectorized pass over the edge list
+class DenialConstraint:
+
+    # Initialize the constraint with its conditions (left column, operator, right column)
+    def __init__(self, conditions):
+        self.conditions = [tuple(condition) for condition in conditions]
+        for _, operator, _ in self.conditions:
+            if operator not in DENIAL_OPERATORS:
+                raise ValueError(f"Unknown operator {operator!r} in denial constraint")
+        self.data = None
+        self.relation = None
+        self.blocks = None
+        self.edges = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        self.edge_count = np.zeros(0, dtype=np.int64)
+        self.conflict_mask = np.zeros(0, dtype=bool)
+        self.violation_mask = np.zeros(0, dtype=bool)
+        self.violating_records = {}
+
+    # Find the violations of the constraint in a dataset (again, from scratch, if rebuild is set)
+    def build(self, data, rebuild=False):
+        if self.data is data and not rebuild:
+            return self
+        relation = as_relation(data)
+
+        # An integer column and a text column have no common order (the codes of a text column are ordered like
+        # strings, so 10 would come before 9), so an order condition between them is rejected
+        for left, operator, right in self.conditions:
+            if operator in ("<", "<=", ">", ">=") and isinstance(relation.column(left), IntColumn) != isinstance(relation.column(right), IntColumn):
+                raise ValueError(f"Denial constraint orders integer and text columns: {left!r} {operator} {right!r}")
+        self.data = data
+        self.relation = relation
+        block_columns = tuple(relation.column_index(left) for left, operator, right in self.conditions
+                              if operator == "=" and relation.column_index(left) == relation.column_index(right))
+        self.blocks = KeyConstraint(block_columns).build(relation) if block_columns else None
+
+        self.edges = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        self.edge_count = np.zeros(len(relation), dtype=np.int64)
+        self.conflict_mask = np.zeros(len(relation), dtype=bool)
+        self.violation_mask = np.zeros(len(relation), dtype=bool)
+        self.violating_records = {}
+        rows = np.flatnonzero(relation.live_mask())
+        self.add_violations(*self.violations(rows, rows))
+        return self
+
+    # Get the pairs (t1, t2) of the given left and right rows that satisfy every condition
+    def violations(self, left_rows, right_rows):
+        relation = self.relation
+
+        # Codes of both sides of every condition, shared and ordered like the values they stand for
+        codes = [shared_codes(join_keys(relation, left, left_rows), join_keys(relation, right, right_rows)) for left, _, right in self.conditions]
+        equalities = [index for index, (_, operator, _) in enumerate(self.conditions) if operator == "="]
+        orders = [index for index, (_, operator, _) in enumerate(self.conditions) if operator in ("<", "<=", ">", ">=")]
+
+        # Partitions of the rows on the equality conditions, then the pairs of a partition within the first order condition
+        if equalities:
+            blocks, _ = dense_group_ids([np.concatenate(codes[index]) for index in equalities])
+        else:
+            blocks = np.zeros(len(left_rows) + len(right_rows), dtype=np.int64)
+        left_blocks, right_blocks = blocks[:len(left_rows)], blocks[len(left_rows):]
+        if orders:
+            left, right = range_pairs(left_blocks, right_blocks, codes[orders[0]], self.conditions[orders[0]][1])
+        else:
+            left, right = hash_join(left_blocks, right_blocks)
+        for index, (_, operator, _) in enumerate(self.conditions):
+            if index not in equalities and index not in orders[:1]:
+                keep = DENIAL_OPERATORS[operator](codes[index][0][left], codes[index][1][right])
+                left, right = left[keep], right[keep]
+        return left_rows[left], right_rows[right]
+
+    # Record the violations of some pairs of rows: a record that violates the constraint with itself (or a copy
+    # of itself) is in no repair, every other violation is a conflict edge between two records (kept once)
+    # Returns the ids of the rows of the pairs
+    def add_violations(self, left, right):
+        rows = np.unique(np.concatenate([left, right]))
+        flagged = self.conflict_mask[rows] | self.violation_mask[rows]
+
+        tuple_of_row = self.relation.tuple_ids()
+        self_violations = tuple_of_row[left] == tuple_of_row[right]
+        self.violation_mask[left[self_violations]] = True
+        keep = ~self_violations & ~self.violation_mask[left] & ~self.violation_mask[right]
+        edges = np.unique(np.stack([np.minimum(left[keep], right[keep]), np.maximum(left[keep], right[keep])], axis=1), axis=0)
+        self.edges = (append_array(self.edges[0], edges[:, 0]), append_array(self.edges[1], edges[:, 1]))
+        np.add.at(self.edge_count, edges.ravel(), 1)
+        self.conflict_mask[edges.ravel()] = True
+        self.count_violating_records(rows, flagged)
+        return rows
+
+    # Keep the number of live rows of each record that are in a violation up to date for the given rows
+    # (flagged: whether each of them was in a violation before)
+    def count_violating_records(self, rows, flagged):
+        changed = (self.conflict_mask[rows] | self.violation_mask[rows]) != flagged
+        for record, was_flagged in zip(self.relation.rows(rows[changed]), flagged[changed].tolist()):
+            count = self.violating_records.get(record, 0) + (-1 if was_flagged else 1)
+            if count:
+                self.violating_records[record] = count
+            else:
+                del self.violating_records[record]
+
+    # Find the violations of rows appended to the relation (with each other and with the live rows)
+    # Returns the ids of the rows of the new violations
+    def insert_rows(self, row_ids):
+        new_rows = np.zeros(len(row_ids), dtype=bool)
+        self.conflict_mask = append_array(self.conflict_mask, new_rows)
+        self.violation_mask = append_array(self.violation_mask, new_rows)
+        self.edge_count = append_array(self.edge_count, np.zeros(len(row_ids), dtype=np.int64))
+        if self.blocks is not None:
+            group_ids = self.blocks.insert_rows(row_ids)
+            candidates = np.concatenate([row_ids] + [self.blocks.group_rows(group_id) for group_id in group_ids.tolist()])
+            candidates = np.unique(candidates)
+        else:
+            candidates = np.flatnonzero(self.relation.live_mask())
+        left, right = self.violations(row_ids, candidates)
+        reverse_left, reverse_right = self.violations(candidates, row_ids)
+        return np.union1d(row_ids, self.add_violations(np.concatenate([left, reverse_left]), np.concatenate([right, reverse_right])))
+
+    # Drop the violations of rows deleted from the relation
+    # Returns the ids of the deleted rows and of the rows they were in conflict with
+    def delete_rows(self, row_ids):
+        if self.blocks is not None:
+            self.blocks.delete_rows(row_ids)
+        left, right = self.edges
+        removed = ~self.relation.is_live(left) | ~self.relation.is_live(right)
+        ends = np.concatenate([left[removed], right[removed]])
+        rows = np.union1d(row_ids, ends)
+        flagged = self.conflict_mask[rows] | self.violation_mask[rows]
+
+        np.subtract.at(self.edge_count, ends, 1)
+        self.edges = (left[~removed], right[~removed])
+        self.conflict_mask[ends] = self.edge_count[ends] > 0
+        self.conflict_mask[row_ids] = False
+        self.violation_mask[row_ids] = False
+        self.count_violating_records(rows, flagged)
+        return rows
+
+    # Get a canonical description of the constraint
+    def describe(self, header=None):
+        names = [column_name(column, header) for condition in self.conditions for column in condition[::2]]
+        conditions = [f"t1.{left} {operator} t2.{right}" for (_, operator, _), left, right in zip(self.conditions, names[::2], names[1::2])]
+        return f"DENIAL CONSTRAINT NOT ({' AND '.join(conditions)})"
+
+    # A record satisfies the constraint if it is in no violation
+    def __call__(self, record):
+        return tuple(record) not in self.violating_records
+
+# In-process SQLite database holding a relation, with an index on the key columns of its key constraint
+# Runs the consistent first-order rewritings of selection queries under a primary key, so the rewriting
+# baselines are real, index-driven SQL instead of a Python list comprehension
+class SQLiteBackend:
+
+    # Load the relation into an in-memory SQLite table and index its key columns
+    def __init__(self, relation, key_columns=(0, 3), table="data"):
+        self.relation = relation
+        self.table = table
+        self.header = relation.header
+        self.key_columns = [relation.column_index(column) for column in key_columns]
+        self.int_columns = [isinstance(column, IntColumn) for column in relation.columns]
+
+        self.connection = sqlite3.connect(":memory:", check_same_thread=False)
+
+        # LIKE must be case-sensitive to match Prefix and Contains
+        self.connection.execute("PRAGMA case_sensitive_like = ON")
+        column_definitions = ", ".join(f'"{name}" {"INTEGER" if is_int else "TEXT"}' for name, is_int in zip(self.header, self.int_columns))
+        self.connection.execute(f'CREATE TABLE "{table}" ({column_definitions})')
+        live_rows = np.flatnonzero(relation.live_mask())
+        for start in range(0, len(live_rows), CHUNK_SIZE):
+            self.insert_rows(live_rows[start:start + CHUNK_SIZE], commit=False)
+        key_list = ", ".join(self.quoted(i) for i in self.key_columns)
+        self.connection.execute(f'CREATE INDEX "{table}_key" ON "{table}" ({key_list})')
+        self.connection.commit()
+
+    # Copy rows of the relation into the table (the SQLite rowid of a row is its row id)
+    def insert_rows(self, row_ids, commit=True):
+        columns = [column.values[row_ids].tolist() if is_int else column.decode(row_ids)
+                   for column, is_int in zip(self.relation.columns, self.int_columns)]
+        placeholders = ", ".join("?" for _ in range(len(self.header) + 1))
+        self.connection.executemany(f'INSERT INTO "{self.table}" (rowid, {", ".join(self.quoted(i) for i in range(len(self.header)))}) '
+                                    f"VALUES ({placeholders})", zip(np.asarray(row_ids).tolist(), *columns))
+        if commit:
+            self.connection.commit()
+
+    # Remove rows of the relation from the table
+    def delete_rows(self, row_ids):
+        self.connection.executemany(f'DELETE FROM "{self.table}" WHERE rowid = ?', ((row_id,) for row_id in np.asarray(row_ids).tolist()))
+        self.connection.commit()
+
+    # Get the quoted name of a column, optionally qualified by a table alias
+    def quoted(self, column, alias=None):
+        name = f'"{self.header[column]}"'
+        return f"{alias}.{name}" if alias else name
+
+    # Get the non-key columns of the table
+    def non_key_columns(self):
+        return [i for i in range(len(self.header)) if i not in self.key_columns]
+
+    # KW rewriting (NOT EXISTS form): a candidate row is a consistent answer
+    # if no other row with the same key differs from it on a non-key column
+    def kw_sql_rewriting(self, predicate):
+        same_key = " AND ".join(f"{self.quoted(i, 'u')} = {self.quoted(i, 't')}" for i in self.key_columns)
+        differs = " OR ".join(f"{self.quoted(i, 'u')} <> {self.quoted(i, 't')}" for i in self.non_key_columns()) or "0"
+        return (f'SELECT DISTINCT * FROM "{self.table}" AS t '
+                f"WHERE ({predicate.to_sql(self.header)}) "
+                f'AND NOT EXISTS (SELECT 1 FROM "{self.table}" AS u WHERE {same_key} AND ({differs}))')
+
+    # ConQuer rewriting (GROUP BY / HAVING form): join the candidate rows with the keys
+    # whose group agrees on every non-key column, i.e. the conflict-free key groups
+    def conquer_sql_rewriting(self, predicate):
+        key_list = ", ".join(self.quoted(i) for i in self.key_columns)
+        consistent = " AND ".join(f"MIN({self.quoted(i)}) = MAX({self.quoted(i)})" for i in self.non_key_columns()) or "1"
+        join_keys = " AND ".join(f"{self.quoted(i, 'c')} = {self.quoted(i, 'g')}" for i in self.key_columns)
+        return (f'SELECT DISTINCT c.* FROM (SELECT * FROM "{self.table}" WHERE {predicate.to_sql(self.header)}) AS c '
+                f'JOIN (SELECT {key_list} FROM "{self.table}" GROUP BY {key_list} HAVING {consistent}) AS g '
+                f"ON {join_keys}")
+
+    # Execute a query and get its rows as tuples of strings (the same form as the records of a relation)
+    def execute(self, sql):
+        return [tuple(str(value) for value in row) for row in self.connection.execute(sql)]
+
+    # Close the database
+    def close(self):
+        self.connection.close()
+
+# Declarative constraint types (the other constraints are plain callables over a record)
+DECLARATIVE_CONSTRAINTS = (KeyConstraint, FunctionalDependency, DenialConstraint)
+
+# Build the group index (or find the violations) of every declarative constraint for a dataset
+# Plain callables are left untouched so they can still be used as constraints
+def build_constraints(constraints, data):
+    for constraint in constraints:
+        if isinstance(constraint, DECLARATIVE_CONSTRAINTS):
+            constraint.build(data)
+    return constraints
+
+# Encode an at-most-one constraint over a list of variables (auxiliary variables are numbered after top_var)
+# Small groups use pairwise clauses, large groups use a sequential counter with auxiliary variables
+# Returns the new number of variables
+def encode_at_most_one(group_vars, clauses, top_var):
+    if len(group_vars) <= 6:
+        for i in range(len(group_vars)):
+            for j in range(i + 1, len(group_vars)):
+                clauses.append([-group_vars[i], -group_vars[j]])
+        return top_var
+    encoding = CardEnc.atmost(lits=group_vars, bound=1, top_id=top_var, encoding=EncType.seqcounter)
+    clauses.extend(encoding.clauses)
+    return max(top_var, encoding.nv)
+
+# Interrupt a running SAT call (solvers without interruption support, e.g. CaDiCaL, just finish the call)
+def interrupt_solver(solver):
+    try:
+        solver.interrupt()
+    except NotImplementedError:
+        pass
+
+# Statistics of a solver reported by the profiler (accumulated over all the calls of the solver)
+SOLVER_STATISTICS = ("conflicts", "decisions", "propagations", "restarts")
+
+# Get the statistics of a solver (an empty dictionary for solvers that keep none)
+def solver_statistics(solver):
+    statistics = solver.accum_stats() or {}
+    return {name: statistics[name] for name in SOLVER_STATISTICS if name in statistics}
+
+# Deadline and conflict budget shared by the SAT calls of a query or of a batch of components
+# (at is a time.time() value, or None; conflicts is the number of conflicts left to the calls, or None)
+# A single timer interrupts the solvers that are running when it expires, and no call starts after that
+# A child (e.g. the stop signal of a portfolio race) expires with its parent, or on its own when expire is called,
+# and its calls draw on the conflict budget of its parent
+class Deadline:
+
+    # Initialize the deadline and start its timer (a child has no timer of its own)
+    def __init__(self, at=None, parent=None, conflicts=None):
+        self.at = at if parent is None else parent.at
+        self.budget = self if parent is None else parent.budget
+        self.conflicts = conflicts
+        self.expired = False
+        self.running = set()
+        self.children = weakref.WeakSet()
+        self.lock = threading.Lock()
+        self.timer = None
+        if parent is not None:
+            with parent.lock:
+                parent.children.add(self)
+                self.expired = parent.expired
+        elif at is not None:
+            remaining = at - time.time()
+            if remaining <= 0:
+                self.expired = True
+            else:
+                self.timer = threading.Timer(remaining, self.expire)
+                self.timer.daemon = True
+                self.timer.start()
+
+    # Expire the deadline: interrupt the running solvers and the ones of every child
+    def expire(self):
+        with self.lock:
+            self.expired = True
+            for solver in self.running:
+                interrupt_solver(solver)
+            children = list(self.children)
+        for child in children:
+            child.expire()
+
+    # Register a solver for the duration of a call; returns False if the deadline already expired
+    def enter(self, solver):
+        with self.lock:
+            if self.expired:
+                return False
+            self.running.add(solver)
+            return True
+
+    def leave(self, solver):
+        with self.lock:
+            self.running.discard(solver)
+
+    # Get the number of conflicts left to the calls (None without a conflict budget)
+    def remaining_conflicts(self):
+        return self.budget.conflicts
+
+    # Take the conflicts of a finished call from the conflict budget
+    def spend(self, conflicts):
+        budget = self.budget
+        if budget.conflicts is not None:
+            with budget.lock:
+                budget.conflicts -= conflicts
+
+    # Check whether no call can start any more: the deadline expired or the conflict budget ran out
+    def exhausted(self):
+        remaining = self.remaining_conflicts()
+        return self.expired or (remaining is not None and remaining <= 0)
+
+    # Stop the timer once the calls are over
+    def cancel(self):
+        if self.timer is not None:
+            self.timer.cancel()
+
+# Run one SAT call within a deadline and the conflict budget of the deadline (a Deadline), if any
+# The conflicts of the call are taken from the budget, so the budget is shared by every call of a query
+# The call always goes through solve_limited with interrupts enabled, which releases the GIL, so calls of other
+# threads (a portfolio race, the requests of a server) run in parallel and a deadline or a race can stop it
+# (an interrupt is kept by the solver, so a call that starts just after one returns at once; solvers without
+# interruption support, e.g. CaDiCaL, keep the GIL and always finish their call)
+# Returns True or False, or None if the call was interrupted or ran out of conflicts
+def limited_solve(solver, deadline=None, assumptions=()):
+    if deadline is None:
+        return solver.solve_limited(assumptions=assumptions, expect_interrupt=True)
+    remaining = deadline.remaining_conflicts()
+    if remaining is not None:
+        if remaining <= 0:
+            return None
+        solver.conf_budget(remaining)
+    if not deadline.enter(solver):
+        return None
+    conflicts = solver_statistics(solver).get("conflicts", 0)
+    try:
+        return solver.solve_limited(assumptions=assumptions, expect_interrupt=True)
+    finally:
+        deadline.leave(solver)
+        deadline.spend(solver_statistics(solver).get("conflicts", 0) - conflicts)
+
+# Search for the rows of a conflict component that are in every repair of it on one solver
+# The first repair gives the candidate rows, then the solver is repeatedly asked for a repair that drops
+# at least one of the remaining rows (every blocking clause implies the previous ones, so they are kept)
+# The deadline (a Deadline) also ends the search early, e.g. when another solver of a portfolio finished first
+# Returns the state of the search ("complete", "no repair" or "interrupted"), a boolean mask over the rows
+# (the certain rows of a complete search, the rows that were not ruled out yet of an interrupted one)
+# and the statistics of the solver
+def certain_rows_search(solver, row_count, deadline=None):
+    found = limited_solve(solver, deadline)
+    if found is None:
+        return "interrupted", np.ones(row_count, dtype=bool), solver_statistics(solver)
+    if not found:
+        return "no repair", None, solver_statistics(solver)
+
+    remaining = np.flatnonzero(np.asarray(solver.get_model()[:row_count]) > 0)
+    while len(remaining):
+        solver.add_clause((-(remaining + 1)).tolist())
+        found = limited_solve(solver, deadline)
+        if not found:
+            break
+        model = np.asarray(solver.get_model()[:row_count])
+        remaining = remaining[model[remaining] > 0]
+
+    # Every row that survived all repairs is certain
+    mask = np.zeros(row_count, dtype=bool)
+    mask[remaining] = True
+    return ("interrupted" if found is None else "complete"), mask, solver_statistics(solver)
+
+# Race several solvers on the same conflict component: the first search to finish wins and the others are interrupted
+# (a solver that cannot be interrupted finishes its current call in the background, and is not waited for past
+# the deadline)
+# If every search is interrupted, the rows that none of them ruled out are left undecided
+# The statistics are those of the winning solver (summed over every solver if none wins)
+def race_certain_rows(clauses, row_count, solver_names, deadline=None):
+    stop = Deadline(parent=deadline) if deadline is not None else Deadline()
+    outcomes = queue.Queue()
+    solvers = [Solver(name=name, bootstrap_with=clauses) for name in solver_names]
+
+    def run(index):
+        outcome = certain_rows_search(solvers[index], row_count, stop)
+        if outcome[0] != "interrupted":
+            stop.expire()
+        solvers[index].delete()
+        outcomes.put(outcome)
+
+    for index in range(len(solvers)):
+        threading.Thread(target=run, args=(index,), daemon=True).start()
+    undecided = [np.ones(row_count, dtype=bool)]
+    statistics = {}
+    for _ in solvers:
+        try:
+            state, mask, solver_stats = outcomes.get(timeout=None if stop.at is None else max(stop.at - time.time(), 0) + RACE_GRACE_SECONDS)
+        except queue.Empty:
+            break
+        if state != "interrupted":
+            return state, mask, solver_stats
+        undecided.append(mask)
+        for name, value in solver_stats.items():
+            statistics[name] = statistics.get(name, 0) + value
+    return "interrupted", np.logical_and.reduce(undecided), statistics
+
+# Find the rows of a conflict component that are in every repair of it, from the clauses of its repairs
+# over the variables 1..row_count of its rows (see CAvSAT.encode_component)
+# solvers is a pysat solver name, or a list of names that are raced against each other (a portfolio)
+# Returns the state of the search, a boolean mask over the rows and the solver statistics (see certain_rows_search)
+def component_certain_rows(clauses, row_count, solvers=DEFAULT_SOLVER, deadline=None):
+    if deadline is not None and deadline.exhausted():
+        return "interrupted", np.ones(row_count, dtype=bool), {}
+    solver_names = [solvers] if isinstance(solvers, str) else list(solvers)
+    variable_count = max((abs(literal) for clause in clauses for literal in clause), default=0)
+    if len(solver_names) > 1 and variable_count >= PORTFOLIO_MIN_VARIABLES:
+        return race_certain_rows(clauses, row_count, solver_names, deadline)
+    solver = Solver(name=solver_names[0], bootstrap_with=clauses)
+    try:
+        return certain_rows_search(solver, row_count, deadline)
+    finally:
+        solver.delete()
+
+# Function to solve a batch of conflict components (in a worker process), see component_certain_rows
+# The deadline is a time.time() value (so batches can be sent to worker processes), with one timer for the batch,
+# and the conflict budget is the number of conflicts left to the whole batch
+def solve_component_batch(jobs, solvers=DEFAULT_SOLVER, deadline=None, conflict_budget=None):
+    deadline = None if deadline is None and conflict_budget is None else Deadline(deadline, conflicts=conflict_budget)
+    try:
+        return [component_certain_rows(clauses, row_count, solvers, deadline) for clauses, row_count in jobs]
+    finally:
+        if deadline is not None:
+            deadline.cancel()
+
+# Get the smallest total weight of the chosen variables over the repairs of a conflict component, by weighted MaxSAT
+# (every weighted variable is a soft unit clause; negative weights are moved to the opposite literal)
+# weights maps variables to integer weights; returns None if the component has no repair
+def component_min_weight(clauses, weights, solver=DEFAULT_SOLVER):
+    formula = WCNF()
+    formula.extend(clauses)
+    offset = 0
+    for var, weight in weights.items():
+        if weight > 0:
+            formula.append([-var], weight=weight)
+        elif weight < 0:
+            formula.append([var], weight=-weight)
+            offset += weight
+    with RC2(formula, solver=solver) as maxsat:
+        if maxsat.compute(expect_interrupt=True) is None:
+            return None
+        return maxsat.cost + offset
+
+# Get the bounds of MIN over the repairs of a conflict component by SAT threshold searches
+# values maps the variables of the rows that satisfy the query to their (integer) sort keys
+# Returns None if the component has no repair, otherwise the smallest key chosen by some repair, the largest MIN
+# over the repairs that choose a variable, and whether every repair chooses one (the keys are None if none can be)
+def component_min_bounds(clauses, var_count, values, solver=DEFAULT_SOLVER):
+    keys = sorted(set(values.values()))
+    with Solver(name=solver, bootstrap_with=clauses) as sat_solver:
+        if not limited_solve(sat_solver):
+            return None
+        activation = [var_count]
+
+        # Check whether some repair chooses one of the variables whose key is in [low, high] and none of the
+        # variables whose key is below low (the clause is only active under its own activation literal)
+        def exists(low, high):
+            activation[0] += 1
+            chosen = [var for var, key in values.items() if low <= key <= high]
+            sat_solver.add_clause([-activation[0]] + chosen)
+            blocked = [-var for var, key in values.items() if key < low]
+            return limited_solve(sat_solver, assumptions=[activation[0]] + blocked)
+
+        if not exists(keys[0], keys[-1]):
+            return None, None, False
+
+        # Smallest key chosen by some repair: the first threshold below which some variable can be chosen
+        low, high = 0, len(keys) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if exists(keys[0], keys[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        smallest = keys[low]
+
+        # Largest MIN over the repairs that choose a variable: the last threshold below which nothing has to be chosen
+        low, high = 0, len(keys) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if exists(keys[middle], keys[-1]):
+                low = middle
+            else:
+                high = middle - 1
+        largest = keys[low]
+        return smallest, largest, not limited_solve(sat_solver, assumptions=[-var for var in values])
+
+# Get the canonical description of a query or a constraint (None for a plain callable, which has none)
+def describe(item, header=None):
+    return item.describe(header) if hasattr(item, "describe") else None
+
+# Two-tier cache of query results and of the encodings and results of the conflict components
+# Entries are keyed by a tuple of canonical descriptions whose first item is the dataset fingerprint
+# (and whose second item is CACHE_VERSION, so entries of an older format are never read)
+# The memory tier is an LRU bounded by the pickled size of its entries; the disk tier (optional) keeps one
+# pickle file per entry, in a directory per dataset fingerprint, so it survives restarts
+class ResultCache:
+
+    # Initialize the cache with its directory (None for a memory-only cache) and the size of its memory tier
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.stats = {"memory hits": 0, "disk hits": 0, "misses": 0}
+        self.lock = threading.Lock()
+
+    # The lock is not pickled, so the cache can be handed to batch worker processes
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    # Get the path of the file of an entry
+    def entry_path(self, key):
+        return os.path.join(self.directory, key[0], hashlib.sha256(repr(key).encode()).hexdigest() + ".pickle")
+
+    # Keep the pickled value of an entry in the memory tier, evicting the least recently used entries past max_bytes
+    def remember(self, key, payload):
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = payload
+        self.size += len(payload)
+        while self.size > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    # Look up an entry; returns whether it was found and its value
+    # The memory tier is guarded by a lock, so one cache can be shared by the threads of a server
+    def get(self, key):
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+                self.stats["memory hits"] += 1
+        if payload is not None:
+            return True, pickle.loads(payload)
+        if self.directory is not None:
+            try:
+                with open(self.entry_path(key), "rb") as file:
+                    payload = file.read()
+            except FileNotFoundError:
+                pass
+            else:
+                with self.lock:
+                    self.stats["disk hits"] += 1
+                    self.remember(key, payload)
+                return True, pickle.loads(payload)
+        with self.lock:
+            self.stats["misses"] += 1
+        return False, None
+
+    # Store an entry in both tiers (the file is written under a temporary name and moved in place)
+    def put(self, key, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.remember(key, payload)
+        if self.directory is not None:
+            path = self.entry_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary_path, "wb") as file:
+                file.write(payload)
+            os.replace(temporary_path, path)
+
+    # Drop the entries of a dataset fingerprint from the memory tier (and from the disk tier if on_disk is set)
+    # The files are kept by default: they are still valid for the unchanged source of an updated dataset
+    def invalidate(self, fingerprint, on_disk=False):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == fingerprint]:
+                self.size -= len(self.entries.pop(key))
+        if on_disk and self.directory is not None:
+            shutil.rmtree(os.path.join(self.directory, fingerprint), ignore_errors=True)
+
+# Function to print performance metrics (timings in seconds, counters as plain numbers)
+def print_metrics(metrics):
+    print("Performance Metrics:")
+    for key, value in metrics.items():
+        if key in COUNTER_METRICS:
+            print(f"{key}: {value}")
+        else:
+            print(f"{key}: {value:.4f} seconds")
+
 class CAvSAT:
     
-    # Initialize the CAvSAT system with data and constraints
-    def __init__(self, data, constraints):
-        self.data = data
-        self.constraints = constraints
-        self.variables = {}
-        self.clauses = []
+    # Initialize the CAvSAT system with data and constraints (and optionally a shared profiler)
+    # solver is a pysat solver name, or a list of names raced as a portfolio on the larger conflict components
+    # cache is an optional ResultCache for the answers of every method and the encodings and results of the conflict components
+    def __init__(self, data, constraints, profiler=None, solver=DEFAULT_SOLVER, cache=None):
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self.data = as_relation(data)
+        with self.profiler.phase("index build", rows=len(self.data)):
+            self.constraints = build_constraints(constraints, self.data)
+        self.key_constraints = [constraint for constraint in self.constraints if isinstance(constraint, KeyConstraint)]
+        self.dependency_constraints = [constraint for constraint in self.constraints if isinstance(constraint, (FunctionalDependency, DenialConstraint))]
+
+        # With a single key constraint and no other dependency, the conflict components are its key groups
+        self.single_key = len(self.key_constraints) == 1 and not self.dependency_constraints
+        self.component_edges = []
+        self.consistent_mask = None
+        self.sql_backend = None
+        self.excluded = np.zeros(0, dtype=bool)
+        self.component_labels = None
+        self.component_order = None
+        self.component_offsets = None
+        self.merged_components = {}
+        self.component_edge_lists = {}
+        self.merged_row_count = 0
+        self.component_workers = None
+        self.solver = solver
+        self.time_budget = None
+        self.conflict_budget = None
+        self.cache = cache
+        self.result_state = None
+        self.undecided_rows = np.zeros(0, dtype=np.int64)
+        self.solved_rows = np.zeros(0, dtype=bool)
+        self.certain_mask = np.zeros(0, dtype=bool)
+        self.unrepairable_rows = np.zeros(0, dtype=bool)
         self.result = []
+        self.prepared = False
         self.performance_metrics = {}
 
-    # Encode the data and constraints into SAT variables and clauses
-    def encode(self):
-        start_time = time.time()
-
-        # Assign a unique SAT variable for each record
-        for index, record in enumerate(self.data):
-            self.variables[record] = index + 1
-
-        # Encode the constraints
-        for constraint in self.constraints:
-            for record in self.data:
-                if not constraint(record):
-                    self.clauses.append([-self.variables[record]])
+    # Prepare the system once per (dataset, constraints): the rows excluded by plain callable constraints
+    # and the (empty) results of the conflict components, which are filled from the result cache as they are needed
+    def prepare(self):
+        self.excluded = ~self.callable_constraints_mask()
+        self.component_labels = None
+        self.solved_rows = np.zeros(len(self.data), dtype=bool)
+        self.certain_mask = np.zeros(len(self.data), dtype=bool)
+        self.unrepairable_rows = np.zeros(len(self.data), dtype=bool)
+        self.performance_metrics["Encoding Time"] = 0
+        self.result = None
+        self.prepared = True
+
+    # Get the conflict component of every row: two rows are connected when they share a key group, a conflicting
+    # group of a functional dependency or a denial constraint violation
+    # With a single key constraint the components are its key groups; otherwise they are the connected components
+    # (see connected_components) of the live rows, joined by their key groups, the conflicting groups of the
+    # functional dependencies and the violations of the denial constraints; a component is labelled by its
+    # smallest row id (inserts merge the components they join, see merge_components)
+    def component_of_row(self):
+        if self.single_key:
+            return self.key_constraints[0].group_of_row
+        if self.component_labels is None:
+            live_rows = np.flatnonzero(self.data.live_mask())
+            edges = []
+            for constraint in self.key_constraints:
+                edges.append(group_edges(live_rows, constraint.group_of_row[live_rows]))
+            for constraint in self.dependency_constraints:
+                if isinstance(constraint, FunctionalDependency):
+                    rows = np.flatnonzero(constraint.conflict_mask)
+                    edges.append(group_edges(rows, constraint.group_of_row[rows]))
                 else:
-                    self.clauses.append([self.variables[record]])
-
-        end_time = time.time()
-        
-        # Record the encoding time in the performance metrics
-        self.performance_metrics["Encoding Time"] = end_time - start_time
+                    edges.append(constraint.edges)
+            left, right = (np.concatenate([np.zeros(0, dtype=np.int64)] + [edge[side] for edge in edges]) for side in (0, 1))
+            labels = connected_components(len(self.data), left, right)
+            self.component_labels = labels
+            self.component_order = np.argsort(labels, kind="stable")
+            self.component_offsets = np.searchsorted(labels[self.component_order], np.arange(len(self.data) + 1))
+            self.merged_components = {}
+            self.component_edge_lists = {}
+            self.merged_row_count = 0
+
+            # Conflict edges of the denial constraints, sorted by component
+            self.component_edges = []
+            for constraint in self.dependency_constraints:
+                if isinstance(constraint, DenialConstraint):
+                    left, right = constraint.edges
+                    order = np.argsort(labels[left], kind="stable")
+                    offsets = np.searchsorted(labels[left][order], np.arange(len(self.data) + 1))
+                    self.component_edges.append((left[order], right[order], offsets))
+        return self.component_labels
+
+    # Get the (live) row ids of a conflict component
+    def component_rows(self, component_id):
+        if self.single_key:
+            return self.key_constraints[0].group_rows(component_id)
+        self.component_of_row()
+        rows = self.all_component_rows(component_id)
+        return rows if self.data.deleted is None else rows[~self.data.deleted[rows]]
+
+    # Get every row id of a conflict component, deleted ones included (a merged component keeps its rows apart,
+    # a row inserted since the components were labelled is a component of its own until it is merged)
+    def all_component_rows(self, component_id):
+        if component_id in self.merged_components:
+            return self.merged_components[component_id]
+        if component_id + 1 < len(self.component_offsets):
+            return self.component_order[self.component_offsets[component_id]:self.component_offsets[component_id + 1]]
+        return np.asarray([component_id], dtype=np.int64)
+
+    # Get the conflict edges of a component for every denial constraint
+    def component_denial_edges(self, component_id):
+        if component_id in self.component_edge_lists:
+            return self.component_edge_lists[component_id]
+        edges = []
+        for left, right, offsets in self.component_edges:
+            if component_id + 1 < len(offsets):
+                edges.append((left[offsets[component_id]:offsets[component_id + 1]], right[offsets[component_id]:offsets[component_id + 1]]))
+            else:
+                edges.append((np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)))
+        return edges
+
+    # Merge the conflict components joined by inserted rows (the components of the other rows do not change)
+    # The edges are the key groups and dependency groups of the affected rows and the denial constraint violations
+    # of the inserted rows; only the rows of the merged components are relabelled, and their rows and edges are
+    # kept apart (see all_component_rows) until they reach an eighth of the rows and every row is labelled again
+    def merge_components(self, row_ids, affected_rows):
+        labels = self.component_labels
+        if len(labels) < len(self.data):
+            labels = append_array(labels, np.arange(len(labels), len(self.data), dtype=np.int64))
+            self.component_labels = labels
+        live_rows = affected_rows[self.data.is_live(affected_rows)]
+        first_row = int(row_ids.min()) if len(row_ids) else len(self.data)
+        edges = []
+        denial_edges = []
+        for constraint in self.key_constraints:
+            edges.append(group_edges(live_rows, constraint.group_of_row[live_rows]))
+        for constraint in self.dependency_constraints:
+            if isinstance(constraint, FunctionalDependency):
+                rows = live_rows[constraint.conflict_mask[live_rows]]
+                edges.append(group_edges(rows, constraint.group_of_row[rows]))
+            else:
+                left, right = constraint.edges
+                recent = right >= first_row
+                denial_edges.append((left[recent], right[recent]))
+                edges.append(denial_edges[-1])
+        left, right = (np.concatenate([np.zeros(0, dtype=np.int64)] + [edge[side] for edge in edges]) for side in (0, 1))
+
+        # Components of the labels joined by the edges
+        nodes, inverse = np.unique(labels[np.concatenate([left, right])], return_inverse=True)
+        roots = nodes[connected_components(len(nodes), inverse[:len(left)], inverse[len(left):])]
+        merged = roots != nodes
+        for root in np.unique(roots[merged]).tolist():
+            component_ids = nodes[roots == root].tolist()
+            rows = np.concatenate([self.all_component_rows(component_id) for component_id in component_ids])
+            edge_lists = [self.component_denial_edges(component_id) for component_id in component_ids]
+            labels[rows] = root
+            for component_id in component_ids:
+                self.merged_components[component_id] = np.zeros(0, dtype=np.int64)
+                self.component_edge_lists.pop(component_id, None)
+            self.merged_components[root] = rows
+            self.merged_row_count += len(rows)
+
+            # Edges of the merged component: those of its parts and the new violations between them
+            self.component_edge_lists[root] = []
+            for index, (left, right) in enumerate(denial_edges):
+                new_edges = labels[left] == root
+                self.component_edge_lists[root].append(
+                    (np.concatenate([edge_list[index][0] for edge_list in edge_lists] + [left[new_edges]]),
+                     np.concatenate([edge_list[index][1] for edge_list in edge_lists] + [right[new_edges]])))
+
+    # Encode the repairs of a conflict component as clauses over variables of its own
+    # (the i-th row of the component that can be in a repair is variable i + 1, auxiliary variables follow)
+    # Returns every row of the component, the rows that have a variable, the clauses and the number of variables
+    def encode_component(self, component_id, tuple_of_row):
+        component_rows = self.component_rows(component_id)
+        rows = component_rows[~self.excluded[component_rows]]
+        if not self.single_key:
+            clauses, var_count = self.encode_subset_repairs(component_id, rows, tuple_of_row)
+            return component_rows, rows, clauses, var_count
+        clauses = []
+        var_count = len(rows)
+
+        # With a single key constraint the component is one key group: a repair keeps exactly one record of it
+        # (with several constraints a group may keep no record at all, see encode_subset_repairs)
+        # Exact duplicate rows are the same fact, so they are kept or dropped together
+        representatives = {}
+        for var, tuple_id in enumerate(tuple_of_row[rows].tolist(), start=1):
+            if tuple_id in representatives:
+                clauses.append([-var, representatives[tuple_id]])
+                clauses.append([var, -representatives[tuple_id]])
+            else:
+                representatives[tuple_id] = var
+        group_vars = list(representatives.values())
+
+        # At least one record of the group is chosen
+        clauses.append(group_vars)
+
+        # At most one record of the group is chosen
+        var_count = encode_at_most_one(group_vars, clauses, var_count)
+        return component_rows, rows, clauses, var_count
+
+    # Encode the repairs of a conflict component under several key constraints, functional dependencies or denial
+    # constraints: a repair is a maximal set of rows without a conflict, so a key group or a dependency group may
+    # keep no row at all; besides the conflict clauses, every row is chosen or in a conflict with a chosen row
+    # Variables as in encode_component (auxiliary variables stand for the rhs classes of dependency groups)
+    # Returns the clauses and the number of variables
+    def encode_subset_repairs(self, component_id, rows, tuple_of_row):
+        clauses = []
+        var_count = len(rows)
+
+        # Exact duplicate rows are the same fact, so they are kept or dropped together
+        var_of_tuple = {}
+        for var, tuple_id in enumerate(tuple_of_row[rows].tolist(), start=1):
+            if tuple_id in var_of_tuple:
+                clauses.append([-var, var_of_tuple[tuple_id]])
+                clauses.append([var, -var_of_tuple[tuple_id]])
+            else:
+                var_of_tuple[tuple_id] = var
+        row_vars = np.asarray([var_of_tuple[tuple_id] for tuple_id in tuple_of_row[rows].tolist()], dtype=np.int64)
+
+        # Literals of which one must hold when a record is left out of a repair (its conflicts with chosen records)
+        blockers = {var: [] for var in var_of_tuple.values()}
+
+        # Key groups: at most one record of each group is chosen
+        # Conflicting groups of a functional dependency: the chosen records share one rhs class (a class variable is
+        # set by any chosen record of the class, and needs one of them)
+        constraints = self.key_constraints + [constraint for constraint in self.dependency_constraints if isinstance(constraint, FunctionalDependency)]
+        for constraint in constraints:
+            if isinstance(constraint, KeyConstraint):
+                members = np.arange(len(rows))
+                class_of_member = tuple_of_row[rows]
+            else:
+                members = np.flatnonzero(constraint.conflict_mask[rows])
+                class_of_member = constraint.class_of_row[rows[members]]
+            group_of_member = constraint.group_of_row[rows[members]]
+            order = np.lexsort((class_of_member, group_of_member))
+            boundaries = np.flatnonzero(np.diff(group_of_member[order])) + 1
+            for group in np.split(order, boundaries) if len(order) else []:
+                classes = {}
+                for member, class_id in zip(members[group].tolist(), class_of_member[group].tolist()):
+                    classes.setdefault(class_id, {})[int(row_vars[member])] = None
+                if len(classes) < 2:
+                    continue
+                class_vars = []
+                for class_members in classes.values():
+                    class_members = list(class_members)
+                    if len(class_members) == 1:
+                        class_vars.append(class_members[0])
+                        continue
+                    var_count += 1
+                    clauses.extend([-var, var_count] for var in class_members)
+                    clauses.append([-var_count] + class_members)
+                    class_vars.append(var_count)
+                var_count = encode_at_most_one(class_vars, clauses, var_count)
+                for class_members, class_var in zip(classes.values(), class_vars):
+                    for var in class_members:
+                        blockers[var].extend(other for other in class_vars if other != class_var)
+
+        # Conflict edges of denial constraints: the two records are not both chosen
+        position = dict(zip(rows.tolist(), range(len(rows))))
+        for left, right in self.component_denial_edges(component_id):
+            for left_row, right_row in zip(left.tolist(), right.tolist()):
+                if left_row not in position or right_row not in position:
+                    continue
+                left_var, right_var = int(row_vars[position[left_row]]), int(row_vars[position[right_row]])
+                if left_var != right_var:
+                    clauses.append([-left_var, -right_var])
+                    blockers[left_var].append(right_var)
+                    blockers[right_var].append(left_var)
+
+        # Maximality: a record left out of a repair is in a conflict with a chosen record
+        for var, literals in blockers.items():
+            clauses.append([var] + list(dict.fromkeys(literals)))
+        return clauses, var_count
+
+    # Solve the conflict components of the given rows that are not solved yet and cache their certain rows
+    # Each component is an independent SAT problem of a few variables; many of them are solved over a process pool
+    # With a result cache, each component has an entry for its encoding and one for its result, keyed by its rows
+    # (see component_key), so a solve reads and writes entries only for the components it touches
+    # Components whose search is interrupted (deadline or conflict budget) have no result entry
+    # The deadline (a time.time() value) is also checked between the components while they are encoded and
+    # while their results are cached; the conflict budget is shared by the SAT calls of every component
+    # Returns the time spent encoding the components and the rows that could not be decided
+    def solve_components(self, row_ids, deadline=None, conflict_budget=None):
+        pending_rows = row_ids[~self.solved_rows[row_ids]]
+        component_ids = np.unique(self.component_of_row()[pending_rows])
+        cache_key = self.cache_key("component")
+
+        with self.profiler.phase("encode", components=len(component_ids)) as phase:
+            tuple_of_row = self.data.tuple_ids()
+            encoded = []
+            keys = []
+            skipped_ids = component_ids[:0]
+            for position, component_id in enumerate(component_ids.tolist()):
+                # Past the deadline, the components left are not encoded and their rows are undecided
+                if deadline is not None and time.time() >= deadline:
+                    skipped_ids = component_ids[position:]
+                    break
+                component_rows = self.component_rows(component_id)
+                key = None if cache_key is None else self.component_key(cache_key, component_rows)
+                if key is not None:
+                    found, result = self.cache.get(key + ("result",))
+                    if found:
+                        self.store_component_result(component_rows, *result)
+                        continue
+                    found, encoding = self.cache.get(key + ("cnf",))
+                    if found:
+                        encoded.append((component_rows,) + encoding)
+                        keys.append(key)
+                        continue
+                encoding = self.encode_component(component_id, tuple_of_row)
+                if key is not None:
+                    self.cache.put(key + ("cnf",), encoding[1:])
+                encoded.append(encoding)
+                keys.append(key)
+            phase["variables"] = sum(var_count for _, _, _, var_count in encoded)
+            phase["clauses"] = sum(len(clauses) for _, _, clauses, _ in encoded)
+            phase["cached"] = len(component_ids) - len(encoded) - len(skipped_ids)
+            phase["skipped"] = len(skipped_ids)
+
+        # Record the encoding time in the performance metrics (accumulated over the lifetime of the dataset)
+        self.performance_metrics["Encoding Time"] = self.performance_metrics.get("Encoding Time", 0) + phase["wall_ns"] / 1e9
+
+        with self.profiler.phase("component solve", components=len(encoded)) as solve_phase:
+            jobs = [(clauses, len(rows)) for _, rows, clauses, _ in encoded]
+            workers = min(self.component_workers or os.cpu_count() or 1, len(jobs)) if jobs else 1
+            if workers > 1 and len(jobs) >= PARALLEL_COMPONENTS:
+                batch_size = -(-len(jobs) // (4 * workers))
+                batches = [jobs[start:start + batch_size] for start in range(0, len(jobs), batch_size)]
+
+                # The worker processes cannot share a counter, so the conflict budget is split between the batches
+                batch_budget = None if conflict_budget is None else -(-conflict_budget // len(batches))
+                settings = (self.solver, deadline, batch_budget)
+                start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method)) as executor:
+                    results = [result for batch_results in executor.map(solve_component_batch, batches, *(itertools.repeat(setting) for setting in settings))
+                               for result in batch_results]
+            else:
+                results = solve_component_batch(jobs, self.solver, deadline, conflict_budget)
+            solve_phase["workers"] = workers if len(jobs) >= PARALLEL_COMPONENTS else 1
+
+        # Statistics of the SAT calls, summed over the components
+        undecided_rows = [pending_rows[np.isin(self.component_of_row()[pending_rows], skipped_ids)]]
+        for (component_rows, rows, _, _), key, (state, mask, statistics) in zip(encoded, keys, results):
+            for name, value in statistics.items():
+                solve_phase[name] = solve_phase.get(name, 0) + value
+            if state == "interrupted":
+                undecided_rows.append(rows[mask])
+                continue
+            self.store_component_result(component_rows, state, mask)
+
+            # Keep the result of the component in the result cache, so later runs do not solve it again
+            # (past the deadline, the results are only kept in memory)
+            if key is not None and (deadline is None or time.time() < deadline):
+                self.cache.put(key + ("result",), (state, mask))
+        undecided_rows = np.concatenate(undecided_rows)
+        solve_phase["undecided"] = len(undecided_rows)
+        return phase["wall_ns"] / 1e9, undecided_rows
+
+    # Get the cache key of a conflict component from the key of the kind "component" and the rows of the component
+    # (the dataset fingerprint and the constraints of the key decide the encoding of the rows)
+    def component_key(self, cache_key, component_rows):
+        return cache_key[:-1] + (hashlib.sha256(np.ascontiguousarray(component_rows, dtype=np.int64).tobytes()).hexdigest(),)
+
+    # Record the result of a solved conflict component: every row of the component is solved, and either the
+    # component has no repair or mask tells which of its rows that can be in a repair are certain
+    def store_component_result(self, component_rows, state, mask):
+        self.solved_rows[component_rows] = True
+        if state == "no repair":
+            self.unrepairable_rows[component_rows] = True
+        else:
+            self.certain_mask[component_rows[~self.excluded[component_rows]]] = mask
 
     # Solve the SAT problem and extract answers
-    def solve(self, query):
+    # Candidate rows that are in no conflict are answered directly; only the conflict components
+    # of the other candidates go to the SAT solver (and their results are cached per component)
+    # With a time budget (seconds) or a conflict budget (conflicts over all the SAT calls of the query), given here or
+    # set on the system, the work stops when the budget runs out: the result state is then "timed out" or "partial",
+    # the answers are the certain answers found so far, and the candidate rows that could not be decided (or whose
+    # answers could not be extracted before the deadline) are in undecided_rows
+    def solve(self, query, time_budget=None, conflict_budget=None):
+        self.profiler.sample()
+        time_budget = self.time_budget if time_budget is None else time_budget
+        conflict_budget = self.conflict_budget if conflict_budget is None else conflict_budget
+        deadline = None if time_budget is None else time.time() + time_budget
+
+        # Answers of the same query on the same data and constraints are taken from the result cache
+        key, found, answers = self.cache_lookup("SAT-Solver", query, "SAT Solving Time")
+        if found:
+            self.result_state = "complete"
+            self.undecided_rows = np.zeros(0, dtype=np.int64)
+            return answers
         
-        # Encode the data and constraints
-        self.encode()
-
-        # Start the SAT solving process
-        start_time = time.time()
-        solver = Glucose3()
-        solver.append_formula(self.clauses)
-        if solver.solve():
-            self.result = solver.get_model()
-        else:
-            self.result = None
-        end_time = time.time()
-
-        # Update the performance metrics with the SAT solving time
-        self.performance_metrics["SAT Solving Time"] = end_time - start_time
+        # Set up the component cache only once, the first time a query is solved
+        if not self.prepared:
+            self.prepare()
+
+        # Restrict the work to the candidate rows (index probe for predicates)
+        with self.profiler.phase("select") as phase:
+            candidate_rows = select_rows(self.data, query)
+            phase["candidates"] = len(candidate_rows)
+
+        with self.profiler.phase("solve") as phase:
+            encoding_time, self.result = self.certain_rows(candidate_rows, deadline, conflict_budget)
+            phase["certain"] = None if self.result is None else len(self.result)
+            phase["state"] = self.result_state
+        self.performance_metrics["SAT Solving Time"] = phase["wall_ns"] / 1e9 - encoding_time
         
-        # Extract answers based on the query
-        return self.extract_answers(query)
+        # Extract answers based on the query (only complete answers are cached)
+        answers = self.extract_answers(query, self.result, deadline)
+        self.performance_metrics["Undecided Rows"] = len(self.undecided_rows)
+        if key is not None and self.result_state == "complete":
+            self.cache.put(key, answers)
+        return answers
 
-    # Extract answers that satisfy the query
-    def extract_answers(self, query):
-        if not self.result:
+    # Get the cache key of a result (None without a cache, or if the query or a constraint has no canonical description)
+    def cache_key(self, kind, query=None):
+        if self.cache is None:
+            return None
+        descriptions = [describe(constraint, self.data.header) for constraint in self.constraints]
+        query_description = "" if query is None else describe(query, self.data.header)
+        if query_description is None or None in descriptions:
+            return None
+        return (self.data.fingerprint(), CACHE_VERSION, tuple(sorted(descriptions)), kind, query_description)
+
+    # Look up a result in the result cache and count the hit or the miss in the performance metrics
+    # (on a hit, the time metric of the method, if given, is the time of the lookup)
+    # Returns the cache key (None if the result cannot be cached), whether the result was found, and the result
+    def cache_lookup(self, kind, query=None, metric=None):
+        key = self.cache_key(kind, query)
+        if key is None:
+            return None, False, None
+        with self.profiler.phase("cache lookup", kind=kind) as phase:
+            found, value = self.cache.get(key)
+            phase["hit"] = found
+        counter = "Cache Hits" if found else "Cache Misses"
+        self.performance_metrics[counter] = self.performance_metrics.get(counter, 0) + 1
+        if found and metric is not None:
+            self.performance_metrics[metric] = phase["wall_ns"] / 1e9
+        return key, found, value
+
+    # Decide which candidate rows are certain, i.e. in every repair, and set the result state
+    # Returns the time spent encoding conflict components and the certain rows (None if some component has no repair)
+    def certain_rows(self, candidate_rows, deadline=None, conflict_budget=None):
+        consistent_mask = self.get_consistent_mask()
+        conflicting_rows = candidate_rows[~consistent_mask[candidate_rows] & ~self.excluded[candidate_rows]]
+        encoding_time, undecided_rows = self.solve_components(conflicting_rows, deadline, conflict_budget)
+        self.undecided_rows = np.intersect1d(candidate_rows, undecided_rows)
+        if self.unrepairable_rows[conflicting_rows].any():
+            self.result_state = "no repair"
+            return encoding_time, None
+        if len(undecided_rows):
+            self.result_state = "timed out" if deadline is not None and time.time() >= deadline else "partial"
+        else:
+            self.result_state = "complete"
+        return encoding_time, candidate_rows[consistent_mask[candidate_rows] | self.certain_mask[candidate_rows]]
+
+    # Extract the consistent (certain) answers of the query, i.e. the answers that hold in every repair
+    # With a deadline (a time.time() value), the rows are extracted a block at a time; past the deadline the rows
+    # left are added to the undecided rows and the result state is "timed out"
+    def extract_answers(self, query, certain_rows=None, deadline=None):
+        if self.result is None:
             return None
 
-        start_time = time.time()
-        answers = set()
-        for solution in self.result:
-            # Positive variable means the record is included
-            if solution > 0:
-                for record, index in self.variables.items():
-                    if index == solution and query(record):
-                        answers.add(record)
-        end_time = time.time()
+        with self.profiler.phase("extract") as phase:
+            if certain_rows is None:
+                _, certain_rows = self.certain_rows(select_rows(self.data, query))
+            if deadline is None:
+                answers = set(self.data.rows(certain_rows))
+            else:
+                answers = set()
+                for start in range(0, len(certain_rows), ROW_BLOCK_SIZE):
+                    if time.time() >= deadline:
+                        self.undecided_rows = np.union1d(self.undecided_rows, certain_rows[start:])
+                        self.result_state = "timed out"
+                        break
+                    answers.update(self.data.rows(certain_rows[start:start + ROW_BLOCK_SIZE]))
+            phase["answers"] = len(answers)
         
-        # Update the SAT solving time with the query extraction time
-        self.performance_metrics["Query Extraction Time"] = end_time - start_time
-        self.performance_metrics["SAT Solving Time"] += end_time - start_time
+        # Record the query extraction time separately from the SAT solving time
+        self.performance_metrics["Query Extraction Time"] = phase["wall_ns"] / 1e9
         
         # Return the answers
         return answers
 
-    # KW-SQL-Rewriting simulation
+    # Get the range-consistent answer of an aggregate query: the greatest lower bound and the least upper bound
+    # of the aggregate over all repairs, found without enumerating repairs or answers
+    # function is COUNT (of the distinct records that satisfy the query), SUM, MIN or MAX of a column (a name or an index)
+    # With group_by (column names or indexes), returns a dictionary from the values of each group to its bounds
+    # Returns None if there is no repair; the bounds of MIN and MAX are None when no repair has a record to aggregate
+    def aggregate(self, query, function, column=None, group_by=None):
+        self.profiler.sample()
+        function = function.upper()
+        if function not in ("COUNT", "SUM", "MIN", "MAX"):
+            raise ValueError(f"Unknown aggregate function {function!r}")
+        if function != "COUNT" and column is None:
+            raise ValueError(f"{function} needs a column")
+        group_columns = [self.data.column_index(name) for name in (group_by or [])]
+        column_name = "*" if column is None else self.data.header[self.data.column_index(column)]
+        group_names = ", ".join(self.data.header[index] for index in group_columns)
+        kind = f"{function}({column_name})" + (f" GROUP BY {group_names}" if group_names else "")
+
+        # Bounds of the same aggregate on the same data and constraints are taken from the result cache
+        key, found, bounds = self.cache_lookup(kind, query, "Aggregate Time")
+        if found:
+            return bounds
+        if not self.prepared:
+            self.prepare()
+
+        with self.profiler.phase("aggregate", function=function) as phase:
+            rows = select_rows(self.data, query)
+            rows = rows[~self.excluded[rows]]
+            phase["candidates"] = len(rows)
+            members = self.conflict_members() if self.single_key else None
+            if not group_columns:
+                bounds = self.aggregate_rows(function, column, rows, members)
+            else:
+                group_of_row, group_sizes = dense_group_ids([self.data.columns[index].codes()[rows] for index in group_columns])
+                group_order = np.argsort(group_of_row, kind="stable")
+                group_offsets = np.concatenate([[0], np.cumsum(group_sizes)])
+                bounds = {}
+                for group_id in range(len(group_sizes)):
+                    group_rows = rows[np.sort(group_order[group_offsets[group_id]:group_offsets[group_id + 1]])]
+                    group_bounds = self.aggregate_rows(function, column, group_rows, members)
+                    if group_bounds is None:
+                        bounds = None
+                        break
+                    bounds[tuple(self.data.columns[index].decode_one(group_rows[0]) for index in group_columns)] = group_bounds
+            self.result_state = "no repair" if bounds is None else "complete"
+            phase["state"] = self.result_state
+        self.performance_metrics["Aggregate Time"] = phase["wall_ns"] / 1e9
+        if key is not None:
+            self.cache.put(key, bounds)
+        return bounds
+
+    # Get the bounds of an aggregate over the repairs, restricted to the given rows (live rows that can be in a repair)
+    # The rows in no conflict are in every repair; the conflict components are independent, so each of them is
+    # optimized on its own (in closed form for key groups, by MaxSAT or SAT threshold searches otherwise)
+    # members is the result of conflict_members with a single key constraint (None otherwise)
+    def aggregate_rows(self, function, column, rows, members=None):
+        consistent_mask = self.get_consistent_mask()
+        consistent_rows = rows[consistent_mask[rows]]
+        conflicting_rows = rows[~consistent_mask[rows]]
+        tuple_of_row = self.data.tuple_ids()
+
+        # Integer keys of the rows: 1 (COUNT), the values of the column (SUM), or sort keys (MIN, MAX),
+        # where the strings of a dictionary-encoded column are ranked in their sorted order
+        values = self.data.column(column) if column is not None else None
+        if function == "COUNT":
+            keys = np.ones(len(self.data), dtype=np.int64)
+        elif isinstance(values, IntColumn):
+            keys = values.values
+        elif function == "SUM":
+            raise TypeError(f"SUM needs an integer column, not {column!r}")
+        else:
+            ranks = np.empty(len(values.dictionary), dtype=np.int64)
+            ranks[np.argsort(values.dictionary, kind="stable")] = np.arange(len(values.dictionary))
+            keys = ranks[values.codes()]
+
+        # MAX is the opposite of the MIN of the opposite keys
+        if function == "MAX":
+            keys = -keys
+        if function in ("MIN", "MAX"):
+            bounds = self.min_bounds(keys, consistent_rows, conflicting_rows, tuple_of_row, members)
+            if bounds is None or function == "MIN":
+                return None if bounds is None else tuple(None if key is None else self.decode_key(values, key) for key in bounds)
+            return tuple(None if key is None else self.decode_key(values, -key) for key in bounds[::-1])
+
+        # COUNT and SUM add up the distinct records in no conflict and the lightest (heaviest) choice of each component
+        _, first_rows = np.unique(tuple_of_row[consistent_rows], return_index=True)
+        total = int(keys[consistent_rows[first_rows]].sum())
+        component_bounds = self.sum_bounds(keys, conflicting_rows, tuple_of_row, members)
+        if component_bounds is None:
+            return None
+        return total + component_bounds[0], total + component_bounds[1]
+
+    # Get the smallest and the largest total key of the chosen rows over the repairs of the conflict components
+    # of the given rows (the other rows of the components weigh nothing); None if a component has no repair
+    def sum_bounds(self, keys, rows, tuple_of_row, members=None):
+        component_ids = np.unique(self.component_of_row()[rows])
+        if members is not None:
+            group_rows, group_index = self.component_members(component_ids, members)
+            weights = np.where(np.isin(group_rows, rows), keys[group_rows], 0)
+            lowest = np.full(len(component_ids), np.iinfo(np.int64).max, dtype=np.int64)
+            highest = np.full(len(component_ids), np.iinfo(np.int64).min, dtype=np.int64)
+            np.minimum.at(lowest, group_index, weights)
+            np.maximum.at(highest, group_index, weights)
+            return int(lowest.sum()), int(highest.sum())
+
+        # Every record of a component is weighted once, through the variable of its first row
+        selected = np.zeros(len(self.data), dtype=bool)
+        selected[rows] = True
+        solver = self.solver if isinstance(self.solver, str) else self.solver[0]
+        lowest = highest = 0
+        for component_id in component_ids.tolist():
+            _, var_rows, clauses, _ = self.encode_component(component_id, tuple_of_row)
+            weights = {}
+            seen = set()
+            for var, row in enumerate(var_rows.tolist(), start=1):
+                if selected[row] and tuple_of_row[row] not in seen:
+                    seen.add(tuple_of_row[row])
+                    weights[var] = int(keys[row])
+            low = component_min_weight(clauses, weights, solver)
+            if low is None:
+                return None
+            lowest += low
+            highest -= component_min_weight(clauses, {var: -weight for var, weight in weights.items()}, solver)
+        return lowest, highest
+
+    # Get the bounds of MIN of the keys of the chosen rows over the repairs: the smallest key of a row that is in
+    # some repair, and the largest MIN over the repairs (each component keeps its own largest MIN, or chooses
+    # none of the rows when it can); None if a component has no repair, and None bounds if no repair has a row
+    def min_bounds(self, keys, consistent_rows, rows, tuple_of_row, members=None):
+        component_ids = np.unique(self.component_of_row()[rows])
+        if members is not None:
+            group_rows, group_index = self.component_members(component_ids, members)
+            selected = np.isin(group_rows, rows)
+            smallest = np.full(len(component_ids), np.iinfo(np.int64).max, dtype=np.int64)
+            largest = np.full(len(component_ids), np.iinfo(np.int64).min, dtype=np.int64)
+            np.minimum.at(smallest, group_index[selected], keys[group_rows[selected]])
+            np.maximum.at(largest, group_index[selected], keys[group_rows[selected]])
+            forced = np.bincount(group_index[~selected], minlength=len(component_ids)) == 0
+            components = list(zip(smallest.tolist(), largest.tolist(), forced.tolist()))
+        else:
+            selected = np.zeros(len(self.data), dtype=bool)
+            selected[rows] = True
+            solver = self.solver if isinstance(self.solver, str) else self.solver[0]
+            components = []
+            for component_id in component_ids.tolist():
+                _, var_rows, clauses, var_count = self.encode_component(component_id, tuple_of_row)
+                values = {var: int(keys[row]) for var, row in enumerate(var_rows.tolist(), start=1) if selected[row]}
+                bounds = component_min_bounds(clauses, var_count, values, solver)
+                if bounds is None:
+                    return None
+                if bounds[0] is not None:
+                    components.append(bounds)
+
+        # Rows in no conflict are in every repair, like the components that always choose one of the rows
+        forced_keys = [largest for _, largest, forced in components if forced]
+        if len(consistent_rows):
+            forced_keys.append(int(keys[consistent_rows].min()))
+        smallest_keys = [smallest for smallest, _, _ in components] + forced_keys
+        if not smallest_keys:
+            return None, None
+        if forced_keys:
+            return min(smallest_keys), min(forced_keys)
+        return min(smallest_keys), max(largest for _, largest, _ in components)
+
+    # Get the rows of the given (sorted) key groups that can be in a repair, with the position of their group in group_ids
+    # members holds the rows of every conflicting key group that can be in a repair and their groups, sorted by group
+    # (only used with a single key constraint, whose conflict components are its key groups)
+    def component_members(self, group_ids, members):
+        member_rows, member_groups = members
+        starts = np.searchsorted(member_groups, group_ids, side="left")
+        group_index, positions = expand_ranges(starts, np.searchsorted(member_groups, group_ids, side="right") - starts)
+        return member_rows[positions], group_index
+
+    # Get the rows of the conflicting key groups that can be in a repair and their groups, sorted by group
+    # (computed once per aggregate query, see component_members)
+    def conflict_members(self):
+        constraint = self.key_constraints[0]
+        member_rows = np.flatnonzero(constraint.conflict_mask & ~self.excluded & self.data.live_mask())
+        member_groups = constraint.group_of_row[member_rows]
+        order = np.argsort(member_groups, kind="stable")
+        return member_rows[order], member_groups[order]
+
+    # Decode the sort key of a value of a column (an integer, or the string of that rank in the dictionary)
+    def decode_key(self, column, key):
+        if isinstance(column, IntColumn):
+            return key
+        return str(np.sort(column.dictionary)[key])
+
+    # Get the mask of the rows (all of them, or the given ones) that satisfy every plain callable constraint
+    # (and are in no denial constraint violation with themselves), i.e. the rows that can be in a repair
+    def callable_constraints_mask(self, row_ids=None):
+        mask = np.ones(len(self.data) if row_ids is None else len(row_ids), dtype=bool)
+        for constraint in self.constraints:
+            if isinstance(constraint, DenialConstraint):
+                mask &= ~(constraint.violation_mask if row_ids is None else constraint.violation_mask[row_ids])
+            elif not isinstance(constraint, DECLARATIVE_CONSTRAINTS):
+                mask &= self.data.mask(constraint, row_ids)
+        return mask
+
+    # Get the mask of the (live) rows that satisfy every constraint (computed once per dataset, then maintained by updates)
+    def get_consistent_mask(self):
+        if self.consistent_mask is None:
+            mask = self.callable_constraints_mask() & self.data.live_mask()
+            for constraint in self.constraints:
+                if isinstance(constraint, DECLARATIVE_CONSTRAINTS):
+                    mask &= ~constraint.conflict_mask
+            self.consistent_mask = mask
+        return self.consistent_mask
+
+    # Insert text records into the dataset, keeping the index, the encoding and the warm solver up to date
+    def insert(self, records):
+        return self.update(records, inserted=True)[0]
+
+    # Delete text records from the dataset (every live row equal to one of the records is deleted)
+    def delete(self, records):
+        return self.update(records, inserted=False)[0]
+
+    # Insert or delete text records: update the relation and its constraints, then the state of this system
+    # Returns the ids of the inserted or deleted rows and of every row whose conflicts may have changed
+    # (other systems over the same relation and constraints catch up with apply_update)
+    def update(self, records, inserted):
+        self.invalidate_cache()
+        with self.profiler.phase("insert" if inserted else "delete") as phase:
+            row_ids, affected_rows = self.update_relation(records, inserted)
+            self.apply_update(row_ids, affected_rows, inserted)
+            phase["rows"] = len(row_ids)
+            phase["affected_rows"] = len(affected_rows)
+        self.performance_metrics["Update Time"] = phase["wall_ns"] / 1e9
+        return row_ids, affected_rows
+
+    # Insert or delete text records in the relation and its constraints (shared by every system built over them)
+    # Every declarative constraint is maintained incrementally: key constraints and functional dependencies only
+    # visit their affected groups; denial constraints pair the new rows with the rows of their partitions if an
+    # equality compares a column with itself (with every live row otherwise), and deletes filter their edge list
+    # Returns the ids of the inserted or deleted rows and of the rows of the affected groups and violations
+    def update_relation(self, records, inserted):
+        if inserted:
+            row_ids = self.data.append_rows(records)
+        else:
+            row_ids = self.find_rows(records)
+            self.data.delete_rows(row_ids)
+        affected_rows = [row_ids]
+        for constraint in self.key_constraints + self.dependency_constraints:
+            affected = constraint.insert_rows(row_ids) if inserted else constraint.delete_rows(row_ids)
+            if isinstance(constraint, DenialConstraint):
+                affected_rows.append(affected)
+            else:
+                affected_rows.extend(constraint.group_rows(group_id, include_deleted=True) for group_id in affected.tolist())
+        return row_ids, np.unique(np.concatenate(affected_rows))
+
+    # Drop the cached results of the current content of the dataset from the memory tier of the result cache
+    # (the cache keys hold the dataset fingerprint, so the results of the old content can no longer be hit anyway)
+    def invalidate_cache(self):
+        if self.cache is not None:
+            self.cache.invalidate(self.data.fingerprint())
+
+    # Get the ids of the live rows equal to one of the given text records
+    # The rows are found through the key groups of a key constraint if there is one, otherwise with a scan
+    def find_rows(self, records):
+        records = [tuple(str(value) for value in record) for record in records]
+        key_constraints = self.key_constraints
+        if not key_constraints:
+            wanted = set(records)
+            return np.flatnonzero(self.data.mask(lambda record: record in wanted) & self.data.live_mask())
+
+        constraint = key_constraints[0]
+        row_ids = []
+        for record, group_id in zip(records, constraint.find_groups([constraint.key(record) for record in records])):
+            if group_id is None:
+                continue
+            group_rows = constraint.group_rows(group_id)
+            row_ids.extend(row_id for row_id, row in zip(group_rows.tolist(), self.data.rows(group_rows)) if row == record)
+        return np.unique(np.asarray(row_ids, dtype=np.int64))
+
+    # Bring the cached state up to date after rows were inserted or deleted (see update_relation)
+    # The cached results of the conflict components of the affected rows are dropped, so they are solved again
+    # the next time a query touches them; only the affected rows are visited (with several constraints the
+    # components themselves are recomputed, see component_of_row)
+    # A system can replay the updates made through another system in order, after the relation has moved on:
+    # the masks grow to every row appended since and the affected rows are checked against the current state
+    def apply_update(self, row_ids, affected_rows, inserted):
+
+        # The masks grow in amortized time (see append_array)
+        if self.consistent_mask is not None and len(self.consistent_mask) < len(self.data):
+            self.consistent_mask = append_array(self.consistent_mask, np.zeros(len(self.data) - len(self.consistent_mask), dtype=bool))
+        if self.prepared and len(self.excluded) < len(self.data):
+            added_rows = np.arange(len(self.excluded), len(self.data))
+            new_rows = np.zeros(len(added_rows), dtype=bool)
+            self.excluded = append_array(self.excluded, ~self.callable_constraints_mask(added_rows))
+            self.solved_rows = append_array(self.solved_rows, new_rows)
+            self.certain_mask = append_array(self.certain_mask, new_rows)
+            self.unrepairable_rows = append_array(self.unrepairable_rows, new_rows)
+
+        # With several constraints, inserts merge the components they join and deletes keep the components as they
+        # are (a component may then hold independent parts, which are solved together); the rows of the components
+        # of the affected rows are stale
+        if self.prepared:
+            stale_rows = affected_rows
+            if not self.single_key:
+                if self.component_labels is None:
+                    labels = self.component_of_row()
+                    stale_rows = np.flatnonzero(np.isin(labels, labels[affected_rows]))
+                else:
+                    if inserted or len(self.component_labels) < len(self.data):
+                        self.merge_components(row_ids, affected_rows)
+                    component_ids = np.unique(self.component_labels[affected_rows]).tolist()
+                    stale_rows = np.concatenate([affected_rows] + [self.all_component_rows(component_id) for component_id in component_ids])
+                    if self.merged_row_count > max(ROW_BLOCK_SIZE, len(self.data) // 8):
+                        self.component_labels = None
+            self.solved_rows[stale_rows] = False
+            self.unrepairable_rows[stale_rows] = False
+            self.certain_mask[stale_rows] = False
+
+        # The consistency of a row only changes if one of its groups or violations changed
+        if self.consistent_mask is not None:
+            mask = self.data.is_live(affected_rows) & self.callable_constraints_mask(affected_rows)
+            for constraint in self.constraints:
+                if isinstance(constraint, DECLARATIVE_CONSTRAINTS):
+                    mask &= ~constraint.conflict_mask[affected_rows]
+            self.consistent_mask[affected_rows] = mask
+
+        if self.sql_backend is not None:
+            if inserted:
+                self.sql_backend.insert_rows(row_ids)
+            else:
+                self.sql_backend.delete_rows(row_ids)
+        self.result = None
+
+    # Get the SQLite backend of the dataset if the query can be answered by a consistent SQL rewriting,
+    # i.e. the query is a declarative predicate and the only constraint is a single primary key
+    def get_sql_backend(self, query):
+        if not isinstance(query, Predicate) or len(self.constraints) != 1 or not isinstance(self.constraints[0], KeyConstraint):
+            return None
+        if self.sql_backend is None:
+            with self.profiler.phase("sqlite load", rows=len(self.data)) as phase:
+                self.sql_backend = SQLiteBackend(self.data, self.constraints[0].columns)
+            self.performance_metrics["SQLite Load Time"] = phase["wall_ns"] / 1e9
+        return self.sql_backend
+
+    # KW-SQL-Rewriting: run the NOT EXISTS rewriting of the query on SQLite
+    # (queries without a SQL form fall back to a simulation over the consistent rows)
     def kw_sql_simulation(self, query):
+        self.profiler.sample()
+        key, found, result = self.cache_lookup("KW-SQL-Rewriting", query, "KW-SQL Simulation Time")
+        if found:
+            return result
+        backend = self.get_sql_backend(query)
         
-        # Start the KW-SQL simulation
-        start_time = time.time()
-        result = []
-        for record in self.data:
-            if query(record) and all(constraint(record) for constraint in self.constraints):
-                result.append(record)
-        end_time = time.time()
+        # Start the KW-SQL query
+        with self.profiler.phase("kw-sql") as phase:
+            if backend is not None:
+                result = backend.execute(backend.kw_sql_rewriting(query))
+            else:
+                candidate_rows = select_rows(self.data, query)
+                result = self.data.rows(candidate_rows[self.get_consistent_mask()[candidate_rows]])
 
         # Record the KW-SQL simulation time in the performance metrics
-        self.performance_metrics["KW-SQL Simulation Time"] = end_time - start_time
+        self.performance_metrics["KW-SQL Simulation Time"] = phase["wall_ns"] / 1e9
+        if key is not None:
+            self.cache.put(key, result)
         return result
 
-    # ConQuer-SQL-Rewriting simulation
+    # ConQuer-SQL-Rewriting: run the GROUP BY / HAVING rewriting of the query on SQLite
+    # (queries without a SQL form fall back to a simulation over the consistent rows)
     def conquer_sql_simulation(self, query):
+        self.profiler.sample()
+        key, found, result = self.cache_lookup("ConQuer-SQL-Rewriting", query, "ConQuer-SQL Simulation Time")
+        if found:
+            return result
+        backend = self.get_sql_backend(query)
         
-        # Start the ConQuer-SQL simulation
-        start_time = time.time()
-        result = [record for record in self.data if query(record) and all(constraint(record) for constraint in self.constraints)]
-        end_time = time.time()
+        # Start the ConQuer-SQL query
+        with self.profiler.phase("conquer-sql") as phase:
+            if backend is not None:
+                result = backend.execute(backend.conquer_sql_rewriting(query))
+            else:
+                candidate_rows = select_rows(self.data, query)
+                result = self.data.rows(candidate_rows[self.get_consistent_mask()[candidate_rows]])
 
         # Record the ConQuer-SQL simulation time in the performance metrics
-        self.performance_metrics["ConQuer-SQL Simulation Time"] = end_time - start_time
+        self.performance_metrics["ConQuer-SQL Simulation Time"] = phase["wall_ns"] / 1e9
+        if key is not None:
+            self.cache.put(key, result)
         return result
     
     # Regular SQL retrieval simulation
     def sql_simulation(self, query):
+        self.profiler.sample()
+        key, found, result = self.cache_lookup("Regular SQL Query", query, "SQL Simulation Time")
+        if found:
+            return result
         
         # Start the SQL simulation
-        start_time = time.time()
-        result = [record for record in self.data if query(record)]
-        end_time = time.time()
+        with self.profiler.phase("sql") as phase:
+            result = self.data.rows(select_rows(self.data, query))
 
         # Record the SQL simulation time in the performance metrics
-        self.performance_metrics["SQL Simulation Time"] = end_time - start_time
+        self.performance_metrics["SQL Simulation Time"] = phase["wall_ns"] / 1e9
+        if key is not None:
+            self.cache.put(key, result)
         return result
 
+    # Run every (query, method) job of a batch over a pool of worker processes
+    # Workers are forked (where the platform allows it) so the dataset and its key-group index are shared with
+    # the parent instead of being pickled; a memory-mapped snapshot is shared through the page cache either way
+    # Returns the results and the performance metrics of every job keyed by (query index, method name),
+    # merged in job order so the output does not depend on which worker finished first
+    # (the profiler records of every job are merged into this system's profiler the same way)
+    def run_batch(self, queries, methods=None, workers=None):
+        methods = list(BATCH_METHODS) if methods is None else list(methods)
+        jobs = [(query_index, method) for query_index in range(len(queries)) for method in methods]
+        workers = min(workers or os.cpu_count() or 1, len(jobs)) if jobs else 1
+
+        if workers <= 1:
+            init_batch_worker(self.data, self.constraints, queries, self.profiler.enabled, self.profiler.sample_rate, self.worker_settings())
+            outcomes = [run_batch_job(query_index, method) for query_index, method in jobs]
+        else:
+            start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method),
+                                     initializer=init_batch_worker,
+                                     initargs=(self.data, self.constraints, queries, self.profiler.enabled, self.profiler.sample_rate,
+                                               self.worker_settings())) as executor:
+                futures = [executor.submit(run_batch_job, query_index, method) for query_index, method in jobs]
+                outcomes = [future.result() for future in futures]
+
+        results = {}
+        metrics = {}
+        for (query_index, method), (result, job_metrics, job_records) in zip(jobs, outcomes):
+            results[(query_index, method)] = result
+            metrics[(query_index, method)] = job_metrics
+            for record in job_records:
+                record.update(query=query_index, method=method)
+            self.profiler.records.extend(job_records)
+        return results, metrics
+
+    # Get the settings a batch worker copies from the system (solver or portfolio, time and conflict budgets, result cache)
+    def worker_settings(self):
+        return {"solver": self.solver, "time_budget": self.time_budget, "conflict_budget": self.conflict_budget, "cache": self.cache}
+
     # Print the performance metrics
     def print_performance_metrics(self):
-        print("Performance Metrics:")
-        for key, value in self.performance_metrics.items():
-            print(f"{key}: {value:.4f} seconds")
+        print_metrics(self.performance_metrics)
 
     # Get the performance metrics
     def get_metrics(self):
         return self.performance_metrics
 
-# Function to load data from a CSV file
-def load_data_from_csv(file_path):
+# Atom of a conjunctive query: a relation of the database (under an alias, e.g. for self-joins) and an optional
+# selection on its rows (a predicate or any callable over a record)
+class Atom:
+
+    # Initialize the atom with its relation name, its selection and its alias (the relation name by default)
+    def __init__(self, relation, predicate=None, alias=None):
+        self.relation = relation
+        self.predicate = predicate
+        self.alias = alias if alias is not None else relation
+
+# Conjunctive (select-project-join) query over the relations of a database
+# joins is a list of equalities ((alias, column), (alias, column)) and select the list of (alias, column) of the answers
+# Represents following SQL statement: SELECT select FROM atoms WHERE selections AND joins
+class ConjunctiveQuery:
+
+    # Initialize the query with its atoms, join equalities and answer columns
+    def __init__(self, atoms, joins=(), select=()):
+        self.atoms = list(atoms)
+        self.joins = list(joins)
+        self.select = list(select)
+
+# Database of named relations, each with its own constraints, answering conjunctive queries consistently
+# Every relation keeps a CAvSAT system of its own (key groups, conflict components, updates); a query is
+# evaluated with hash joins, and the SAT encoding only covers the conflict components of its join witnesses
+class Database:
+
+    # Initialize the database with a dictionary from relation names to (data, constraints), and optionally
+    # a shared profiler and the SAT solver of every relation
+    def __init__(self, relations=None, profiler=None, solver=DEFAULT_SOLVER):
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self.solver = solver
+        self.systems = {}
+        self.result_state = None
+        self.performance_metrics = {}
+        for name, (data, constraints) in (relations or {}).items():
+            self.add_relation(name, data, constraints)
+
+    # Add a relation with its constraints (updates go through its system, e.g. database.systems[name].insert)
+    def add_relation(self, name, data, constraints=()):
+        self.systems[name] = CAvSAT(data, list(constraints), self.profiler, self.solver)
+        return self.systems[name]
+
+    # Get the rows of the atom that satisfy its selection (and every plain callable constraint of its relation
+    # when repairs_only is set, since the other rows are in no repair)
+    def atom_rows(self, query, atom, repairs_only=True):
+        system = self.systems[atom.relation]
+        rows = np.flatnonzero(system.data.live_mask()) if atom.predicate is None else select_rows(system.data, atom.predicate)
+        if repairs_only:
+            if not system.prepared:
+                system.prepare()
+            rows = rows[~system.excluded[rows]]
+
+        # Equalities between two columns of the same atom are selections too
+        relation = system.data
+        for (left_alias, left_column), (right_alias, right_column) in self.query_joins(query, atom.alias, atom.alias):
+            left_codes, right_codes = shared_codes(join_keys(relation, left_column, rows), join_keys(relation, right_column, rows))
+            rows = rows[left_codes == right_codes]
+        return rows
+
+    # Get the join equalities of a query between two aliases (in that order)
+    def query_joins(self, query, left_alias, right_alias):
+        joins = []
+        for left, right in query.joins:
+            if left[0] == left_alias and right[0] == right_alias:
+                joins.append((left, right))
+            elif left[0] == right_alias and right[0] == left_alias and left_alias != right_alias:
+                joins.append((right, left))
+        return joins
+
+    # Get the join witnesses of a query: a dictionary from each alias to the row of its relation in every witness
+    # The atoms are joined one at a time, smallest first, preferring atoms joined to the ones already in the result
+    def join(self, query, repairs_only=True):
+        candidates = {atom.alias: self.atom_rows(query, atom, repairs_only) for atom in query.atoms}
+        relations = {atom.alias: self.systems[atom.relation].data for atom in query.atoms}
+        remaining = sorted(candidates, key=lambda alias: len(candidates[alias]))
+        first = remaining.pop(0)
+        witnesses = {first: candidates[first]}
+        while remaining:
+            connected = [alias for alias in remaining if any(self.query_joins(query, joined, alias) for joined in witnesses)]
+            alias = min(connected or remaining, key=lambda alias: len(candidates[alias]))
+            remaining.remove(alias)
+
+            # Join on every equality with the atoms already joined (no equality is a cross product)
+            left_codes = [np.zeros(len(next(iter(witnesses.values()))), dtype=np.int64)]
+            right_codes = [np.zeros(len(candidates[alias]), dtype=np.int64)]
+            for joined in list(witnesses):
+                for (_, left_column), (_, right_column) in self.query_joins(query, joined, alias):
+                    codes = shared_codes(join_keys(relations[joined], left_column, witnesses[joined]),
+                                         join_keys(relations[alias], right_column, candidates[alias]))
+                    left_codes.append(codes[0])
+                    right_codes.append(codes[1])
+            left_size = len(left_codes[0])
+            codes, _ = dense_group_ids([np.concatenate([left, right]) for left, right in zip(left_codes, right_codes)])
+            left_positions, right_positions = hash_join(codes[:left_size], codes[left_size:])
+            witnesses = {joined: rows[left_positions] for joined, rows in witnesses.items()}
+            witnesses[alias] = candidates[alias][right_positions]
+        return witnesses
+
+    # Get the answers of the query over the inconsistent database, like a regular SQL query
+    def evaluate(self, query):
+        witnesses = self.join(query, repairs_only=False)
+        answer_of_witness, first_witnesses = self.group_answers(query, witnesses)
+        return {self.decode_answer(query, witnesses, witness) for witness in first_witnesses.tolist()}
+
+    # Get the answer id of every witness (witnesses with the same values on the answer columns share their id)
+    # and one witness of each answer
+    def group_answers(self, query, witnesses):
+        witness_count = len(next(iter(witnesses.values())))
+        code_arrays = [self.systems[self.alias_relation(query, alias)].data.column(column).codes()[witnesses[alias]]
+                       for alias, column in query.select]
+        if not code_arrays:
+            answer_of_witness = np.zeros(witness_count, dtype=np.int64)
+        else:
+            answer_of_witness, _ = dense_group_ids(code_arrays)
+        _, first_witnesses = np.unique(answer_of_witness, return_index=True)
+        return answer_of_witness, first_witnesses
+
+    # Get the relation name of an alias of the query
+    def alias_relation(self, query, alias):
+        return next(atom.relation for atom in query.atoms if atom.alias == alias)
+
+    # Decode the answer of a witness
+    def decode_answer(self, query, witnesses, witness):
+        return tuple(self.systems[self.alias_relation(query, alias)].data.column(column).decode_one(witnesses[alias][witness])
+                     for alias, column in query.select)
+
+    # Get the consistent answers of a conjunctive query: the answers that have a witness in every repair
+    # An answer with a witness made of rows in no conflict is certain; any other answer is certain if no repair
+    # of the conflict components of its witnesses leaves out a row of every witness (one small SAT call per answer,
+    # over only those components: the other components cannot falsify its witnesses)
+    # Returns None if there is no repair
+    def solve(self, query):
+        self.profiler.sample()
+        with self.profiler.phase("join", atoms=len(query.atoms)) as phase:
+            witnesses = self.join(query)
+            answer_of_witness, first_witnesses = self.group_answers(query, witnesses)
+            phase["witnesses"] = len(answer_of_witness)
+        self.performance_metrics["Join Time"] = phase["wall_ns"] / 1e9
+        self.performance_metrics["Witnesses"] = len(answer_of_witness)
+
+        # Answers with a witness in every repair, whatever the repair
+        consistent_masks = {atom.alias: self.systems[atom.relation].get_consistent_mask()[witnesses[atom.alias]] for atom in query.atoms}
+        consistent_witness = np.logical_and.reduce(list(consistent_masks.values()))
+        certain = np.zeros(len(first_witnesses), dtype=bool)
+        certain[answer_of_witness[consistent_witness]] = True
+        open_witnesses = np.flatnonzero(~certain[answer_of_witness])
+
+        with self.profiler.phase("encode", witnesses=len(open_witnesses)) as phase:
+            blocks, block_of_row, var_of_row = self.encode_witness_components(query, witnesses, open_witnesses, consistent_masks)
+            phase["components"] = len(blocks)
+        self.performance_metrics["Encoding Time"] = phase["wall_ns"] / 1e9
+
+        with self.profiler.phase("solve", answers=len(first_witnesses)) as phase:
+            solver_name = self.solver if isinstance(self.solver, str) else self.solver[0]
+            for clauses, _ in blocks:
+                with Solver(name=solver_name, bootstrap_with=clauses) as solver:
+                    if not limited_solve(solver):
+                        self.result_state = "no repair"
+                        return None
+
+            # Witnesses of each open answer, as (component, variable) pairs of their rows in a conflict
+            order = open_witnesses[np.argsort(answer_of_witness[open_witnesses], kind="stable")]
+            boundaries = np.flatnonzero(np.diff(answer_of_witness[order])) + 1
+            for witness_block in np.split(order, boundaries) if len(order) else []:
+                witness_literals = set()
+                for witness in witness_block.tolist():
+                    witness_literals.add(tuple(sorted({(int(block_of_row[atom.relation][witnesses[atom.alias][witness]]),
+                                                        int(var_of_row[atom.relation][witnesses[atom.alias][witness]]))
+                                                       for atom in query.atoms if not consistent_masks[atom.alias][witness]})))
+
+                # Repairs of the components of the witnesses (over consecutive blocks of variables), where some row
+                # of every witness is left out
+                offsets = {}
+                clauses = []
+                top_var = 0
+                for block in sorted({block for literals in witness_literals for block, _ in literals}):
+                    offsets[block] = top_var
+                    clauses.extend([literal + top_var if literal > 0 else literal - top_var for literal in clause] for clause in blocks[block][0])
+                    top_var += blocks[block][1]
+                clauses.extend([-(offsets[block] + var) for block, var in literals] for literals in witness_literals)
+                with Solver(name=solver_name, bootstrap_with=clauses) as solver:
+                    certain[answer_of_witness[witness_block[0]]] = not limited_solve(solver)
+            phase["certain"] = int(certain.sum())
+        self.performance_metrics["SAT Solving Time"] = phase["wall_ns"] / 1e9
+        self.result_state = "complete"
+        return {self.decode_answer(query, witnesses, witness) for witness in first_witnesses[certain].tolist()}
+
+    # Encode the repairs of the conflict components of the (conflicting) rows of the given witnesses, each
+    # component once and over variables of its own (see CAvSAT.encode_component)
+    # Returns the clauses and number of variables of every component, and the component and the variable
+    # of each row of each relation (-1 and 0 for rows without one)
+    def encode_witness_components(self, query, witnesses, witness_ids, consistent_masks):
+        blocks = []
+        block_of_row = {}
+        var_of_row = {}
+        for relation in sorted({atom.relation for atom in query.atoms}):
+            system = self.systems[relation]
+            rows = np.concatenate([witnesses[atom.alias][witness_ids][~consistent_masks[atom.alias][witness_ids]]
+                                   for atom in query.atoms if atom.relation == relation])
+            block_of_row[relation] = np.full(len(system.data), -1, dtype=np.int64)
+            var_of_row[relation] = np.zeros(len(system.data), dtype=np.int64)
+            tuple_of_row = system.data.tuple_ids()
+            for component_id in np.unique(system.component_of_row()[rows]).tolist():
+                _, var_rows, clauses, var_count = system.encode_component(component_id, tuple_of_row)
+                block_of_row[relation][var_rows] = len(blocks)
+                var_of_row[relation][var_rows] = np.arange(1, len(var_rows) + 1)
+                blocks.append((clauses, var_count))
+        return blocks, block_of_row, var_of_row
+
+    # Print the performance metrics of the last query
+    def print_performance_metrics(self):
+        print_metrics(self.performance_metrics)
+
+# Version of the binary snapshot format (bump it whenever the layout changes)
+SNAPSHOT_VERSION = 2
+
+# Function to compute the SHA-256 content hash of a file
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, mode='rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Function to get the path of the binary snapshot of a CSV file
+def snapshot_path(file_path):
+    return file_path + ".snapshot"
+
+# Function to save a relation (columns, string dictionaries and key-group indexes) as a binary snapshot
+# Every array is stored as its own .npy file so it can be memory-mapped on load
+# The snapshot is staged in a directory of its own, so concurrent builders never write into each other's files
+def save_snapshot(relation, snapshot_dir, source):
+    snapshot_dir = os.path.abspath(snapshot_dir)
+    temporary_dir = tempfile.mkdtemp(dir=os.path.dirname(snapshot_dir), prefix=os.path.basename(snapshot_dir) + ".")
+    os.chmod(temporary_dir, 0o755)
+
+    columns = []
+    for i, column in enumerate(relation.columns):
+        if isinstance(column, IntColumn):
+            np.save(os.path.join(temporary_dir, f"column{i}.npy"), column.values)
+            columns.append("int")
+        else:
+            np.save(os.path.join(temporary_dir, f"column{i}.npy"), column.codes_)
+            np.save(os.path.join(temporary_dir, f"column{i}_dictionary.npy"), column.dictionary)
+            columns.append("dict")
+    np.save(os.path.join(temporary_dir, "tuple_of_row.npy"), relation.tuple_ids())
+
+    key_indexes = []
+    for key_number, (key_columns, index) in enumerate(relation.key_indexes.items()):
+        for name, array in index.items():
+            np.save(os.path.join(temporary_dir, f"key{key_number}_{name}.npy"), array)
+        key_indexes.append({"columns": list(key_columns), "arrays": sorted(index)})
+
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "header": relation.header,
+        "columns": columns,
+        "key_indexes": key_indexes,
+        "source": source,
+    }
+    with open(os.path.join(temporary_dir, "meta.json"), mode='w') as file:
+        json.dump(meta, file)
+
+    # Publish the snapshot with an atomic rename once it is complete; a previous snapshot (possibly just published by
+    # a concurrent builder) is first renamed aside, since a directory cannot be renamed over a non-empty one
+    while True:
+        try:
+            os.replace(temporary_dir, snapshot_dir)
+            return
+        except OSError as error:
+            if error.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                shutil.rmtree(temporary_dir, ignore_errors=True)
+                raise
+            old_dir = tempfile.mkdtemp(dir=os.path.dirname(snapshot_dir), prefix=os.path.basename(snapshot_dir) + ".old.")
+            try:
+                os.replace(snapshot_dir, old_dir)
+            except FileNotFoundError:
+                os.rmdir(old_dir)
+                continue
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+# Function to load a binary snapshot with every array memory-mapped (read-only pages shared across processes)
+def load_snapshot(snapshot_dir):
+    with open(os.path.join(snapshot_dir, "meta.json"), mode='r') as file:
+        meta = json.load(file)
+
+    def load_array(name):
+        return np.load(os.path.join(snapshot_dir, name + ".npy"), mmap_mode='r')
+
+    columns = []
+    for i, kind in enumerate(meta["columns"]):
+        if kind == "int":
+            columns.append(IntColumn(load_array(f"column{i}")))
+        else:
+            columns.append(DictColumn(load_array(f"column{i}"), load_array(f"column{i}_dictionary")))
+    relation = Relation(meta["header"], columns)
+    relation.tuple_of_row = load_array("tuple_of_row")
+    for key_number, key_index in enumerate(meta["key_indexes"]):
+        relation.key_indexes[tuple(key_index["columns"])] = {name: load_array(f"key{key_number}_{name}") for name in key_index["arrays"]}
+    relation.content_hash = meta["source"]["sha256"]
+    return relation
+
+# Function to check whether a snapshot was built from the current content of a CSV file
+# The file size and modification time are checked first; the content hash is only recomputed when they changed
+def snapshot_is_current(file_path, snapshot_dir):
+    meta_path = os.path.join(snapshot_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, mode='r') as file:
+        meta = json.load(file)
+    if meta.get("version") != SNAPSHOT_VERSION:
+        return False
+
+    stat = os.stat(file_path)
+    source = meta["source"]
+    if source["size"] == stat.st_size and source["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    if source["size"] != stat.st_size or source["sha256"] != file_sha256(file_path):
+        return False
+
+    # Same content with a new modification time (e.g. after a checkout): remember the new stat
+    source["mtime_ns"] = stat.st_mtime_ns
+    with open(meta_path, mode='w') as file:
+        json.dump(meta, file)
+    return True
+
+# Methods that can be run by CAvSAT.run_batch, mapped to the CAvSAT method that runs them
+BATCH_METHODS = {
+    "SAT-Solver": "solve",
+    "KW-SQL-Rewriting": "kw_sql_simulation",
+    "ConQuer-SQL-Rewriting": "conquer_sql_simulation",
+    "Regular SQL Query": "sql_simulation",
+}
+
+# State of a batch worker process: its own CAvSAT system (and component cache) and the queries of the batch
+batch_worker_state = {}
+
+# Function to initialize a batch worker process
+def init_batch_worker(data, constraints, queries, profile=False, sample_rate=1.0, settings=None):
+    batch_worker_state["system"] = CAvSAT(data, constraints, Profiler(enabled=profile, sample_rate=sample_rate))
+    batch_worker_state["system"].component_workers = 1
+    for name, value in (settings or {}).items():
+        setattr(batch_worker_state["system"], name, value)
+    batch_worker_state["queries"] = queries
+
+# Function to run one (query, method) job of a batch in a worker process
+# The metrics and profiler records are reset before the job so they only hold the costs of this job
+def run_batch_job(query_index, method):
+    cavsat_system = batch_worker_state["system"]
+    cavsat_system.performance_metrics = {}
+    cavsat_system.profiler.records = []
+    result = getattr(cavsat_system, BATCH_METHODS[method])(batch_worker_state["queries"][query_index])
+    return result, dict(cavsat_system.performance_metrics), cavsat_system.profiler.records
+
+# Function to load data from a CSV file into a columnar relation
+# With snapshot=True the relation (and the key-group index of key_columns) is loaded from a binary snapshot
+# next to the CSV file, which is rebuilt automatically whenever the content of the CSV file changes
+# A profiler, if given, records the load as a phase
+def load_data_from_csv(file_path, snapshot=False, key_columns=(0, 3), profiler=None):
+    if profiler is not None:
+        with profiler.phase("load", file=file_path, snapshot=snapshot) as phase:
+            relation = load_data_from_csv(file_path, snapshot, key_columns)
+            phase["rows"] = len(relation)
+        return relation
+
+    if snapshot:
+        snapshot_dir = snapshot_path(file_path)
+        if not snapshot_is_current(file_path, snapshot_dir):
+            stat = os.stat(file_path)
+            source = {"sha256": file_sha256(file_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            relation = load_data_from_csv(file_path)
+            if key_columns is not None:
+                KeyConstraint(key_columns).build(relation)
+            save_snapshot(relation, snapshot_dir, source)
+        return load_snapshot(snapshot_dir)
+
     data = []
     with open(file_path, mode='r') as file:
         reader = csv.reader(file)
         
-        # Skip header row
+        # Read the header row
         header = next(reader)
         for row in reader:
             record = tuple(row)
             data.append(record)
-    return data
+    return Relation.from_rows(data, header)
+
+# Function to stream a CSV file in fixed-size chunks of rows from a memory-mapped file
+# Yields the row id of the first row of each chunk together with the chunk as a columnar relation,
+# so only one chunk of rows is ever decoded at a time
+# The column types are those of the first chunk (or integer_columns, the indexes of the integer columns), so a
+# predicate sees the same types in every chunk; a later value that does not fit its column raises ValueError
+def iter_csv_chunks(file_path, chunk_size=CHUNK_SIZE, integer_columns=None):
+    with open(file_path, mode='rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+
+            # Read the header row
+            header_end = mapped.find(b"\n")
+            header_end = len(mapped) if header_end == -1 else header_end + 1
+            header = next(csv.reader([mapped[:header_end].decode().rstrip("\r\n")]))
+
+            first_row_id = 0
+            position = header_end
+            while position < len(mapped):
+
+                # Find the end of the next chunk_size lines
+                end = position
+                for _ in range(chunk_size):
+                    newline = mapped.find(b"\n", end)
+                    if newline == -1:
+                        end = len(mapped)
+                        break
+                    end = newline + 1
+                    if end >= len(mapped):
+                        break
+
+                rows = [tuple(row) for row in csv.reader(mapped[position:end].decode().splitlines()) if row]
+                if rows:
+                    chunk = Relation.from_rows(rows, header, integer_columns)
+                    if integer_columns is None:
+                        integer_columns = integer_column_indexes(chunk)
+                    yield first_row_id, chunk
+                first_row_id += len(rows)
+                position = end
+
+# Get the indexes of the integer columns of a relation
+def integer_column_indexes(relation):
+    return {index for index, column in enumerate(relation.columns) if isinstance(column, IntColumn)}
+
+# Get a hash of the key of every row of a relation that only depends on the values, not on the dictionary codes
+# of the relation (so the rows of a key get the same hash in every chunk of a stream)
+def key_hashes(relation, columns):
+    value_hashes = []
+    for column in columns:
+        column = relation.column(column)
+        if isinstance(column, DictColumn):
+            string_hashes = np.asarray([int.from_bytes(hashlib.blake2b(string.encode(), digest_size=8).digest(), "little")
+                                        for string in column.dictionary.tolist()], dtype=np.uint64)
+            value_hashes.append(string_hashes[column.codes()])
+        else:
+            value_hashes.append(column.values.astype(np.uint64))
+    return hash_codes(value_hashes)
+
+# Target size of a partition of a streamed CSV file, and the largest number of partitions (one open file each)
+PARTITION_BYTES = 64 * 1024 * 1024
+MAX_PARTITIONS = 256
+
+# Conflict detector for a key constraint over a stream of chunks, in bounded memory
+# The rows of each chunk are spilled to temporary partition files by the hash of their key, so all the rows of
+# a key group land in the same partition; each partition is then read back on its own and holds every conflict
+# of its keys. Memory is one chunk while consuming and one partition while reading (not O(distinct keys)); the
+# disk holds one copy of the rows
+class StreamingConflictDetector:
+
+    # Initialize the detector with the indices of the key columns (default: StudentID and CourseName), the number
+    # of partitions and the directory of the partition files (the temporary directory by default)
+    def __init__(self, columns=(0, 3), partitions=1, directory=None):
+        self.columns = tuple(columns)
+        self.directory = tempfile.mkdtemp(prefix="cavsat-partitions.", dir=directory)
+        self.files = [open(os.path.join(self.directory, f"{index}.csv"), mode="w", newline="") for index in range(partitions)]
+        self.writers = [csv.writer(file) for file in self.files]
+        self.header = None
+        self.integer_columns = None
+
+    # Consume one chunk: append its rows to the partitions of their keys
+    def consume(self, chunk):
+        if self.header is None:
+            self.header = chunk.header
+            self.integer_columns = integer_column_indexes(chunk)
+        partition_of_row = key_hashes(chunk, self.columns) % np.uint64(len(self.files))
+        order = np.argsort(partition_of_row, kind="stable")
+        boundaries = np.searchsorted(partition_of_row[order], np.arange(len(self.files) + 1))
+        for index, writer in enumerate(self.writers):
+            writer.writerows(chunk.rows(order[boundaries[index]:boundaries[index + 1]]))
+
+    # Read the partitions back, one at a time, as relations (with the column types of the first chunk)
+    def partitions(self):
+        for file in self.files:
+            file.close()
+        for file in self.files:
+            with open(file.name, mode="r", newline="") as partition:
+                rows = [tuple(row) for row in csv.reader(partition)]
+            if rows:
+                yield Relation.from_rows(rows, self.header, self.integer_columns)
+
+    # Remove the partition files
+    def close(self):
+        for file in self.files:
+            file.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+# Get the consistent answers of a query over one partition of a stream (see StreamingConflictDetector)
+# The matching rows of conflict-free key groups are answers as they are (exact duplicate rows once); only the
+# conflicting key groups that hold a matching row are sent to the solver
+def partition_consistent_answers(relation, query, key_columns):
+    key_constraint = KeyConstraint(key_columns).build(relation)
+    query_mask = relation.mask(query)
+    clean_rows = np.flatnonzero(query_mask & ~key_constraint.conflict_mask)
+    _, first_rows = np.unique(key_constraint.group_of_row[clean_rows], return_index=True)
+    yield from relation.rows(clean_rows[first_rows])
+
+    candidate_groups = np.unique(key_constraint.group_of_row[query_mask & key_constraint.conflict_mask])
+    if len(candidate_groups):
+        conflict_rows = np.flatnonzero(np.isin(key_constraint.group_of_row, candidate_groups))
+        cavsat_system = CAvSAT(relation.take(conflict_rows), [KeyConstraint(key_columns)])
+        yield from cavsat_system.solve(query) or ()
+
+# Function to stream the consistent answers of a query over a CSV file that may not fit in memory
+# A single pass over the chunks spills their rows to partitions by key (see StreamingConflictDetector), sized so
+# that a partition holds about PARTITION_BYTES of the file; each partition is then answered on its own
+def stream_consistent_answers(file_path, query, key_columns=(0, 3), chunk_size=CHUNK_SIZE, directory=None):
+    partitions = min(MAX_PARTITIONS, max(1, -(-os.path.getsize(file_path) // PARTITION_BYTES)))
+    detector = StreamingConflictDetector(key_columns, partitions, directory)
+    try:
+        for _, chunk in iter_csv_chunks(file_path, chunk_size):
+            detector.consume(chunk)
+        for relation in detector.partitions():
+            yield from partition_consistent_answers(relation, query, key_columns)
+    finally:
+        detector.close()
 
 # Function to validate data consistency and integrity of results based on constraints and query
-def data_integrity_validation(results, constraints, query):
+# header (the header of the dataset) resolves the column names of a declarative query
+def data_integrity_validation(results, constraints, query, header=None):
+    query = bind_query(query, header)
     for record in results:
         for constraint in constraints:
             if not constraint(record):
@@ -154,9 +3499,11 @@ def data_integrity_validation(results, constraints, query):
 
 # Function to calculate the accuracy of the results
 def accuracy(method_results, correct_results):
-    true_positives = len(set(method_results).intersection(set(correct_results)))
-    false_positives = len(set(method_results) - set(correct_results))
-    false_negatives = len(set(correct_results) - set(method_results))
+    method_results = set(method_results)
+    correct_results = set(correct_results)
+    true_positives = len(method_results & correct_results)
+    false_positives = len(method_results - correct_results)
+    false_negatives = len(correct_results - method_results)
 
     # Did not include true_negatives here since we want to check if method results
     # are the same as the correct results and only penalize if there are false positives
@@ -166,15 +3513,219 @@ def accuracy(method_results, correct_results):
 
 # Function to compare the results of two methods and display the differences
 def compare_method_results(method1results, method2results, method1Name, method2Name):
-    same_results = set(method1results).intersection(set(method2results))
+    method1results = set(method1results)
+    method2results = set(method2results)
+    same_results = method1results & method2results
     different_results = {
-        method1Name: set(method1results) - set(method2results),
-        method2Name: set(method2results) - set(method1results)
+        method1Name: method1results - method2results,
+        method2Name: method2results - method1results
     }
     return same_results, different_results
 
+# Name of the CSV file of the results of each method (query{i}_<name>.csv)
+RESULT_FILES = {
+    "SAT-Solver": "sat_results",
+    "KW-SQL-Rewriting": "kw_sql_rewriting_results",
+    "ConQuer-SQL-Rewriting": "conquer_sql_rewriting_results",
+    "Regular SQL Query": "regular_sql_retrieval_results",
+}
+
+# Single-pass evaluation of the results of several methods for one query
+# Every result is mapped once to the ids of the distinct tuples of the relation; the expected results of both
+# policies, the accuracy, the integrity and the differences between methods are then computed on boolean masks
+# over those ids, and writing the CSV files is an optional last step (export)
+class Evaluation:
+
+    # Initialize the evaluation of a query: select its candidate rows once and derive both sets of expected results
+    def __init__(self, data, constraints, query, key_constraint=None):
+        self.relation = as_relation(data)
+        self.constraints = build_constraints(constraints, self.relation)
+        self.query = query
+        if key_constraint is None:
+            key_constraint = next((constraint for constraint in self.constraints if isinstance(constraint, KeyConstraint)), KeyConstraint())
+        self.key_constraint = key_constraint.build(self.relation)
+
+        tuple_of_row = self.relation.tuple_ids()
+        self.tuple_count = int(tuple_of_row.max(initial=-1)) + 1
+        candidate_rows = select_rows(self.relation, query)
+        group_ids = self.key_constraint.group_of_row[candidate_rows]
+
+        # 1st policy: keep the first matching record of each key (see generate_expected_results)
+        # 2nd policy: keep the matching records whose key is not shared by any other record (see generate_expected_results_2)
+        _, first_rows = np.unique(group_ids, return_index=True)
+        self.expected_rows = {
+            1: np.sort(candidate_rows[first_rows]),
+            2: candidate_rows[self.key_constraint.group_sizes[group_ids] == 1],
+        }
+        self.expected = {policy: self.tuple_mask(tuple_of_row[rows]) for policy, rows in self.expected_rows.items()}
+
+        # A row of each distinct tuple (a live one if there is one), used to check and decode tuples
+        live = self.relation.live_mask()
+        self.tuple_rows = np.zeros(self.tuple_count, dtype=np.int64)
+        for rows in (np.flatnonzero(~live), np.flatnonzero(live)):
+            self.tuple_rows[tuple_of_row[rows]] = rows
+
+        self.results = {}
+        self.masks = {}
+        self.unknown = {}
+
+    # Get the mask over the tuple ids of the given tuples
+    def tuple_mask(self, tuple_ids):
+        mask = np.zeros(self.tuple_count, dtype=bool)
+        mask[tuple_ids] = True
+        return mask
+
+    # Add the results of a method (a collection of records); records that are not in the relation are kept apart
+    def add(self, method, results):
+        results = [] if results is None else results
+        tuple_ids = self.relation.find_tuple_ids(results)
+        self.results[method] = results
+        self.masks[method] = self.tuple_mask(tuple_ids[tuple_ids >= 0])
+        self.unknown[method] = {tuple(record) for record, tuple_id in zip(results, tuple_ids.tolist()) if tuple_id < 0}
+
+    # Get the accuracy of a method against the expected results of a policy
+    # (the Jaccard index of the two sets of records, 1 if both are empty)
+    def accuracy(self, method, policy=1):
+        mask = self.masks[method]
+        expected = self.expected[policy]
+        true_positives = int(np.count_nonzero(mask & expected))
+        false_positives = int(np.count_nonzero(mask & ~expected)) + len(self.unknown[method])
+        false_negatives = int(np.count_nonzero(expected & ~mask))
+        total = true_positives + false_positives + false_negatives
+        return true_positives / total if total else 1.0
+
+    # Check that every result of a method satisfies the query and every constraint (see data_integrity_validation)
+    def integrity(self, method):
+        rows = self.tuple_rows[np.flatnonzero(self.masks[method])]
+        valid = self.relation.mask(self.query, rows)
+        for constraint in self.constraints:
+            if isinstance(constraint, DECLARATIVE_CONSTRAINTS):
+                valid &= ~constraint.conflict_mask[rows]
+                if isinstance(constraint, DenialConstraint):
+                    valid &= ~constraint.violation_mask[rows]
+            else:
+                valid &= self.relation.mask(constraint, rows)
+        return bool(valid.all()) and data_integrity_validation(self.unknown[method], self.constraints, self.query, self.relation.header)
+
+    # Get the records of the tuples of a mask
+    def records(self, mask):
+        return set(self.relation.rows(self.tuple_rows[np.flatnonzero(mask)]))
+
+    # Compare the results of two methods (see compare_method_results)
+    def compare(self, method1, method2):
+        mask1 = self.masks[method1]
+        mask2 = self.masks[method2]
+        same_results = self.records(mask1 & mask2)
+        different_results = {
+            method1: self.records(mask1 & ~mask2) | (self.unknown[method1] - self.unknown[method2]),
+            method2: self.records(mask2 & ~mask1) | (self.unknown[method2] - self.unknown[method1]),
+        }
+        return same_results, different_results
+
+    # Get the accuracy against both policies and the integrity of every method, and for every pair of methods
+    # the number of records that only one of them returned
+    def report(self):
+        report = {
+            method: {"accuracy": self.accuracy(method, 1), "accuracy_2": self.accuracy(method, 2), "integrity": self.integrity(method)}
+            for method in self.masks
+        }
+        methods = list(self.masks)
+        report["differences"] = {
+            (method1, method2): (int(np.count_nonzero(self.masks[method1] & ~self.masks[method2])) + len(self.unknown[method1] - self.unknown[method2]),
+                                 int(np.count_nonzero(self.masks[method2] & ~self.masks[method1])) + len(self.unknown[method2] - self.unknown[method1]))
+            for i, method1 in enumerate(methods) for method2 in methods[i + 1:]
+        }
+        return report
+
+    # Write the expected results, the results of every method, and the integrity and accuracy of every method
+    # to the CSV files of a query (query{i}_*.csv, prefix is "query{i}")
+    def export(self, prefix, report=None):
+        report = self.report() if report is None else report
+        header = self.relation.header
+        for policy, suffix in ((1, ""), (2, "_2")):
+            output_file = f"{prefix}_expected_results{suffix}.csv"
+            with open(output_file, mode='w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(header)
+                writer.writerows(self.relation.rows(self.expected_rows[policy]))
+            print(f"Expected results written to {output_file}")
+
+        for method, results in self.results.items():
+            if results and method in RESULT_FILES:
+                with open(f"{prefix}_{RESULT_FILES[method]}.csv", mode='w', newline="") as file:
+                    writer = csv.writer(file)
+                    writer.writerow(header)
+                    writer.writerows(results)
+
+        with open(f"{prefix}_data_integrity_validation_results.csv", mode='w', newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Method", "Consistency and Integrity of Data Results Maintained?"])
+            for method in self.results:
+                writer.writerow([method, report[method]["integrity"]])
+
+        for suffix, key in (("", "accuracy"), ("_2", "accuracy_2")):
+            with open(f"{prefix}_accuracy_results{suffix}.csv", mode='w', newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(["Method", "Accuracy"])
+                for method in self.results:
+                    writer.writerow([method, report[method][key]])
+
+# Function to plot the performance metrics of the queries: the SAT solving time of each query against the one-off
+# encoding time, and the time of every method
+# matplotlib is only imported here, so solving queries never pays for it; with an output prefix the figures are
+# saved as PNG files (without a display) instead of being shown
+def plot_performance_metrics(query_labels, encoding_time, solving_times, kw_sql_rewriting_times, conquer_sql_rewriting_times, sql_times, output_prefix=None):
+    import matplotlib
+    if output_prefix is not None:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    # Plot the SAT solving time of each query against the one-off encoding time
+    x = np.arange(len(query_labels))
+    bar_width = 0.35
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.bar(x, solving_times, bar_width, label='SAT Solving Time')
+    ax.axhline(encoding_time, color='gray', linestyle='--', label='Encoding Time (once per dataset)')
+
+    ax.set_xlabel('Queries')
+    ax.set_ylabel('Time (seconds)')
+    ax.set_title('Performance Metrics by Query')
+    ax.set_xticks(x)
+    ax.set_xticklabels(query_labels)
+    ax.legend()
+
+    plt.tight_layout()
+    show_figure(plt, fig, output_prefix, "solving_times")
+
+    # Plot performance metrics for SAT Solving vs KW-SQL-Rewriting vs ConQuer-SQL-Rewriting vs Regular SQL Retrieval
+    fig, ax = plt.subplots(figsize=(10, 6))
+    x = np.arange(len(query_labels))
+    ax.plot(x, solving_times, label='SAT Solving Time', marker='o', linestyle='-', color='b')
+    ax.plot(x, kw_sql_rewriting_times, label='KW-SQL Simulation Time', marker='s', linestyle='--', color='r')
+    ax.plot(x, conquer_sql_rewriting_times, label='ConQuer-SQL Simulation Time', marker='x', linestyle='-.', color='g')
+    ax.plot(x, sql_times, label='SQL Simulation Time', marker='d', linestyle=':', color='m')
+    ax.set_xlabel('Queries')
+    ax.set_ylabel('Time (seconds)')
+    ax.set_title('Performance Metrics by Query')
+    ax.set_xticks(x)
+    ax.set_xticklabels(query_labels)
+    ax.set_yscale('log')
+    ax.legend()
+
+    plt.tight_layout()
+    show_figure(plt, fig, output_prefix, "method_times")
+
+# Function to show a figure, or save it as {output_prefix}_{name}.png and close it
+def show_figure(plt, fig, output_prefix, name):
+    if output_prefix is None:
+        plt.show()
+    else:
+        fig.savefig(f"{output_prefix}_{name}.png")
+        plt.close(fig)
+
 # Function to generate expected results for each query (Method 1)
-def generate_expected_results(data, query, output_file, primary_key_index=(0, 3)):
+def generate_expected_results(data, query, output_file, primary_key_index=(0, 3), key_constraint=None):
         
     # Generate and save expected results for a given query, resolving primary key conflicts.
     # Keep the first instance of a key that has a conflict.
@@ -190,6 +3741,11 @@ def generate_expected_results(data, query, output_file, primary_key_index=(0, 3)
     # 1461,Kimberly Reyes,1480,CS138,Prof. Jones
     # 3556,Isla Wilson,    2967,Physics156,Prof. Jones
 
+    if key_constraint is None:
+        key_constraint = KeyConstraint(primary_key_index)
+    relation = as_relation(data)
+    query = bind_query(query, relation.header)
+
     # Initialize set to track primary keys
     seen_primary_keys = set()
         
@@ -197,7 +3753,7 @@ def generate_expected_results(data, query, output_file, primary_key_index=(0, 3)
     filtered_results = []
 
     for record in data:
-        primary_key = tuple(record[i] for i in primary_key_index)
+        primary_key = key_constraint.key(record)
             
         # If the record satisfies the query and the primary key has not been seen before,
         # add it to the filtered results and mark the primary key as seen
@@ -208,40 +3764,33 @@ def generate_expected_results(data, query, output_file, primary_key_index=(0, 3)
     # Write the filtered results to a CSV file
     with open(output_file, mode='w', newline='') as file:
         writer = csv.writer(file)
-        writer.writerow(["StudentID", "StudentName", "CourseID", "CourseName", "Instructor"])  # Header
+        writer.writerow(relation.header)  # Header
         writer.writerows(filtered_results)
 
     print(f"Expected results written to {output_file}")
 
 # Function to generate expected results for each query (Method 2)
 # Unlike the previous function (Method 1), this function filters out all of the records that violate primary key constraints
-def generate_expected_results_2(data, query, output_file, primary_key_index=(0, 3)):
-    
-    # Initialize set to track primary keys
-    seen_primary_keys = set()
+def generate_expected_results_2(data, query, output_file, primary_key_index=(0, 3), key_constraint=None):
     
+    # Reuse the key-group index of the primary key constraint (built once per dataset)
+    if key_constraint is None:
+        key_constraint = KeyConstraint(primary_key_index)
+    key_constraint.build(data)
+
     # Initialize list to store filtered results
     filtered_results = []
 
-    # Identify and track records that violate primary key constraints
-    primary_key_violations = set()
-    for record in data:
-        primary_key = tuple(record[i] for i in primary_key_index)
-        if primary_key in seen_primary_keys:
-            primary_key_violations.add(primary_key)
-        else:
-            seen_primary_keys.add(primary_key)
-        
-    # Filter out records that violate primary key constraints
-    for record in data:
-        primary_key = tuple(record[i] for i in primary_key_index)
-        if query(record) and primary_key not in primary_key_violations:
-            filtered_results.append(record)
+    # Filter out records whose primary key is shared by any other record
+    unique_key_mask = (key_constraint.group_sizes == 1)[key_constraint.group_of_row]
+    relation = key_constraint.relation
+    for row_id in np.flatnonzero(relation.mask(query) & unique_key_mask & relation.live_mask()).tolist():
+        filtered_results.append(relation[row_id])
         
     # Write the filtered results to a CSV file
     with open(output_file, mode='w', newline='') as file:
         writer = csv.writer(file)
-        writer.writerow(["StudentID", "StudentName", "CourseID", "CourseName", "Instructor"])
+        writer.writerow(relation.header)
         writer.writerows(filtered_results)
     
     print(f"Expected results written to {output_file}")
@@ -249,140 +3798,59 @@ def generate_expected_results_2(data, query, output_file, primary_key_index=(0,
 # Main function
 if __name__ == "__main__":
     # Load dataset from a CSV file
+    # The profiler records every phase (load, index build, encode, solve, extract, ...) of the run
+    profiler = Profiler()
     file_path = "dataset.csv"
-    data = load_data_from_csv(file_path)
+    data = load_data_from_csv(file_path, snapshot=True, profiler=profiler)
 
     # Define constraints: No two records should have the same StudentID and CourseName
     # In the real world, a student cannot take the same course twice during the same semester
-    constraints = [
-        lambda record: not any(
-            r != record and r[0] == record[0] and r[3] == record[3] for r in data
-        )
-    ]
+    primary_key = KeyConstraint(columns=(0, 3)).build(data)
+    constraints = [primary_key]
 
-    # Example queries
+    # Example queries, written as declarative predicates so they can be evaluated over whole columns,
+    # answered with index probes and compiled to SQL (any lambda over a record also works as a query)
     # Find all records consisting of students enrolled in Math courses
     # Represents following SQL statement: SELECT * FROM data WHERE CourseName LIKE 'Math%'
-    query1 = lambda record: "Math" in record[3]
+    query1 = Prefix(3, "Math")
 
     # Find all records consisting of students enrolled in CS courses taught by Prof. Brown
     # Represents following SQL statement: SELECT * FROM data WHERE CourseName LIKE 'CS%' AND Instructor = 'Prof. Brown'
-    query2 = lambda record: "CS" in record[3] and "Prof. Brown" in record[4]
+    query2 = And(Prefix(3, "CS"), Eq(4, "Prof. Brown"))
 
     # Find all records whose CourseID is even (creative use of numeric fields)
     # Represents following SQL statement: SELECT * FROM data WHERE CourseID % 2 = 0
-    query3 = lambda record: int(record[2]) % 2 == 0
+    query3 = Mod(2, 2, 0)
 
     # Find all records consisting of students whose names start with the letter 'K' (e.g., Kimberly Reyes)
     # Represents following SQL statement: SELECT * FROM data WHERE StudentName LIKE 'K%'
-    query4 = lambda record: record[1].startswith("K")
+    query4 = Prefix(1, "K")
 
     # Find all records consisting of courses taught by one of the following professor names
     # Represents following SQL statement: SELECT * FROM data WHERE Instructor = "Prof. Jones" OR Instructor = "Prof. Wilson"
-    query5 = lambda record: record[4] in ["Prof. Jones", "Prof. Wilson"]
+    query5 = In(4, ["Prof. Jones", "Prof. Wilson"])
 
     # Find all records consisting of CourseIDs that are greater than 2000
     # Represents following SQL statement: SELECT * FROM data WHERE CourseID > 2000
-    query6 = lambda record: int(record[2]) > 2000
+    query6 = Range(2, low=2000, include_low=False)
 
     # Find all records consisting of students whose names contain "Taylor" (supports flexible searches, can be first or last name)
     # Represents following SQL statement: SELECT * FROM data WHERE StudentName LIKE %Taylor%
-    query7 = lambda record: "Taylor" in record[1]
-
-    # Function to generate expected results for each query (Method 1)
-    # def generate_expected_results(data, query, output_file, primary_key_index=(0, 3)):
-        
-    #     # Generate and save expected results for a given query, resolving primary key conflicts.
-    #     # Keep the first instance of a key that has a conflict.
-
-    #     # i.e. 
-    #     # StudentID,StudentName,CourseID,CourseName,Instructor <==== Header, not a record
-    #     # 1461,Kimberly Reyes,1480,CS138,Prof. Jones <==== SHOULD BE KEPT!!!
-    #     # 1461,Kimberly R.,   1480,CS138,Prof. Jones <==== SHOULD BE IGNORED because of previous record!!!
-    #     # 3556,Isla Wilson,   2967,Physics156,Prof. Jones
-
-    #     # output: (Doesn't have the primary key violation)
-    #     # StudentID,StudentName,CourseID,CourseName,Instructor <==== Header, not a record
-    #     # 1461,Kimberly Reyes,1480,CS138,Prof. Jones
-    #     # 3556,Isla Wilson,    2967,Physics156,Prof. Jones
-
-    #     # Initialize set to track primary keys
-    #     seen_primary_keys = set()
-        
-    #     # Initialize list to store filtered results
-    #     filtered_results = []
-
-    #     for record in data:
-    #         primary_key = tuple(record[i] for i in primary_key_index)
-            
-    #         # If the record satisfies the query and the primary key has not been seen before,
-    #         # add it to the filtered results and mark the primary key as seen
-    #         if query(record) and primary_key not in seen_primary_keys:
-    #             filtered_results.append(record)
-    #             seen_primary_keys.add(primary_key) 
-
-    #     # Write the filtered results to a CSV file
-    #     with open(output_file, mode='w', newline='') as file:
-    #         writer = csv.writer(file)
-    #         writer.writerow(["StudentID", "StudentName", "CourseID", "CourseName", "Instructor"])  # Header
-    #         writer.writerows(filtered_results)
-
-    #     print(f"Expected results written to {output_file}")
-
-    # # Function to generate expected results for each query (Method 2)
-    # # Unlike the previous function (Method 1), this function filters out all of the records that violate primary key constraints
-    # def generate_expected_results_2(data, query, output_file, primary_key_index=(0, 3)):
-    #     seen_primary_keys = set()
-    #     filtered_results = []
-
-    #     # Identify and track records that violate primary key constraints
-    #     primary_key_violations = set()
-    #     for record in data:
-    #         primary_key = tuple(record[i] for i in primary_key_index)
-    #         if primary_key in seen_primary_keys:
-    #             primary_key_violations.add(primary_key)
-    #         else:
-    #             seen_primary_keys.add(primary_key)
-        
-    #     # Filter out records that violate primary key constraints
-    #     for record in data:
-    #         primary_key = tuple(record[i] for i in primary_key_index)
-    #         if query(record) and primary_key not in primary_key_violations:
-    #             filtered_results.append(record)
-        
-    #     # Write the filtered results to a CSV file
-    #     with open(output_file, mode='w', newline='') as file:
-    #         writer = csv.writer(file)
-    #         writer.writerow(["StudentID", "StudentName", "CourseID", "CourseName", "Instructor"])
-    #         writer.writerows(filtered_results)
-
-    #     print(f"Expected results written to {output_file}")
-
-    # Apply for all queries
-    generate_expected_results(data, query1, "query1_expected_results.csv")
-    generate_expected_results(data, query2, "query2_expected_results.csv")
-    generate_expected_results(data, query3, "query3_expected_results.csv")
-    generate_expected_results(data, query4, "query4_expected_results.csv")
-    generate_expected_results(data, query5, "query5_expected_results.csv")
-    generate_expected_results(data, query6, "query6_expected_results.csv")
-    generate_expected_results(data, query7, "query7_expected_results.csv")
-
-    generate_expected_results_2(data, query1, "query1_expected_results_2.csv")
-    generate_expected_results_2(data, query2, "query2_expected_results_2.csv")
-    generate_expected_results_2(data, query3, "query3_expected_results_2.csv")
-    generate_expected_results_2(data, query4, "query4_expected_results_2.csv")
-    generate_expected_results_2(data, query5, "query5_expected_results_2.csv")
-    generate_expected_results_2(data, query6, "query6_expected_results_2.csv")
-    generate_expected_results_2(data, query7, "query7_expected_results_2.csv")
+    query7 = Contains(1, "Taylor")
 
     # Store all queries in a list
     queries = [query1, query2, query3, query4, query5, query6, query7]
 
-    # Initialize the CAvSAT system
-    cavsat_system = CAvSAT(data, constraints)
+    # Write the expected results and the results, integrity and accuracy of every method of each query to CSV files
+    export_results = True
+
+    # Initialize the CAvSAT system and run every (query, method) job over a pool of worker processes
+    # (in each worker, a key group is encoded the first time a query touches it, and never again)
+    # (answers and the encodings and results of the components are kept in a result cache that survives restarts)
+    cavsat_system = CAvSAT(data, constraints, profiler, cache=ResultCache(".cavsat_cache"))
+    batch_results, batch_metrics = cavsat_system.run_batch(queries)
 
     # Initialize arrays for performance metrics
-    encoding_times = []
     solving_times = []
     kw_sql_rewriting_times = []
     conquer_sql_rewriting_times = []
@@ -393,156 +3861,63 @@ if __name__ == "__main__":
     for i, query in enumerate(queries, start=1):
         print(f"\nProcessing Query {i}...")
 
-        # Solve the SAT problem
-        sat_results = cavsat_system.solve(query)
-        if sat_results:
-            
-            # Save SAT results to a CSV file
-            with open(f"query{i}_sat_results.csv", mode='w', newline="") as file:
-                writer = csv.writer(file)
-                writer.writerow(["StudentID", "StudentName", "CourseID", "CourseName", "Instructor"])
-                writer.writerows(sat_results)
-        else:
+        # Evaluate the results of every method in one pass: both sets of expected results (1st policy: for multiple
+        # records with the same primary key, keep the first instance and disregard the rest of the records; 2nd policy:
+        # for any multiple records with the same primary key, disregard all of those records), accuracy and integrity
+        evaluation = Evaluation(data, constraints, query, key_constraint=primary_key)
+        for method in BATCH_METHODS:
+            evaluation.add(method, batch_results[(i - 1, method)])
+        report = evaluation.report()
+        if not batch_results[(i - 1, "SAT-Solver")]:
             print("No satisfying solution found.")
 
-        # Simulate KW-SQL query
-        kw_sql_results = cavsat_system.kw_sql_simulation(query)
-        if kw_sql_results:
-
-            # Save KW-SQL results to a CSV file
-            with open(f"query{i}_kw_sql_rewriting_results.csv", mode='w', newline="") as file:
-                writer = csv.writer(file)
-                writer.writerow(["StudentID", "StudentName", "CourseID", "CourseName", "Instructor"])
-                writer.writerows(kw_sql_results)
-
-        # Simulate ConQuer-SQL query
-        conquer_sql_results = cavsat_system.conquer_sql_simulation(query)
-        if conquer_sql_results:
-            # Save ConQuer-SQL results to a CSV file
-            with open(f"query{i}_conquer_sql_rewriting_results.csv", mode='w', newline="") as file:
-                writer = csv.writer(file)
-                writer.writerow(["StudentID", "StudentName", "CourseID", "CourseName", "Instructor"])
-                writer.writerows(conquer_sql_results)
-
-        # Simulate SQL-like query
-        sql_results = cavsat_system.sql_simulation(query)
-        if sql_results:
-            # Save SQL results to a CSV file
-            with open(f"query{i}_regular_sql_retrieval_results.csv", mode='w', newline="") as file:
-                writer = csv.writer(file)
-                writer.writerow(["StudentID", "StudentName", "CourseID", "CourseName", "Instructor"])
-                writer.writerows(sql_results)
-
         # Validate results
         print("\nData Integrity Validation (are the consistency and integrity of the results maintained?):")
-        print("SAT-Solver Query Results:", data_integrity_validation(sat_results, constraints, query))
-        print("KW-SQL-Rewriting Results:", data_integrity_validation(kw_sql_results, constraints, query))
-        print("ConQuer-SQL-Rewriting Results:", data_integrity_validation(conquer_sql_results, constraints, query))
-        print("Regular SQL Query Results:", data_integrity_validation(sql_results, constraints, query))
-
-        # Write the data integrity validation results to a CSV file
-        with open(f"query{i}_data_integrity_validation_results.csv", mode='w', newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(["Method", "Consistency and Integrity of Data Results Maintained?"])
-            writer.writerow(["SAT-Solver", data_integrity_validation(sat_results, constraints, query)])
-            writer.writerow(["KW-SQL-Rewriting", data_integrity_validation(kw_sql_results, constraints, query)])
-            writer.writerow(["ConQuer-SQL-Rewriting", data_integrity_validation(conquer_sql_results, constraints, query)])
-            writer.writerow(["Regular SQL Query", data_integrity_validation(sql_results, constraints, query)])
-            
-        # Load the expected results from the CSV file
-        output_file = f"query{i}_expected_results.csv"
-        output_file_2 = f"query{i}_expected_results_2.csv"
-        expected_results = load_data_from_csv(output_file)
-        expected_results_2 = load_data_from_csv(output_file_2)
-
-        # Calculate accuracy against each set of expected results
-        # 1st set of expected results: For multiple records with the same primary key, keep the first instance and disregard the rest of the records
-        sat_accuracy = accuracy(sat_results, expected_results)
-        kw_sql_accuracy = accuracy(kw_sql_results, expected_results)
-        conquer_sql_accuracy = accuracy(conquer_sql_results, expected_results)
-        sql_accuracy = accuracy(sql_results, expected_results)
-
-        # 2nd set of expected results: For any multiple records with the same primary key, disregard all of those records
-        sat_accuracy_2 = accuracy(sat_results, expected_results_2)
-        kw_sql_accuracy_2 = accuracy(kw_sql_results, expected_results_2)
-        conquer_sql_accuracy_2 = accuracy(conquer_sql_results, expected_results_2)
-        sql_accuracy_2 = accuracy(sql_results, expected_results_2)
+        print("SAT-Solver Query Results:", report["SAT-Solver"]["integrity"])
+        print("KW-SQL-Rewriting Results:", report["KW-SQL-Rewriting"]["integrity"])
+        print("ConQuer-SQL-Rewriting Results:", report["ConQuer-SQL-Rewriting"]["integrity"])
+        print("Regular SQL Query Results:", report["Regular SQL Query"]["integrity"])
 
         # Compare the accuracies of each of the methods
         print("\nAccuracy Comparison Method 1:")
-        print(f"SAT Accuracy: {sat_accuracy:.4f}")
-        print(f"KW-SQL Accuracy: {kw_sql_accuracy:.4f}")
-        print(f"ConQuer-SQL Accuracy: {conquer_sql_accuracy:.4f}")
-        print(f"SQL Accuracy: {sql_accuracy:.4f}")
+        print(f"SAT Accuracy: {report['SAT-Solver']['accuracy']:.4f}")
+        print(f"KW-SQL Accuracy: {report['KW-SQL-Rewriting']['accuracy']:.4f}")
+        print(f"ConQuer-SQL Accuracy: {report['ConQuer-SQL-Rewriting']['accuracy']:.4f}")
+        print(f"SQL Accuracy: {report['Regular SQL Query']['accuracy']:.4f}")
 
         print("\nAccuracy Comparison Method 2:")
-        print(f"SAT Accuracy: {sat_accuracy_2:.4f}")
-        print(f"KW-SQL Accuracy: {kw_sql_accuracy_2:.4f}")
-        print(f"ConQuer-SQL Accuracy: {conquer_sql_accuracy_2:.4f}")
-        print(f"SQL Accuracy: {sql_accuracy_2:.4f}")
-
-        # Save the accuracy results to a CSV file
-        # Accuracy results against the first set of expected results
-        with open(f"query{i}_accuracy_results.csv", mode='w', newline="") as file:
-            writer = csv.writer(file)
-            # writer.writerow(["Accuracy Results against 1st set of Expected Results (where for multiple records with the same primary key, keep the first instance and disregard the rest of the records)"])
-            writer.writerow(["Method", "Accuracy"])
-            writer.writerow(["SAT-Solver", sat_accuracy])
-            writer.writerow(["KW-SQL-Rewriting", kw_sql_accuracy])
-            writer.writerow(["ConQuer-SQL-Rewriting", conquer_sql_accuracy])
-            writer.writerow(["Regular SQL Query", sql_accuracy])
-        
-        # Accuracy results against the second set of expected results
-        with open(f"query{i}_accuracy_results_2.csv", mode='w', newline="") as file:
-            writer = csv.writer(file)
-            # writer.writerow(["Accuracy Results against 2nd set of Expected Results (where for any multiple records with the same primary key, disregard all of those records)"])
-            writer.writerow(["Method", "Accuracy"])
-            writer.writerow(["SAT-Solver", sat_accuracy_2])
-            writer.writerow(["KW-SQL-Rewriting", kw_sql_accuracy_2])
-            writer.writerow(["ConQuer-SQL-Rewriting", conquer_sql_accuracy_2])
-            writer.writerow(["Regular SQL Query", sql_accuracy_2])
-
-        # Collect performance metrics
-        metrics = cavsat_system.get_metrics()
-        encoding_times.append(metrics.get("Encoding Time", 0))
+        print(f"SAT Accuracy: {report['SAT-Solver']['accuracy_2']:.4f}")
+        print(f"KW-SQL Accuracy: {report['KW-SQL-Rewriting']['accuracy_2']:.4f}")
+        print(f"ConQuer-SQL Accuracy: {report['ConQuer-SQL-Rewriting']['accuracy_2']:.4f}")
+        print(f"SQL Accuracy: {report['Regular SQL Query']['accuracy_2']:.4f}")
+
+        # Save the expected results, the results of every method, and their integrity and accuracy to CSV files
+        if export_results:
+            evaluation.export(f"query{i}", report)
+
+        # Collect performance metrics of every method of the query
+        metrics = {}
+        for method in BATCH_METHODS:
+            metrics.update(batch_metrics[(i - 1, method)])
         solving_times.append(metrics.get("SAT Solving Time", 0))
         kw_sql_rewriting_times.append(metrics.get("KW-SQL Simulation Time", 0))
         conquer_sql_rewriting_times.append(metrics.get("ConQuer-SQL Simulation Time", 0))
         sql_times.append(metrics.get("SQL Simulation Time", 0))
         query_labels.append(f"Q{i}")
 
-    # Plot performance metrics of encoding time and SAT solving time for each query
-    x = np.arange(len(query_labels))
-    bar_width = 0.35
+    # Export the per-phase profile as JSON lines and as a Chrome trace file
+    profiler.export_jsonl("performance_profile.jsonl")
+    profiler.export_chrome_trace("performance_trace.json")
 
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.bar(x, encoding_times, bar_width, label='Encoding Time')
-    ax.bar(x, solving_times, bar_width, bottom=encoding_times, label='SAT Solving Time')
+    # Total encoding time of the dataset over all queries (each worker encodes the key groups it needs once)
+    encoding_time = sum(batch_metrics[(i, "SAT-Solver")].get("Encoding Time", 0) for i in range(len(queries)))
+    print(f"\nEncoding Time (once per dataset): {encoding_time:.4f} seconds")
 
-    ax.set_xlabel('Queries')
-    ax.set_ylabel('Time (seconds)')
-    ax.set_title('Performance Metrics by Query')
-    ax.set_xticks(x)
-    ax.set_xticklabels(query_labels)
-    ax.legend()
+    # Range-consistent aggregates: how many students are enrolled in Math courses, per instructor, over all repairs
+    # Represents following SQL statement: SELECT Instructor, COUNT(*) FROM data WHERE CourseName LIKE 'Math%' GROUP BY Instructor
+    print("\nMath Enrollments per Instructor (range over all repairs):")
+    for (instructor,), (lowest, highest) in sorted(cavsat_system.aggregate(query1, "COUNT", group_by=[4]).items()):
+        print(f"{instructor}: [{lowest}, {highest}]")
 
-    plt.tight_layout()
-    plt.show()
-
-    # Plot performance metrics for SAT Solving vs KW-SQL-Rewriting vs ConQuer-SQL-Rewriting vs Regular SQL Retrieval
-    fig, ax = plt.subplots(figsize=(10, 6))
-    x = np.arange(len(query_labels))
-    ax.plot(x, solving_times, label='SAT Solving Time', marker='o', linestyle='-', color='b')
-    ax.plot(x, kw_sql_rewriting_times, label='KW-SQL Simulation Time', marker='s', linestyle='--', color='r')
-    ax.plot(x, conquer_sql_rewriting_times, label='ConQuer-SQL Simulation Time', marker='x', linestyle='-.', color='g')
-    ax.plot(x, sql_times, label='SQL Simulation Time', marker='d', linestyle=':', color='m')
-    ax.set_xlabel('Queries')
-    ax.set_ylabel('Time (seconds)')
-    ax.set_title('Performance Metrics by Query')
-    ax.set_xticks(x)
-    ax.set_xticklabels(query_labels)
-    ax.set_yscale('log')
-    ax.legend()
-
-    plt.tight_layout()
-    plt.show()
+    # Plot the SAT solving time of each query and the time of every method
+    plot_performance_metrics(query_labels, encoding_time, solving_times, kw_sql_rewriting_times, conquer_sql_rewriting_times, sql_times)
@@ -0,0 +1,87 @@
+import itertools
+import operator
+
+from cavsat_solver import DenialConstraint, FunctionalDependency, KeyConstraint
+
+# Comparison operators of the conditions of denial constraints
+OPERATORS = {"=": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+# Get a record with the values of its integer columns as integers (so they compare like the solver compares them)
+def typed(record):
+    return tuple(int(value) if value.isdigit() else value for value in record)
+
+# Check whether two distinct records violate a constraint together
+def in_conflict(left, right, constraint):
+    if isinstance(constraint, KeyConstraint):
+        return all(left[i] == right[i] for i in constraint.columns)
+    if isinstance(constraint, FunctionalDependency):
+        return all(left[i] == right[i] for i in constraint.lhs) and any(left[i] != right[i] for i in constraint.rhs)
+    return violates(left, right, constraint) or violates(right, left, constraint)
+
+# Check whether a pair of records (in that order) satisfies every condition of a denial constraint
+def violates(left, right, constraint):
+    left, right = typed(left), typed(right)
+    return all(OPERATORS[op](left[i], right[j]) for i, op, j in constraint.conditions)
+
+# Enumerate every repair of a list of records: the maximal subsets of the distinct records without a conflict,
+# among the records that satisfy every plain callable constraint and violate no denial constraint by themselves
+def repairs(records, constraints):
+    declarative = [constraint for constraint in constraints if isinstance(constraint, (KeyConstraint, FunctionalDependency, DenialConstraint))]
+    callables = [constraint for constraint in constraints if constraint not in declarative]
+    facts = sorted({tuple(record) for record in records if all(constraint(tuple(record)) for constraint in callables)})
+    facts = [fact for fact in facts if not any(isinstance(constraint, DenialConstraint) and violates(fact, fact, constraint) for constraint in declarative)]
+
+    conflicts = {(i, j) for i, j in itertools.combinations(range(len(facts)), 2)
+                 if any(in_conflict(facts[i], facts[j], constraint) for constraint in declarative)}
+    result = []
+    for chosen in itertools.product((False, True), repeat=len(facts)):
+        if any(chosen[i] and chosen[j] for i, j in conflicts):
+            continue
+        if all(chosen[i] or any(chosen[j] for j in range(len(facts)) if (min(i, j), max(i, j)) in conflicts) for i in range(len(facts))):
+            result.append({fact for fact, keep in zip(facts, chosen) if keep})
+    return result
+
+# Get the records of the query that are in every repair
+def certain_answers(records, constraints, query):
+    answers = None
+    for repair in repairs(records, constraints):
+        matches = {record for record in repair if query(record)}
+        answers = matches if answers is None else answers & matches
+    return answers
+
+# Get the bounds of an aggregate of the records of the query over every repair (None without a repair)
+# MIN and MAX are bounded over the repairs that have a record of the query ((None, None) if no repair has one)
+def aggregate_bounds(records, constraints, query, function, column=None):
+    values = []
+    for repair in repairs(records, constraints):
+        matches = [typed(record) for record in repair if query(record)]
+        if function == "COUNT":
+            values.append(len(matches))
+        elif function == "SUM":
+            values.append(sum(record[column] for record in matches))
+        elif matches:
+            values.append((min if function == "MIN" else max)(record[column] for record in matches))
+    if not values:
+        return (None, None) if function in ("MIN", "MAX") else None
+    return min(values), max(values)
+
+# Get the answers of a conjunctive query (with column indices) that hold in every combination of the repairs
+# of its relations; relations maps each relation name to its records and constraints
+def certain_join_answers(relations, query):
+    names = list(relations)
+    answers = None
+    for repairs_of_relations in itertools.product(*[repairs(*relations[name]) for name in names]):
+        instance = dict(zip(names, repairs_of_relations))
+        matches = join_answers(instance, query)
+        answers = matches if answers is None else answers & matches
+    return answers
+
+# Get the answers of a conjunctive query on one instance (a dictionary from relation names to sets of records)
+def join_answers(instance, query):
+    candidates = [[record for record in instance[atom.relation] if atom.predicate is None or atom.predicate(record)] for atom in query.atoms]
+    answers = set()
+    for records in itertools.product(*candidates):
+        binding = {atom.alias: record for atom, record in zip(query.atoms, records)}
+        if all(binding[left[0]][left[1]] == binding[right[0]][right[1]] for left, right in query.joins):
+            answers.add(tuple(binding[alias][column] for alias, column in query.select))
+    return answers
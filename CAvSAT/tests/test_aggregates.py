@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from brute_force import aggregate_bounds, certain_answers
+from cavsat_solver import CAvSAT, Eq, KeyConstraint, Relation
+from test_repairs import HEADER, QUERIES, random_records
+
+# Constraint sets, built again for every system (a built constraint belongs to one relation)
+CONSTRAINTS = {
+    "single key": lambda: [KeyConstraint((0,))],
+    "composite key": lambda: [KeyConstraint((0, 3))],
+    "key and callable": lambda: [KeyConstraint((0,)), lambda record: record[4] != "Prof. B" or record[1] != "Bob"],
+    "two keys": lambda: [KeyConstraint((0, 3)), KeyConstraint((0, 2))],
+}
+
+AGGREGATES = [("COUNT", None), ("SUM", 2), ("MIN", 2), ("MAX", 2), ("MIN", 1), ("MAX", 1)]
+
+# Check the certain answers and the range answers of every aggregate of a system against every repair
+def check_against_repairs(system, records, constraints):
+    for query in QUERIES:
+        assert system.solve(query) == certain_answers(records, constraints(), query)
+        for function, column in AGGREGATES:
+            assert system.aggregate(query, function, column) == aggregate_bounds(records, constraints(), query, function, column)
+
+@pytest.mark.parametrize("name", sorted(CONSTRAINTS))
+@pytest.mark.parametrize("seed", range(10))
+def test_solve_and_aggregate_match_brute_force(name, seed):
+    rng = random.Random(seed)
+    records = random_records(rng, rng.randint(2, 9))
+    check_against_repairs(CAvSAT(Relation.from_rows(records, HEADER), CONSTRAINTS[name]()), records, CONSTRAINTS[name])
+
+@pytest.mark.parametrize("name", ["single key", "two keys", "key and callable"])
+@pytest.mark.parametrize("seed", range(10))
+def test_group_by_matches_brute_force(name, seed):
+    rng = random.Random(seed)
+    records = random_records(rng, rng.randint(2, 9))
+    system = CAvSAT(Relation.from_rows(records, HEADER), CONSTRAINTS[name]())
+    for group, bounds in system.aggregate(QUERIES[0], "COUNT", group_by=[4]).items():
+        query = Eq(4, group[0])
+        assert bounds == aggregate_bounds(records, CONSTRAINTS[name](), query, "COUNT")
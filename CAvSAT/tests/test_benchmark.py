@@ -0,0 +1,65 @@
+import collections
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import benchmark
+import cavsat_solver
+
+# A report with one entry per (rows, method) and the given median timings
+def report(commit, medians):
+    return {"meta": {"commit": commit}, "results": [
+        {"rows": rows, "inconsistency_ratio": 0.1, "group_size": 2, "selectivity": 0.1, "method": method, "median_ns": median}
+        for (rows, method), median in medians.items()]}
+
+# Warmup runs are not timed, every repeat is, and the result of the last repeat is returned
+def test_measure_times_each_repeat():
+    calls = []
+    timings, result = benchmark.measure(lambda: calls.append(None) or len(calls), warmup=2, repeats=3)
+    assert len(calls) == 5 and result == 5
+    assert len(timings) == 3 and all(timing >= 0 for timing in timings)
+    assert benchmark.measure(lambda: 1, warmup=0, repeats=0) == ([], None)
+
+# Only cases slower than the threshold count as regressions; cases without a (nonzero) base timing are skipped
+def test_compare_reports_counts_regressions():
+    base = report("a", {(10, "SAT-Solver"): 100, (10, "Regular SQL Query"): 100, (100, "SAT-Solver"): 0})
+    head = report("b", {(10, "SAT-Solver"): 111, (10, "Regular SQL Query"): 109, (100, "SAT-Solver"): 500,
+                        (1000, "SAT-Solver"): 500})
+    assert benchmark.compare_reports(base, head, 0.10) == 1
+    assert benchmark.compare_reports(base, head, 0.05) == 2
+    assert benchmark.compare_reports(base, head, 0.20) == 0
+    assert benchmark.compare_reports(head, base, 0.10) == 0
+
+# The synthetic dataset has the requested rows, and the requested fraction of them is in conflicting key groups
+def test_synthetic_dataset_conflicts():
+    records = benchmark.generate_synthetic_dataset(1000, inconsistency_ratio=0.2, group_size=4, seed=1)
+    assert len(records) == 1000 and all(len(record) == len(benchmark.HEADER) for record in records)
+    groups = collections.Counter((record[0], record[3]) for record in records)
+    assert sorted(set(groups.values())) == [1, 4]
+    assert sum(count for count in groups.values() if count > 1) == 200
+    assert records == benchmark.generate_synthetic_dataset(1000, inconsistency_ratio=0.2, group_size=4, seed=1)
+
+# The original solver (plain records and lambda constraints) runs the same case and finds the same answers
+@pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+def test_benchmark_case_runs_the_original_solver(tmp_path, monkeypatch):
+    root = subprocess.run(["git", "rev-list", "--max-parents=0", "HEAD"], cwd=os.path.dirname(benchmark.__file__),
+                          capture_output=True, text=True)
+    if root.returncode != 0:
+        pytest.skip("not in a git repository")
+    source = subprocess.run(["git", "show", root.stdout.split()[0] + ":CAvSAT/cavsat_solver.py"],
+                            cwd=os.path.dirname(benchmark.__file__), capture_output=True, text=True, check=True)
+    (tmp_path / "solver").mkdir()
+    (tmp_path / "solver" / "cavsat_solver.py").write_text(source.stdout)
+    dataset_file = str(tmp_path / "data.csv")
+    benchmark.write_dataset(benchmark.generate_synthetic_dataset(40, 0.25, 2, seed=0), dataset_file)
+
+    monkeypatch.setitem(sys.modules, "cavsat_solver", cavsat_solver)
+    original = benchmark.import_solver(str(tmp_path / "solver"))
+    assert not hasattr(original, "KeyConstraint")
+    base = benchmark.benchmark_case(original, dataset_file, 40, 0.25, 2, 0.5, warmup=0, repeats=1)
+    head = benchmark.benchmark_case(cavsat_solver, dataset_file, 40, 0.25, 2, 0.5, warmup=0, repeats=1)
+    assert [entry["method"] for entry in base] == [entry["method"] for entry in head] == benchmark.METHODS
+    assert base[0]["answers"] == head[0]["answers"] > 0
@@ -0,0 +1,28 @@
+import random
+
+from pysat.examples.genhard import PHP
+from pysat.solvers import Solver
+
+from brute_force import certain_answers
+from cavsat_solver import CAvSAT, Deadline, KeyConstraint, Relation, limited_solve
+from test_repairs import HEADER, QUERIES, random_records
+
+# A time budget that is already spent leaves every candidate row undecided instead of encoding the components
+def test_spent_time_budget_stops_before_encoding():
+    records = random_records(random.Random(0), 8)
+    system = CAvSAT(Relation.from_rows(records, HEADER), [KeyConstraint((0,))])
+    system.encode_component = None
+    answers = system.solve(QUERIES[0], time_budget=0)
+    assert system.result_state == "timed out"
+    assert answers <= certain_answers(records, [KeyConstraint((0,))], QUERIES[0])
+    assert len(system.undecided_rows) > 0
+
+# The conflict budget of a deadline is shared by its calls: a call that spends it leaves nothing to the next one
+def test_conflict_budget_is_shared_by_the_calls():
+    deadline = Deadline(conflicts=100)
+    with Solver(name="g3", bootstrap_with=PHP(8).clauses) as solver:
+        assert limited_solve(solver, deadline) is None
+        assert deadline.exhausted()
+        conflicts = solver.accum_stats()["conflicts"]
+        assert limited_solve(solver, deadline) is None
+        assert solver.accum_stats()["conflicts"] == conflicts
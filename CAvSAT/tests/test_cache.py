@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from brute_force import certain_answers
+from cavsat_solver import CACHE_VERSION, CAvSAT, FunctionalDependency, KeyConstraint, Relation, ResultCache
+from test_repairs import HEADER, QUERIES, random_records
+
+# Constraint sets, built again for every system (a built constraint belongs to one relation)
+CONSTRAINTS = {
+    "single key": lambda: [KeyConstraint((0,))],
+    "two keys": lambda: [KeyConstraint((0, 3)), KeyConstraint((0, 2))],
+    "key and functional dependency": lambda: [KeyConstraint((0, 2)), FunctionalDependency((2,), (3,))],
+}
+
+# A new system on the same data reads the results of the conflict components from the disk tier, without encoding
+@pytest.mark.parametrize("name", sorted(CONSTRAINTS))
+def test_component_results_are_reused(tmp_path, name):
+    records = random_records(random.Random(0), 8)
+    first = CAvSAT(Relation.from_rows(records, HEADER), CONSTRAINTS[name](), cache=ResultCache(str(tmp_path)))
+    answers = [first.solve(query) for query in QUERIES]
+    assert answers == [certain_answers(records, CONSTRAINTS[name](), query) for query in QUERIES]
+    assert all(key[1] == CACHE_VERSION for key in first.cache.entries)
+
+    second = CAvSAT(Relation.from_rows(records, HEADER), CONSTRAINTS[name](), cache=ResultCache(str(tmp_path)))
+    second.encode_component = None
+    assert [second.solve(query) for query in QUERIES] == answers
+    assert second.cache.stats["disk hits"] > 0
+
+# After an update, a solve writes the entries of the components it touched, not of every component
+def test_update_writes_touched_components():
+    records = [(str(key), name, "1000", "Math1", "Prof. A") for key in range(500) for name in ("Ann", "Bob")]
+    system = CAvSAT(Relation.from_rows(records, HEADER), [KeyConstraint((0,))], cache=ResultCache())
+    system.solve(QUERIES[0])
+    written = []
+    put = system.cache.put
+    system.cache.put = lambda key, value: (written.append(key), put(key, value))
+    system.insert([("7", "Kim", "1000", "Math1", "Prof. A")])
+    system.solve(QUERIES[0])
+    assert sorted(key[-1] for key in written) == ["cnf", "result"]
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from brute_force import certain_answers
+from cavsat_solver import CAvSAT, DenialConstraint, FunctionalDependency, KeyConstraint, Relation
+from test_aggregates import check_against_repairs
+from test_repairs import HEADER, QUERIES, random_records
+
+# Constraint sets with dependencies, built again for every system (a built constraint belongs to one relation)
+CONSTRAINTS = {
+    "functional dependency": lambda: [FunctionalDependency((3,), (4,))],
+    "key and functional dependency": lambda: [KeyConstraint((0, 2)), FunctionalDependency((2,), (3,))],
+    "denial constraint": lambda: [DenialConstraint([(0, "=", 0), (2, "<", 2)])],
+    "key and denial constraint": lambda: [KeyConstraint((0, 3)), DenialConstraint([(1, "=", 1), (4, "!=", 4)])],
+}
+
+RECORDS = [("9", "Ann", "10", "Math1", "Prof. A"), ("10", "Bob", "9", "CS2", "Prof. B"),
+           ("2", "10", "1000", "CS2", "Prof. A"), ("3", "Kim", "1001", "Math1", "2")]
+
+# Integer columns are ordered by value, not by their text (9 < 10)
+def test_denial_constraint_orders_integers_by_value():
+    constraints = [DenialConstraint([(0, "<", 2), (3, "!=", 3)])]
+    system = CAvSAT(Relation.from_rows(RECORDS, HEADER), constraints)
+    assert system.solve(QUERIES[0]) == certain_answers(RECORDS, constraints, QUERIES[0])
+
+# An integer column and a text column are compared for equality by the text of the integer
+def test_denial_constraint_equates_integer_and_text_columns():
+    constraints = [DenialConstraint([(0, "=", 4)])]
+    system = CAvSAT(Relation.from_rows(RECORDS, HEADER), constraints)
+    assert system.solve(QUERIES[0]) == certain_answers(RECORDS, constraints, QUERIES[0])
+    assert set(RECORDS) - system.solve(QUERIES[0]) == {RECORDS[2], RECORDS[3]}
+
+# An order between an integer column and a text column has no meaning, so it is rejected
+def test_denial_constraint_rejects_mixed_order():
+    with pytest.raises(ValueError):
+        DenialConstraint([(0, "<", 1)]).build(Relation.from_rows(RECORDS, HEADER))
+
+@pytest.mark.parametrize("name", sorted(CONSTRAINTS))
+@pytest.mark.parametrize("seed", range(10))
+def test_solve_and_aggregate_match_brute_force(name, seed):
+    rng = random.Random(seed)
+    records = random_records(rng, rng.randint(2, 9))
+    check_against_repairs(CAvSAT(Relation.from_rows(records, HEADER), CONSTRAINTS[name]()), records, CONSTRAINTS[name])
@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from brute_force import certain_join_answers
+from cavsat_solver import Atom, ConjunctiveQuery, Database, KeyConstraint, Relation
+
+# Constraints of the enrollments, courses and instructors (several keys on the courses with multi_key)
+def constraints(multi_key):
+    return {
+        "E": [KeyConstraint((0, 1))],
+        "C": [KeyConstraint((0,))] + ([KeyConstraint((1, 2))] if multi_key else []) + [lambda record: record[2] != "2" or record[1] != "P2"],
+        "I": [KeyConstraint((0,))],
+    }
+
+HEADERS = {"E": ["sid", "course", "grade"], "C": ["course", "prof", "credits"], "I": ["prof", "dept"]}
+
+QUERIES = [
+    ConjunctiveQuery([Atom("E"), Atom("C"), Atom("I")], [(("E", 1), ("C", 0)), (("C", 1), ("I", 0))], [("E", 0), ("I", 1)]),
+    ConjunctiveQuery([Atom("E", lambda record: record[2] == "A"), Atom("C")], [(("E", 1), ("C", 0))], [("C", 1)]),
+    ConjunctiveQuery([Atom("E", alias="e1"), Atom("E", alias="e2")], [(("e1", 0), ("e2", 0))], [("e1", 1), ("e2", 1)]),
+    ConjunctiveQuery([Atom("E"), Atom("C")], [(("E", 1), ("C", 0)), (("E", 0), ("C", 2))], []),
+]
+
+# Get small random relations over few values, so that the key groups and the joins overlap
+def random_relations(rng):
+    return {
+        "E": [(str(rng.randint(1, 3)), rng.choice(["C1", "C2", "C3"]), rng.choice(["A", "B"])) for _ in range(rng.randint(2, 6))],
+        "C": [(rng.choice(["C1", "C2", "C3"]), rng.choice(["P1", "P2"]), str(rng.randint(1, 2))) for _ in range(rng.randint(2, 5))],
+        "I": [(rng.choice(["P1", "P2"]), rng.choice(["CS", "EE"])) for _ in range(rng.randint(1, 3))],
+    }
+
+@pytest.mark.parametrize("multi_key", [False, True])
+@pytest.mark.parametrize("seed", range(15))
+def test_joins_match_brute_force(multi_key, seed):
+    relations = random_relations(random.Random(seed))
+    database = Database({name: (Relation.from_rows(records, HEADERS[name]), constraints(multi_key)[name]) for name, records in relations.items()})
+    for query in QUERIES:
+        expected = certain_join_answers({name: (records, constraints(multi_key)[name]) for name, records in relations.items()}, query)
+        assert database.solve(query) == expected
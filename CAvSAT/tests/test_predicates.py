@@ -0,0 +1,24 @@
+from cavsat_solver import And, Eq, In, IntColumn, Range, Relation, bind_query, select_rows
+from test_repairs import HEADER
+
+RECORDS = [("1", "Ann", "1000", "Math1", "Prof. A"), ("2", "Bob", "1001", "CS2", "Prof. B"),
+           ("3", "Kim", "1002", "CS2", "Prof. A")]
+
+# A value that is not an integer matches no row of an integer column, by scan or by index probe
+def test_non_numeric_value_on_integer_column():
+    relation = Relation.from_rows(RECORDS, HEADER)
+    assert isinstance(relation.column("StudentID"), IntColumn)
+    for query in (Eq("StudentID", "abc"), In("StudentID", ["abc", None])):
+        assert not query.mask(relation).any()
+        assert len(query.rows(relation)) == 0
+    assert select_rows(relation, In("StudentID", ["abc", "2"])).tolist() == [1]
+    assert select_rows(relation, Eq("StudentID", 3)).tolist() == [2]
+
+# Binding returns a bound copy and leaves the shared query unchanged
+def test_bind_returns_a_copy():
+    query = And(Eq("Instructor", "Prof. A"), Range("StudentID", low=2))
+    bound = bind_query(query, HEADER)
+    assert [predicate.column for predicate in query.predicates] == ["Instructor", "StudentID"]
+    assert [predicate.column for predicate in bound.predicates] == [4, 0]
+    assert bound(("3", "Kim", "1002", "CS2", "Prof. A"))
+    assert bind_query(query, ["Instructor", "A", "B", "C", "StudentID"]).predicates[0].column == 0
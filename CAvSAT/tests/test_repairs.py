@@ -0,0 +1,61 @@
+import random
+
+import numpy as np
+import pytest
+
+from brute_force import aggregate_bounds, certain_answers
+from cavsat_solver import CAvSAT, Eq, KeyConstraint, Relation, connected_components
+
+HEADER = ["StudentID", "StudentName", "CourseID", "CourseName", "Instructor"]
+
+# Get a small random instance: few distinct values per column, so that key groups overlap
+def random_records(rng, count):
+    return [(str(rng.randint(1, 3)), rng.choice(["Ann", "Bob", "Kim"]), str(rng.randint(1000, 1002)),
+             rng.choice(["Math1", "CS2"]), rng.choice(["Prof. A", "Prof. B"])) for _ in range(count)]
+
+QUERIES = [lambda record: True, Eq(4, "Prof. B"), lambda record: record[1] != "Bob"]
+
+# Two key constraints: a repair may keep no record of a key group, so exactly-one clauses would be wrong
+def test_two_keys_without_exactly_one_repair():
+    records = [("3", "Ann", "1001", "Math1", "Prof. A"), ("3", "Bob", "1002", "Math1", "Prof. B"),
+               ("3", "Ann", "1001", "CS2", "Prof. B"), ("3", "Kim", "1000", "CS2", "Prof. B")]
+    system = CAvSAT(Relation.from_rows(records, HEADER), [KeyConstraint((0, 3)), KeyConstraint((0, 2))])
+    constraints = [KeyConstraint((0, 3)), KeyConstraint((0, 2))]
+    assert system.solve(QUERIES[0]) == certain_answers(records, constraints, QUERIES[0]) == set()
+    assert system.aggregate(QUERIES[0], "COUNT") == aggregate_bounds(records, constraints, QUERIES[0], "COUNT") == (2, 2)
+
+@pytest.mark.parametrize("seed", range(40))
+def test_two_keys_match_brute_force(seed):
+    rng = random.Random(seed)
+    records = random_records(rng, rng.randint(2, 9))
+    constraints = [KeyConstraint((0, 3)), KeyConstraint((0, 2))]
+    system = CAvSAT(Relation.from_rows(records, HEADER), [KeyConstraint((0, 3)), KeyConstraint((0, 2))])
+    for query in QUERIES:
+        assert system.solve(query) == certain_answers(records, constraints, query)
+        assert system.aggregate(query, "COUNT") == aggregate_bounds(records, constraints, query, "COUNT")
+        assert system.aggregate(query, "SUM", 2) == aggregate_bounds(records, constraints, query, "SUM", 2)
+
+# Label the components of a graph with a plain union-find (the smallest node of each component is its label)
+def reference_components(count, left, right):
+    parent = list(range(count))
+    def root(node):
+        while parent[node] != node:
+            node = parent[node]
+        return node
+    for a, b in zip(left.tolist(), right.tolist()):
+        a, b = root(a), root(b)
+        parent[max(a, b)] = min(a, b)
+    return [root(node) for node in range(count)]
+
+@pytest.mark.parametrize("seed", range(20))
+def test_connected_components_match_union_find(seed):
+    rng = np.random.default_rng(seed)
+    count = int(rng.integers(1, 60))
+    left, right = rng.integers(0, count, 40), rng.integers(0, count, 40)
+    assert connected_components(count, left, right).tolist() == reference_components(count, left, right)
+
+# Two overlapping keys that chain every row into one component (the labels take one pass, not one per row)
+def test_key_chain_is_one_component():
+    records = [(str(i // 2), str((i + 1) // 2), str(i)) for i in range(20000)]
+    system = CAvSAT(Relation.from_rows(records, ["a", "b", "c"]), [KeyConstraint((0,)), KeyConstraint((1,))])
+    assert not system.component_of_row().any()
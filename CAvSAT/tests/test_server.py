@@ -0,0 +1,104 @@
+import asyncio
+import csv
+import json
+import os
+import random
+import socket
+import threading
+import time
+
+import pytest
+
+from brute_force import certain_answers
+from cavsat_server import CAvSATServer
+from cavsat_solver import Eq, KeyConstraint, ResultCache
+from test_repairs import HEADER, random_records
+
+# Query of the test, as sent to the server and as evaluated by the brute force
+QUERY = {"eq": ["Instructor", "Prof. B"]}
+
+# Run a server on a unix socket in a background thread; yields the socket path and the thread
+@pytest.fixture
+def server(tmp_path):
+    socket_path = str(tmp_path / "cavsat.sock")
+    thread = threading.Thread(target=asyncio.run, args=(CAvSATServer(2, ResultCache()).serve(socket_path),), daemon=True)
+    thread.start()
+    deadline = time.time() + 30
+    while not os.path.exists(socket_path):
+        assert thread.is_alive() and time.time() < deadline
+        time.sleep(0.01)
+    yield socket_path, thread
+    thread.join(timeout=30)
+
+# Client sending one request line at a time and reading its response line
+class Client:
+
+    def __init__(self, socket_path):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(socket_path)
+        self.file = self.socket.makefile("rw")
+        self.next_id = 0
+
+    def send_line(self, line):
+        self.file.write(line + "\n")
+        self.file.flush()
+        return json.loads(self.file.readline())
+
+    def call(self, **request):
+        self.next_id += 1
+        response = self.send_line(json.dumps(dict(request, id=self.next_id)))
+        assert response["id"] == self.next_id
+        return response
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+# Get the answers of the query with the brute force, as the server sends them
+def expected_answers(records):
+    return sorted(list(answer) for answer in certain_answers(records, [KeyConstraint((0, 3))], Eq(4, "Prof. B")))
+
+# Load, solve, insert, delete, status, malformed requests and shutdown over the socket
+def test_server_session(server, tmp_path):
+    socket_path, thread = server
+    rng = random.Random(0)
+    records = random_records(rng, 8)
+    path = tmp_path / "data.csv"
+    with open(path, "w", newline="") as file:
+        csv.writer(file).writerows([HEADER] + records)
+
+    client = Client(socket_path)
+    response = client.call(command="load", dataset="d", path=str(path), constraints=[{"key": ["StudentID", "CourseName"]}])
+    assert response["ok"] and response["result"]["rows"] == 8
+    response = client.call(command="solve", dataset="d", query=QUERY)
+    assert response["ok"] and response["result"]["state"] == "complete"
+    assert response["result"]["answers"] == expected_answers(records)
+
+    new_records = random_records(rng, 3)
+    response = client.call(command="insert", dataset="d", records=new_records)
+    assert response["ok"] and response["result"]["rows"] == 3
+    records = records + new_records
+    assert client.call(command="solve", dataset="d", query=QUERY)["result"]["answers"] == expected_answers(records)
+
+    response = client.call(command="delete", dataset="d", records=[records[0]])
+    assert response["ok"] and response["result"]["rows"] == records.count(records[0])
+    records = [record for record in records if record != records[0]]
+    for _ in range(4):
+        assert client.call(command="solve", dataset="d", query=QUERY)["result"]["answers"] == expected_answers(records)
+
+    status = client.call(command="status")["result"]["datasets"]["d"]
+    assert status["rows"] == len(records) and status["generation"] == 2
+
+    # Malformed requests get an error response and leave the connection open
+    response = client.send_line("not json")
+    assert not response["ok"] and response["error"].startswith("JSONDecodeError")
+    response = client.call(command="unknown")
+    assert not response["ok"] and response["error"].startswith("ValueError")
+    response = client.call(command="solve", dataset="missing", query=QUERY)
+    assert not response["ok"] and response["error"].startswith("KeyError")
+
+    response = client.call(command="shutdown")
+    assert response["ok"] and response["result"] == {"stopping": True}
+    client.close()
+    thread.join(timeout=30)
+    assert not thread.is_alive() and not os.path.exists(socket_path)
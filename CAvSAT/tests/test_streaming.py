@@ -0,0 +1,42 @@
+import csv
+import random
+
+import pytest
+
+import cavsat_solver
+from brute_force import certain_answers
+from cavsat_solver import (DictColumn, Eq, IntColumn, KeyConstraint, Prefix, Range, iter_csv_chunks,
+                           stream_consistent_answers)
+from test_repairs import HEADER, random_records
+
+# Write records to a CSV file with the header of the tests
+def write_csv(path, records):
+    with open(path, "w", newline="") as file:
+        csv.writer(file).writerows([HEADER] + records)
+    return str(path)
+
+# Streaming over small chunks and many partitions gives the consistent answers (once each), and leaves no files
+@pytest.mark.parametrize("seed", range(5))
+def test_stream_matches_brute_force(tmp_path, monkeypatch, seed):
+    monkeypatch.setattr(cavsat_solver, "PARTITION_BYTES", 64)
+    records = random_records(random.Random(seed), 12)
+    path = write_csv(tmp_path / "data.csv", records)
+    for query in (lambda record: True, Eq(4, "Prof. B"), Range(2, low=1001)):
+        answers = list(stream_consistent_answers(path, query, chunk_size=5, directory=str(tmp_path)))
+        assert len(answers) == len(set(answers))
+        assert set(answers) == certain_answers(records, [KeyConstraint((0, 3))], query)
+    assert sorted(item.name for item in tmp_path.iterdir()) == ["data.csv"]
+
+# Every chunk gets the column types of the first chunk
+def test_chunks_keep_the_types_of_the_first_chunk(tmp_path):
+    records = [("1", "Ann", "1000", "Math1", "Prof. A"), ("2", "Bob", "1001", "CS2", "Prof. B"),
+               ("3", "Kim", "1002", "42", "Prof. A"), ("4", "Kim", "999", "7", "Prof. B")]
+    chunks = [chunk for _, chunk in iter_csv_chunks(write_csv(tmp_path / "data.csv", records), chunk_size=2)]
+    assert [type(chunk.column("CourseName")) for chunk in chunks] == [DictColumn, DictColumn]
+    assert [type(chunk.column("CourseID")) for chunk in chunks] == [IntColumn, IntColumn]
+    assert [chunk.mask(Range("CourseID", low=1000)).tolist() for chunk in chunks] == [[True, True], [True, False]]
+    assert [chunk.mask(Prefix("CourseName", "4")).tolist() for chunk in chunks] == [[False, False], [True, False]]
+
+    records.append(("5", "Kim", "n/a", "CS2", "Prof. B"))
+    with pytest.raises(ValueError):
+        list(iter_csv_chunks(write_csv(tmp_path / "data.csv", records), chunk_size=2))
@@ -0,0 +1,99 @@
+import random
+
+import numpy as np
+import pytest
+
+from brute_force import aggregate_bounds, certain_answers
+from cavsat_solver import (CAvSAT, DenialConstraint, Evaluation, FunctionalDependency, KeyConstraint, Relation,
+                           data_integrity_validation)
+from test_repairs import HEADER, QUERIES, random_records
+
+# Constraint sets, built again for every system (a built constraint belongs to one relation)
+CONSTRAINTS = {
+    "single key": lambda: [KeyConstraint((0,))],
+    "two keys": lambda: [KeyConstraint((0, 3)), KeyConstraint((0, 2))],
+    "key and callable": lambda: [KeyConstraint((0,)), lambda record: record[4] != "Prof. B" or record[1] != "Bob"],
+    "key and functional dependency": lambda: [KeyConstraint((0, 2)), FunctionalDependency((2,), (3,))],
+    "functional dependency": lambda: [FunctionalDependency((3,), (4,))],
+    "denial constraint": lambda: [DenialConstraint([(0, "=", 0), (2, "<", 2)])],
+    "denial constraint across columns": lambda: [KeyConstraint((0, 3)), DenialConstraint([(1, "=", 4), (2, "!=", 2)])],
+}
+
+# Inserts and deletes keep the warm state of the system in line with the repairs of the new content
+@pytest.mark.parametrize("name", sorted(CONSTRAINTS))
+@pytest.mark.parametrize("seed", range(10))
+def test_updates_match_brute_force(name, seed):
+    rng = random.Random(seed)
+    records = random_records(rng, rng.randint(2, 6))
+    system = CAvSAT(Relation.from_rows(records, HEADER), CONSTRAINTS[name]())
+    for _ in range(5):
+        if records and rng.random() < 0.4:
+            record = rng.choice(records)
+            records = [other for other in records if other != record]
+            system.delete([record])
+        else:
+            new_records = random_records(rng, rng.randint(1, 2))
+            records = records + new_records
+            system.insert(new_records)
+        for query in QUERIES:
+            assert system.solve(query) == certain_answers(records, CONSTRAINTS[name](), query)
+            assert system.aggregate(query, "COUNT") == aggregate_bounds(records, CONSTRAINTS[name](), query, "COUNT")
+
+# The conflicts that functional dependencies and denial constraints maintain through updates are those of a fresh build
+@pytest.mark.parametrize("seed", range(10))
+def test_maintained_dependencies_match_rebuild(seed):
+    rng = random.Random(seed)
+    records = random_records(rng, rng.randint(2, 6))
+    relation = Relation.from_rows(records, HEADER)
+    system = CAvSAT(relation, [FunctionalDependency((3,), (4,)), DenialConstraint([(0, "=", 0), (2, "<", 2)]),
+                               DenialConstraint([(1, "!=", 1), (2, ">=", 2), (4, "=", 4)])])
+    for _ in range(6):
+        if rng.random() < 0.4:
+            system.delete([rng.choice(records)])
+        else:
+            system.insert(random_records(rng, rng.randint(1, 3)))
+        for constraint in system.dependency_constraints:
+            fresh = type(constraint)(*((constraint.lhs, constraint.rhs) if isinstance(constraint, FunctionalDependency) else (constraint.conditions,)))
+            fresh.build(relation)
+            assert np.array_equal(constraint.conflict_mask, fresh.conflict_mask)
+            if isinstance(constraint, DenialConstraint):
+                assert np.array_equal(constraint.violation_mask, fresh.violation_mask)
+                assert constraint.violating_records == fresh.violating_records
+                assert sorted(zip(*constraint.edges)) == sorted(zip(*fresh.edges))
+            else:
+                assert constraint.conflicting_keys == fresh.conflicting_keys
+
+# A key constraint built after rows were deleted leaves the deleted rows out of its groups and conflicts
+def test_fresh_constraint_after_delete():
+    records = [("1", "Ann", "1000", "Math1", "Prof. A"), ("1", "Bob", "1001", "Math1", "Prof. B"),
+               ("2", "Kim", "1002", "CS2", "Prof. A"), ("2", "Kim", "1002", "CS2", "Prof. A")]
+    relation = Relation.from_rows(records, HEADER)
+    system = CAvSAT(relation, [KeyConstraint((0, 3))])
+    system.delete([records[1]])
+
+    constraint = KeyConstraint((0, 3)).build(relation)
+    assert not constraint.conflict_mask.any()
+    assert constraint.group_sizes.tolist() == system.key_constraints[0].group_sizes.tolist()
+    assert system.solve(QUERIES[0]) == {records[0], records[2]}
+    assert CAvSAT(relation, [KeyConstraint((0, 3))]).solve(QUERIES[0]) == {records[0], records[2]}
+
+    evaluation = Evaluation(relation, [constraint], QUERIES[0], key_constraint=constraint)
+    evaluation.add("SAT-Solver", [records[0], records[2]])
+    assert evaluation.accuracy("SAT-Solver") == 1.0
+    assert evaluation.integrity("SAT-Solver")
+    assert np.array_equal(evaluation.expected_rows[2], [0])
+    assert data_integrity_validation([records[0]], [constraint], QUERIES[0])
+
+# A key constraint built again on another relation drops the update state of the first one
+def test_rebuilt_key_constraint_drops_update_state():
+    records = random_records(random.Random(0), 6)
+    constraint = KeyConstraint((0,))
+    system = CAvSAT(Relation.from_rows(records, HEADER), [constraint])
+    system.insert(random_records(random.Random(1), 2))
+    assert constraint.key_lookup is not None
+
+    system = CAvSAT(Relation.from_rows(records, HEADER), [constraint])
+    assert constraint.key_lookup is None and constraint.added_rows == {} and constraint.changed_groups is None
+    new_records = random_records(random.Random(2), 2)
+    system.insert(new_records)
+    assert system.solve(QUERIES[0]) == certain_answers(records + new_records, [KeyConstraint((0,))], QUERIES[0])